@@ -99,21 +99,51 @@ const decryptKibanaSchema = Joi.object({
 });
 
 // Helper function to run Python script
-function runPythonDecryption(args) {
+function getPythonCommand() {
+  const pythonPath = process.env.PYTHON_PATH || 'python3';
+  // In Docker, the script is in /app/loggin_genie.py
+  const scriptPath = process.env.NODE_ENV === 'production' 
+    ? '/app/loggin_genie.py' 
+    : path.join(__dirname, '..', 'loggin_genie.py');
+  
+  return { pythonPath, scriptPath };
+}
+
+function runPythonDecryption(args, onProgress) {
+  if (process.env.PYTHON_WORKER === 'true') {
+    return runPythonWorkerJob(args, onProgress);
+  }
+  
   return new Promise((resolve, reject) => {
-    const pythonPath = process.env.PYTHON_PATH || 'python3';
-    // In Docker, the script is in /app/loggin_genie.py
-    const scriptPath = process.env.NODE_ENV === 'production' 
-      ? '/app/loggin_genie.py' 
-      : path.join(__dirname, '..', 'loggin_genie.py');
+    const { pythonPath, scriptPath } = getPythonCommand();
     
-    const pythonProcess = spawn(pythonPath, [scriptPath, ...args]);
+    // With a progress callback, ask the CLI for NDJSON events on stdout
+    const cliArgs = onProgress ? [...args, '--progress', 'ndjson'] : args;
+    const pythonProcess = spawn(pythonPath, [scriptPath, ...cliArgs]);
     
     let stdout = '';
     let stderr = '';
+    let lineBuffer = '';
     
     pythonProcess.stdout.on('data', (data) => {
       stdout += data.toString();
+      
+      if (onProgress) {
+        lineBuffer += data.toString();
+        let newline;
+        while ((newline = lineBuffer.indexOf('\n')) >= 0) {
+          const line = lineBuffer.slice(0, newline);
+          lineBuffer = lineBuffer.slice(newline + 1);
+          try {
+            const event = JSON.parse(line);
+            if (event.event === 'progress' || event.event === 'done') {
+              onProgress(event);
+            }
+          } catch (error) {
+            // Not an event line
+          }
+        }
+      }
     });
     
     pythonProcess.stderr.on('data', (data) => {
@@ -134,6 +164,134 @@ function runPythonDecryption(args) {
   });
 }
 
+function updateJobProgress(jobId, event) {
+  const job = jobs.get(jobId);
+  if (!job) {
+    return;
+  }
+  
+  jobs.set(jobId, {
+    ...job,
+    progress: {
+      fetched: event.fetched,
+      decrypted: event.decrypted,
+      failed: event.failed,
+      bytesWritten: event.bytes_written,
+      recordsPerSec: event.records_per_sec,
+      elapsed: event.elapsed
+    }
+  });
+}
+
+// Resident Python worker (enabled with PYTHON_WORKER=true)
+// Keeps one `loggin_genie.py --serve` process alive and sends it jobs as
+// newline-delimited JSON-RPC, avoiding interpreter start-up per job.
+let pythonWorker = null;
+let workerRequestId = 0;
+const workerPending = new Map();
+
+function getPythonWorker() {
+  if (pythonWorker) {
+    return pythonWorker;
+  }
+  
+  const { pythonPath, scriptPath } = getPythonCommand();
+  const worker = spawn(pythonPath, [scriptPath, '--serve']);
+  let buffer = '';
+  
+  worker.stdout.on('data', (data) => {
+    buffer += data.toString();
+    
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline);
+      buffer = buffer.slice(newline + 1);
+      
+      let message;
+      try {
+        message = JSON.parse(line);
+      } catch (error) {
+        continue;
+      }
+      
+      // Notifications (e.g. streamed records) carry no top-level id
+      if (message.method === 'job.progress' && message.params) {
+        const job = workerPending.get(message.params.id);
+        const event = message.params;
+        if (job && job.onProgress && (event.event === 'progress' || event.event === 'done')) {
+          job.onProgress(event);
+        }
+        continue;
+      }
+      
+      const pending = workerPending.get(message.id);
+      if (!pending) {
+        continue;
+      }
+      
+      workerPending.delete(message.id);
+      if (message.error) {
+        pending.reject(new Error(`Python worker error: ${message.error.message}`));
+      } else {
+        pending.resolve({ stdout: JSON.stringify(message.result), stderr: '' });
+      }
+    }
+  });
+  
+  worker.stderr.on('data', (data) => {
+    console.error(`[python-worker] ${data.toString().trim()}`);
+  });
+  
+  const failPending = (error) => {
+    for (const { reject } of workerPending.values()) {
+      reject(error);
+    }
+    workerPending.clear();
+    pythonWorker = null;
+  };
+  
+  worker.on('exit', (code) => {
+    failPending(new Error(`Python worker exited with code ${code}`));
+  });
+  
+  worker.on('error', (error) => {
+    failPending(new Error(`Failed to start Python worker: ${error.message}`));
+  });
+  
+  pythonWorker = worker;
+  return worker;
+}
+
+function argsToParams(args) {
+  // ['--api-key', 'x'] -> { api_key: 'x' }
+  const params = {};
+  for (let i = 0; i < args.length; i += 2) {
+    params[args[i].replace(/^--/, '').replace(/-/g, '_')] = args[i + 1];
+  }
+  return params;
+}
+
+function runPythonWorkerJob(args, onProgress) {
+  return new Promise((resolve, reject) => {
+    const id = ++workerRequestId;
+    workerPending.set(id, { resolve, reject, onProgress });
+    
+    const params = argsToParams(args);
+    if (onProgress) {
+      // Same progress events as spawn mode, as job.progress notifications
+      params.progress = true;
+    }
+    
+    const request = {
+      jsonrpc: '2.0',
+      id,
+      method: 'decrypt',
+      params
+    };
+    getPythonWorker().stdin.write(JSON.stringify(request) + '\n');
+  });
+}
+
 // Routes
 
 // Health check (public)
@@ -350,7 +508,7 @@ app.post('/api/decrypt/file', authMiddleware, upload.single('logFile'), async (r
           '--output', outputPath
         ];
         
-        await runPythonDecryption(args);
+        await runPythonDecryption(args, (event) => updateJobProgress(jobId, event));
         
         // Read decrypted output
         const decryptedData = await fs.readFile(outputPath, 'utf-8');
@@ -462,7 +620,7 @@ app.post('/api/decrypt/kibana', authMiddleware, async (req, res) => {
         if (apiKey) args.push('--api-key', apiKey);
         if (query) args.push('--query', JSON.stringify(query));
         
-        await runPythonDecryption(args);
+        await runPythonDecryption(args, (event) => updateJobProgress(jobId, event));
         
         // Read decrypted output
         const decryptedData = await fs.readFile(outputPath, 'utf-8');
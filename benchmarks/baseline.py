@@ -0,0 +1,98 @@
+"""
+Store benchmark baselines and flag regressions against them
+"""
+
+import json
+import platform
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+BASELINE_DIR = Path(__file__).parent / 'baselines'
+
+
+def load_baseline(name: str) -> Dict:
+    """Load a stored baseline (empty if none has been recorded yet)"""
+
+    path = BASELINE_DIR / f'{name}.json'
+    if not path.exists():
+        return {}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(name: str, results: Dict[str, float]) -> Path:
+    """Record results as the new baseline"""
+
+    BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+    path = BASELINE_DIR / f'{name}.json'
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'machine': platform.machine(),
+            'python': platform.python_version(),
+            'results': {metric: round(value, 3) for metric, value in results.items()},
+        }, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+    return path
+
+
+def find_regressions(results: Dict[str, float], baseline: Dict, tolerance: float,
+                     lower_is_better: bool) -> List[str]:
+    """
+    Compare results with a baseline
+
+    Args:
+        results: Metric name -> measured value
+        baseline: Baseline as returned by load_baseline()
+        tolerance: Allowed relative slowdown (0.25 = 25%)
+        lower_is_better: True for timings, False for throughput
+
+    Returns:
+        Human-readable description of every regressed metric
+    """
+
+    regressions = []
+    expected = baseline.get('results', {})
+
+    for name, value in sorted(results.items()):
+        base = expected.get(name)
+        if not base:
+            continue
+
+        if lower_is_better:
+            regressed = value > base * (1 + tolerance)
+        else:
+            regressed = value < base / (1 + tolerance)
+
+        if regressed:
+            regressions.append(f'{name}: {value:,.2f} (baseline {base:,.2f})')
+
+    return regressions
+
+
+def report(title: str, results: Dict[str, float], baseline: Dict, unit: str):
+    """Print results next to their baseline values"""
+
+    expected = baseline.get('results', {})
+
+    print(f'\n{title}')
+    print('-' * 78)
+    for name, value in sorted(results.items()):
+        base = expected.get(name)
+        delta = f'{(value / base - 1) * 100:+6.1f}%' if base else '   new'
+        print(f'  {name:<48} {value:>14,.2f} {unit:<6} {delta}')
+
+
+def exit_with_regressions(regressions: List[str]):
+    """Exit non-zero when any metric regressed"""
+
+    if regressions:
+        print('\nRegressions detected:')
+        for regression in regressions:
+            print(f'  - {regression}')
+        sys.exit(1)
+
+    print('\nNo regressions against baseline.')
@@ -0,0 +1,817 @@
+#!/usr/bin/env python3
+"""
+Local Elasticsearch stand-in for offline load testing of KibanaClient
+
+Serves a synthetic, deterministic dataset of encrypted log hits built by
+generate_large_test.generate_chunk, over the endpoints the clients use:
+
+  * HEAD / and GET /                      - ping / cluster info
+  * GET|POST /<index>/_search             - from/size, search_after, scroll, PIT;
+                                            min, max and date_histogram
+                                            (fixed_interval) aggregations on
+                                            @timestamp
+  * POST /_search/scroll, DELETE ...      - scroll and clear_scroll
+  * POST /<index>/_pit, DELETE /_pit      - open / close point in time
+  * GET|POST /<index>/_count              - document count
+  * POST /_bulk, /<index>/_bulk           - acknowledged, not stored
+  * GET /_standin/stats                   - request and fault counters
+
+Record i of the dataset has the timestamp given by record_time(i), so
+@timestamp ranges, sorting and search_after cursors are resolved from
+record positions without materialising the data; only the pages actually
+served are generated (and kept in a small chunk cache). Duplicate records
+repeat an earlier record of their chunk, including its timestamp. Any index
+name or pattern serves the whole dataset; queries other than @timestamp
+ranges (inside bool filter/must) match everything.
+
+Latency (fixed, jitter and per hit), a page size ceiling and injected
+faults (error statuses or dropped connections) are configurable.
+
+Usage:
+    python benchmarks/es_standin.py --records 1m --port 9200
+    python benchmarks/es_standin.py --latency 20 --error-rate 0.05 --error-status 429
+    python loggin_genie.py --elasticsearch-url http://127.0.0.1:9200 --index logs-* --key <key>
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import generate_large_test as fixtures  # noqa: E402
+from src.decryptor import LogDecryptor  # noqa: E402
+
+# Same default as index.max_result_window
+MAX_RESULT_WINDOW = 10_000
+DEFAULT_TRACK_TOTAL_HITS = 10_000
+
+EPOCH = datetime(1970, 1, 1)
+DATE_MATH = re.compile(r'^now(?:([+-])(\d+)([smhdw]))?(?:/[smhdw])?$')
+DATE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+TIMESTAMP_FIELDS = ('@timestamp', 'timestamp')
+
+
+class StandinError(Exception):
+    """Error returned to the client as an Elasticsearch error response"""
+
+    def __init__(self, status: int, error_type: str, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.error_type = error_type
+        self.reason = reason
+
+    def body(self) -> Dict:
+        return {
+            'error': {
+                'root_cause': [{'type': self.error_type, 'reason': self.reason}],
+                'type': self.error_type,
+                'reason': self.reason,
+            },
+            'status': self.status,
+        }
+
+
+class Dataset:
+    """Synthetic hits addressed by record position"""
+
+    def __init__(self, records: int, seed: int = 0, algorithm: str = 'AES-256-CBC',
+                 layout: str = 'concat', key: str = fixtures.KEY, failure_ratio: float = 0.0,
+                 duplicate_ratio: float = 0.0, start: str = fixtures.START_TIME,
+                 span: float = 86400.0, chunk_size: int = 1000, cached_chunks: int = 64):
+        """
+        Initialize dataset
+
+        Args:
+            records: Number of documents
+            seed, algorithm, layout, key, failure_ratio, duplicate_ratio,
+            start, span: Fixture options, see generate_large_test.generate_chunk
+            chunk_size: Records generated together
+            cached_chunks: Generated chunks kept in memory
+        """
+
+        self.records = records
+        self.start = start
+        self.span = span
+        self.chunk_size = chunk_size
+        self.cached_chunks = cached_chunks
+        self.options = dict(seed=seed, algorithm=algorithm, layout=layout, key=key,
+                            failure_ratio=failure_ratio, duplicate_ratio=duplicate_ratio,
+                            start=start, span=span)
+
+        self._chunks: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def timestamp_ms(self, position: int) -> int:
+        """Epoch milliseconds of a record position"""
+
+        timestamp = fixtures.record_time(position, self.records, self.start, self.span)
+        return (timestamp - EPOCH) // timedelta(milliseconds=1)
+
+    def first_at_or_after(self, ms: int) -> int:
+        """First position whose timestamp is >= ms"""
+
+        return bisect_left(_Timestamps(self), ms)
+
+    def first_after(self, ms: int) -> int:
+        """First position whose timestamp is > ms"""
+
+        return bisect_right(_Timestamps(self), ms)
+
+    def hit(self, position: int) -> Dict:
+        chunk_index, offset = divmod(position, self.chunk_size)
+        return self._chunk(chunk_index)[offset]
+
+    def _chunk(self, chunk_index: int) -> List[Dict]:
+        with self._lock:
+            chunk = self._chunks.get(chunk_index)
+            if chunk is not None:
+                self._chunks.move_to_end(chunk_index)
+                return chunk
+
+        chunk = fixtures.generate_chunk(chunk_index, self.records, chunk_size=self.chunk_size,
+                                        **self.options)
+
+        with self._lock:
+            self._chunks[chunk_index] = chunk
+            while len(self._chunks) > self.cached_chunks:
+                self._chunks.popitem(last=False)
+        return chunk
+
+
+class _Timestamps:
+    """Sequence view of record timestamps for bisect"""
+
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return self.dataset.records
+
+    def __getitem__(self, position: int) -> int:
+        return self.dataset.timestamp_ms(position)
+
+
+class Cursor:
+    """Positions [lo, hi) of a search, read in ascending or descending order"""
+
+    def __init__(self, lo: int, hi: int, descending: bool):
+        self.lo = lo
+        self.hi = max(lo, hi)
+        self.descending = descending
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def page(self, offset: int, size: int) -> range:
+        """Positions of a page, in sort order"""
+
+        offset = min(offset, len(self))
+        end = min(offset + size, len(self))
+        if self.descending:
+            return range(self.hi - 1 - offset, self.hi - 1 - end, -1)
+        return range(self.lo + offset, self.lo + end)
+
+
+class StandinServer:
+    """Threaded HTTP server answering like an Elasticsearch cluster"""
+
+    def __init__(self, dataset: Dataset, host: str = '127.0.0.1', port: int = 9200,
+                 latency: float = 0.0, latency_jitter: float = 0.0,
+                 per_hit_latency: float = 0.0, max_page_size: Optional[int] = None,
+                 error_rate: float = 0.0, error_statuses: Tuple[int, ...] = (503,),
+                 drop_rate: float = 0.0, seed: int = 0):
+        """
+        Initialize server
+
+        Args:
+            dataset: Documents to serve
+            host: Bind address
+            port: Bind port (0 picks a free port)
+            latency: Seconds added to every response
+            latency_jitter: Up to this many extra seconds, uniformly random
+            per_hit_latency: Seconds added per returned hit
+            max_page_size: Return at most this many hits per response
+            error_rate: Fraction of data requests answered with an error status
+            error_statuses: Statuses injected errors are drawn from
+            drop_rate: Fraction of data requests whose connection is closed unanswered
+            seed: Seed for jitter and fault injection
+        """
+
+        self.dataset = dataset
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.per_hit_latency = per_hit_latency
+        self.max_page_size = max_page_size
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.drop_rate = drop_rate
+
+        self.stats: Counter = Counter()
+        self.scrolls: Dict[str, Dict] = {}
+        self.pits: Dict[str, float] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> str:
+        """Serve in a background thread and return the base URL"""
+
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='es-standin',
+                                        daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.stats[name] += value
+
+    def delay(self, hits: int = 0):
+        """Sleep for the configured response latency"""
+
+        seconds = self.latency + self.per_hit_latency * hits
+        if self.latency_jitter:
+            seconds += self.random() * self.latency_jitter
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def inject_fault(self) -> Optional[str]:
+        """'drop', an error status, or None for a normal response"""
+
+        if self.drop_rate and self.random() < self.drop_rate:
+            return 'drop'
+        if self.error_rate and self.random() < self.error_rate:
+            with self._lock:
+                return str(self._rng.choice(self.error_statuses))
+        return None
+
+    # Search
+
+    def cursor(self, body: Dict, sort: List) -> Cursor:
+        """Positions matching the query, restricted by search_after"""
+
+        dataset = self.dataset
+        lo, hi = 0, dataset.records
+
+        for bounds in _timestamp_ranges(body.get('query') or {}):
+            for op, value in bounds.items():
+                ms = _parse_date(value)
+                if ms is None:
+                    continue
+                if op == 'gte':
+                    lo = max(lo, dataset.first_at_or_after(ms))
+                elif op == 'gt':
+                    lo = max(lo, dataset.first_after(ms))
+                elif op == 'lte':
+                    hi = min(hi, dataset.first_after(ms))
+                elif op == 'lt':
+                    hi = min(hi, dataset.first_at_or_after(ms))
+
+        descending = _is_descending(sort)
+        search_after = body.get('search_after')
+
+        if search_after:
+            values = dict(zip((_sort_field(clause) for clause in sort), search_after))
+            position = next((values[field] for field in ('_shard_doc', '_doc')
+                             if isinstance(values.get(field), int)), None)
+
+            if position is None:
+                ms = next((_parse_date(values[field]) for field in TIMESTAMP_FIELDS
+                           if field in values), None)
+                if ms is not None:
+                    # Without a tiebreaker, skip everything sharing the cursor timestamp
+                    position = (dataset.first_at_or_after(ms) if descending
+                                else dataset.first_after(ms) - 1)
+
+            if position is not None:
+                if descending:
+                    hi = min(hi, position)
+                else:
+                    lo = max(lo, position + 1)
+
+        return Cursor(lo, hi, descending)
+
+    def render_hits(self, positions: range, sort: List) -> List[Dict]:
+        hits = []
+        for position in positions:
+            hit = dict(self.dataset.hit(position))
+            if sort:
+                hit['sort'] = [_sort_value(clause, position, self.dataset) for clause in sort]
+            hits.append(hit)
+        return hits
+
+    def search(self, body: Dict, params: Dict, pit_required: bool = False) -> Dict:
+        started = time.perf_counter()
+        sort = _normalize_sort(body.get('sort', params.get('sort')))
+        size = int(body.get('size', params.get('size', 10)))
+        offset = int(body.get('from', params.get('from', 0)))
+        scroll = params.get('scroll') or body.get('scroll')
+
+        pit = body.get('pit')
+        if pit:
+            self._check_pit(pit.get('id'), pit.get('keep_alive'))
+        elif pit_required:
+            raise StandinError(400, 'action_request_validation_exception',
+                               'Validation Failed: 1: index is missing;')
+
+        if not scroll and offset + size > MAX_RESULT_WINDOW:
+            raise StandinError(400, 'illegal_argument_exception',
+                               f'Result window is too large, from + size must be less than or '
+                               f'equal to: [{MAX_RESULT_WINDOW}] but was [{offset + size}].')
+
+        cursor = self.cursor(body, sort)
+        page_size = min(size, self.max_page_size) if self.max_page_size else size
+        hits = self.render_hits(cursor.page(offset, page_size), sort)
+
+        response = self._search_response(hits, len(cursor), body.get('track_total_hits'), started)
+        aggs = body.get('aggs') or body.get('aggregations')
+        if aggs:
+            response['aggregations'] = {name: self.aggregate(spec, cursor)
+                                        for name, spec in aggs.items()}
+
+        if scroll:
+            scroll_id = uuid.uuid4().hex
+            with self._lock:
+                self.scrolls[scroll_id] = {
+                    'cursor': cursor, 'sort': sort, 'size': page_size,
+                    'offset': offset + len(hits), 'expires': time.monotonic() + _seconds(scroll),
+                }
+            response['_scroll_id'] = scroll_id
+        if pit:
+            response['pit_id'] = pit['id']
+
+        self.count('hits', len(hits))
+        return response
+
+    def aggregate(self, spec: Dict, cursor: Cursor) -> Dict:
+        """Result of one min, max or date_histogram aggregation over the cursor's positions"""
+
+        kind, options = next((k, v) for k, v in spec.items() if k not in ('aggs', 'aggregations'))
+        if options.get('field') not in TIMESTAMP_FIELDS:
+            raise StandinError(400, 'illegal_argument_exception',
+                               f'Aggregations are only supported on {TIMESTAMP_FIELDS}')
+        dataset = self.dataset
+
+        if kind in ('min', 'max'):
+            if not len(cursor):
+                return {'value': None}
+            ms = dataset.timestamp_ms(cursor.lo if kind == 'min' else cursor.hi - 1)
+            return {'value': float(ms), 'value_as_string': _iso(ms)}
+
+        if kind != 'date_histogram' or 'fixed_interval' not in options:
+            raise StandinError(400, 'illegal_argument_exception',
+                               f'Unsupported aggregation [{kind}]')
+
+        interval = int(_seconds(options['fixed_interval']) * 1000)
+        min_doc_count = int(options.get('min_doc_count', 0))
+        buckets = []
+        if len(cursor):
+            key = dataset.timestamp_ms(cursor.lo) // interval * interval
+            position = cursor.lo
+            while position < cursor.hi:
+                end = min(dataset.first_at_or_after(key + interval), cursor.hi)
+                if end - position >= max(min_doc_count, 1) or (min_doc_count == 0 and buckets):
+                    buckets.append({'key_as_string': _iso(key), 'key': key,
+                                    'doc_count': end - position})
+                position = end
+                key += interval
+        return {'buckets': buckets}
+
+    def scroll(self, body: Dict, params: Dict) -> Dict:
+        started = time.perf_counter()
+        scroll_id = body.get('scroll_id') or params.get('scroll_id')
+        keep_alive = body.get('scroll') or params.get('scroll') or '1m'
+
+        with self._lock:
+            self._expire()
+            context = self.scrolls.get(scroll_id)
+            if context is None:
+                raise StandinError(404, 'search_context_missing_exception',
+                                   f'No search context found for id [{scroll_id}]')
+            offset = context['offset']
+            context['offset'] = min(offset + context['size'], len(context['cursor']))
+            context['expires'] = time.monotonic() + _seconds(keep_alive)
+
+        hits = self.render_hits(context['cursor'].page(offset, context['size']), context['sort'])
+        response = self._search_response(hits, len(context['cursor']), True, started)
+        response['_scroll_id'] = scroll_id
+
+        self.count('hits', len(hits))
+        return response
+
+    def clear_scroll(self, body: Dict, params: Dict) -> Dict:
+        scroll_ids = body.get('scroll_id') or params.get('scroll_id') or []
+        if isinstance(scroll_ids, str):
+            scroll_ids = scroll_ids.split(',')
+
+        with self._lock:
+            if scroll_ids == ['_all']:
+                scroll_ids = list(self.scrolls)
+            freed = sum(1 for scroll_id in scroll_ids if self.scrolls.pop(scroll_id, None))
+        return {'succeeded': True, 'num_freed': freed}
+
+    def open_pit(self, params: Dict) -> Dict:
+        pit_id = uuid.uuid4().hex
+        with self._lock:
+            self.pits[pit_id] = time.monotonic() + _seconds(params.get('keep_alive', '1m'))
+        return {'id': pit_id, '_shards': _shards()}
+
+    def close_pit(self, body: Dict) -> Dict:
+        with self._lock:
+            found = self.pits.pop(body.get('id'), None) is not None
+        return {'succeeded': found, 'num_freed': int(found)}
+
+    def count_documents(self, body: Dict) -> Dict:
+        return {'count': len(self.cursor(body, [])), '_shards': _shards()}
+
+    def bulk(self, raw: bytes, index: Optional[str]) -> Dict:
+        started = time.perf_counter()
+        lines = [line for line in raw.decode('utf-8').splitlines() if line.strip()]
+        items = []
+
+        i = 0
+        while i < len(lines):
+            action = json.loads(lines[i])
+            op, meta = next(iter(action.items()))
+            i += 1 if op == 'delete' else 2
+
+            status, result = {'delete': (200, 'deleted'), 'update': (200, 'updated')}.get(
+                op, (201, 'created'))
+            items.append({op: {
+                '_index': meta.get('_index', index),
+                '_id': meta.get('_id') or uuid.uuid4().hex[:20],
+                '_version': 1,
+                'result': result,
+                'status': status,
+            }})
+
+        self.count('bulk_items', len(items))
+        return {'took': _took(started), 'errors': False, 'items': items}
+
+    def _search_response(self, hits: List[Dict], total: int, track_total_hits, started: float) -> Dict:
+        response = {
+            'took': _took(started),
+            'timed_out': False,
+            '_shards': _shards(),
+            'hits': {'max_score': None, 'hits': hits},
+        }
+
+        if track_total_hits is not False:
+            limit = DEFAULT_TRACK_TOTAL_HITS if track_total_hits is None else track_total_hits
+            if limit is True or total <= limit:
+                response['hits']['total'] = {'value': total, 'relation': 'eq'}
+            else:
+                response['hits']['total'] = {'value': limit, 'relation': 'gte'}
+
+        return response
+
+    def _check_pit(self, pit_id: Optional[str], keep_alive: Optional[str]):
+        with self._lock:
+            self._expire()
+            if pit_id not in self.pits:
+                raise StandinError(404, 'search_context_missing_exception',
+                                   f'No search context found for id [{pit_id}]')
+            if keep_alive:
+                self.pits[pit_id] = time.monotonic() + _seconds(keep_alive)
+
+    def _expire(self):
+        """Drop expired scroll and PIT contexts (lock held)"""
+
+        now = time.monotonic()
+        for scroll_id in [s for s, c in self.scrolls.items() if c['expires'] < now]:
+            del self.scrolls[scroll_id]
+        for pit_id in [p for p, expires in self.pits.items() if expires < now]:
+            del self.pits[pit_id]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Route requests to the StandinServer"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'es-standin'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._dispatch('HEAD')
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method: str):
+        standin: StandinServer = self.server.standin
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+
+        endpoint = _endpoint(method, parts)
+        standin.count(f'requests.{endpoint}')
+
+        try:
+            if endpoint == 'ping':
+                self._send(200, {
+                    'name': 'es-standin',
+                    'cluster_name': 'es-standin',
+                    'version': {'number': '9.0.0', 'build_flavor': 'default'},
+                    'tagline': 'You Know, for Search',
+                }, body=method != 'HEAD')
+                return
+            if endpoint == 'stats':
+                self._send(200, dict(standin.stats))
+                return
+            if endpoint == 'unknown':
+                raise StandinError(400, 'illegal_argument_exception',
+                                   f'no handler found for uri [{url.path}] and method [{method}]')
+
+            fault = standin.inject_fault()
+            if fault == 'drop':
+                standin.count('faults.drop')
+                self.close_connection = True
+                return
+            if fault:
+                standin.count(f'faults.{fault}')
+                standin.delay()
+                status = int(fault)
+                error_type = ('es_rejected_execution_exception' if status == 429
+                              else 'injected_fault_exception')
+                raise StandinError(status, error_type, f'Injected fault ({status})')
+
+            if endpoint == 'bulk':
+                response = standin.bulk(raw, parts[0] if parts[0] != '_bulk' else None)
+            else:
+                body = json.loads(raw) if raw else {}
+                if endpoint == 'search':
+                    response = standin.search(body, params, pit_required=parts[0] == '_search')
+                elif endpoint == 'scroll':
+                    response = standin.scroll(body, params)
+                elif endpoint == 'clear_scroll':
+                    response = standin.clear_scroll(body, params)
+                elif endpoint == 'open_pit':
+                    response = standin.open_pit(params)
+                elif endpoint == 'close_pit':
+                    response = standin.close_pit(body)
+                else:
+                    response = standin.count_documents(body)
+
+            standin.delay(len(response.get('hits', {}).get('hits', ())))
+            self._send(200, response)
+
+        except StandinError as e:
+            standin.count(f'errors.{e.status}')
+            self._send(e.status, e.body())
+        except (ValueError, TypeError, KeyError) as e:
+            standin.count('errors.400')
+            self._send(400, StandinError(400, 'parsing_exception', str(e)).body())
+
+    def _send(self, status: int, payload: Dict, body: bool = True):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-Elastic-Product', 'Elasticsearch')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+
+def _endpoint(method: str, parts: List[str]) -> str:
+    """Endpoint name for a request path"""
+
+    if not parts:
+        return 'ping' if method in ('HEAD', 'GET') else 'unknown'
+    if parts == ['_standin', 'stats']:
+        return 'stats'
+    if parts[:2] == ['_search', 'scroll']:
+        return 'clear_scroll' if method == 'DELETE' else 'scroll'
+    if parts == ['_pit'] and method == 'DELETE':
+        return 'close_pit'
+
+    action = parts[-1]
+    if action == '_search' and len(parts) <= 2:
+        return 'search'
+    if action == '_pit' and len(parts) == 2:
+        return 'open_pit'
+    if action == '_count' and len(parts) <= 2:
+        return 'count'
+    if action == '_bulk' and len(parts) <= 2:
+        return 'bulk'
+    return 'unknown'
+
+
+def _timestamp_ranges(query: Dict) -> List[Dict]:
+    """@timestamp range bounds found in a query (top level or bool must/filter)"""
+
+    ranges = []
+    if 'range' in query:
+        for field, bounds in query['range'].items():
+            if field in TIMESTAMP_FIELDS and isinstance(bounds, dict):
+                ranges.append(bounds)
+    if 'bool' in query:
+        for clause in ('must', 'filter'):
+            nested = query['bool'].get(clause) or []
+            for sub in nested if isinstance(nested, list) else [nested]:
+                ranges.extend(_timestamp_ranges(sub))
+    return ranges
+
+
+def _parse_date(value) -> Optional[int]:
+    """Epoch milliseconds of an ISO date, epoch number or now[+-]N<unit> date math"""
+
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+
+    match = DATE_MATH.match(value.strip())
+    if match:
+        now_ms = int(time.time() * 1000)
+        if match.group(1):
+            delta = int(match.group(2)) * DATE_UNITS[match.group(3)] * 1000
+            now_ms += delta if match.group(1) == '+' else -delta
+        return now_ms
+
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return (parsed - EPOCH) // timedelta(milliseconds=1)
+
+
+def _normalize_sort(sort) -> List:
+    """Sort as a list of clauses (accepts 'field:order' strings)"""
+
+    if not sort:
+        return []
+    if isinstance(sort, (str, dict)):
+        sort = [sort]
+
+    clauses = []
+    for clause in sort:
+        if isinstance(clause, str):
+            for part in clause.split(','):
+                field, _, order = part.partition(':')
+                clauses.append({field: {'order': order}} if order else field)
+        else:
+            clauses.append(clause)
+    return clauses
+
+
+def _sort_field(clause) -> str:
+    return clause if isinstance(clause, str) else next(iter(clause))
+
+
+def _sort_order(clause) -> str:
+    if isinstance(clause, str):
+        return 'asc'
+    spec = next(iter(clause.values()))
+    return spec.get('order', 'asc') if isinstance(spec, dict) else str(spec)
+
+
+def _is_descending(sort: List) -> bool:
+    """Order of the first timestamp or document-order sort clause"""
+
+    for clause in sort:
+        if _sort_field(clause) in TIMESTAMP_FIELDS + ('_doc', '_shard_doc'):
+            return _sort_order(clause) == 'desc'
+    return False
+
+
+def _sort_value(clause, position: int, dataset: Dataset):
+    field = _sort_field(clause)
+    if field in TIMESTAMP_FIELDS:
+        return dataset.timestamp_ms(position)
+    if field in ('_doc', '_shard_doc'):
+        return position
+    return None
+
+
+def _seconds(value) -> float:
+    """Seconds in an Elasticsearch time value such as 30s, 5m or 1h"""
+
+    value = str(value).strip()
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    for unit in ('ms', 's', 'm', 'h', 'd'):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * units[unit]
+    return float(value)
+
+
+def _iso(ms: int) -> str:
+    return (EPOCH + timedelta(milliseconds=ms)).isoformat(timespec='milliseconds') + 'Z'
+
+
+def _took(started: float) -> int:
+    return int((time.perf_counter() - started) * 1000)
+
+
+def _shards() -> Dict:
+    return {'total': 1, 'successful': 1, 'skipped': 0, 'failed': 0}
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+@click.option('--port', default=9200, type=int, help='Bind port (default: 9200)')
+@click.option('--records', default='100k', help='Documents served, e.g. 100k, 10m (default: 100k)')
+@click.option('--seed', default=0, type=int, help='Dataset and fault seed (default: 0)')
+@click.option('--algorithm', type=click.Choice(LogDecryptor.SUPPORTED_ALGORITHMS),
+              default='AES-256-CBC', help='Encryption algorithm (default: AES-256-CBC)')
+@click.option('--layout', type=click.Choice(fixtures.LAYOUTS), default='concat',
+              help='Ciphertext layout (default: concat)')
+@click.option('--failure-ratio', default=0.0, type=float,
+              help='Fraction of undecryptable documents (default: 0)')
+@click.option('--duplicate-ratio', default=0.0, type=float,
+              help='Fraction of duplicated documents (default: 0)')
+@click.option('--latency', default=0.0, type=float, help='Milliseconds added to every response')
+@click.option('--latency-jitter', default=0.0, type=float,
+              help='Up to this many extra milliseconds per response')
+@click.option('--per-hit-latency', default=0.0, type=float,
+              help='Microseconds added per returned hit')
+@click.option('--max-page-size', type=int, help='Return at most this many hits per response')
+@click.option('--error-rate', default=0.0, type=float,
+              help='Fraction of data requests answered with an error status')
+@click.option('--error-status', multiple=True, type=int,
+              help='Injected error status, repeatable (default: 503)')
+@click.option('--drop-rate', default=0.0, type=float,
+              help='Fraction of data requests whose connection is dropped')
+def main(host, port, records, seed, algorithm, layout, failure_ratio, duplicate_ratio, latency,
+         latency_jitter, per_hit_latency, max_page_size, error_rate, error_status, drop_rate):
+    """Serve synthetic encrypted logs over the Elasticsearch API."""
+
+    dataset = Dataset(fixtures.parse_count(records), seed=seed, algorithm=algorithm,
+                      layout=layout, failure_ratio=failure_ratio, duplicate_ratio=duplicate_ratio)
+    server = StandinServer(dataset, host=host, port=port, latency=latency / 1000,
+                           latency_jitter=latency_jitter / 1000,
+                           per_hit_latency=per_hit_latency / 1e6, max_page_size=max_page_size,
+                           error_rate=error_rate, error_statuses=error_status or (503,),
+                           drop_rate=drop_rate, seed=seed)
+
+    print(f'Serving {dataset.records:,} {algorithm} documents on {server.url} '
+          f'(key {fixtures.KEY})', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Fetch benchmarks against the local Elasticsearch stand-in
+
+Starts es_standin servers in-process and measures records/sec (best of
+--repeat runs) for:
+
+  * fetch.search          - KibanaClient.fetch_logs, one request per page
+  * fetch.scroll          - KibanaClient.fetch_logs_scroll over --records documents
+  * fetch.async_clusters  - AsyncKibanaClient fan-out over two stand-in clusters
+
+Every response carries --latency milliseconds of simulated network delay,
+so the numbers reflect request patterns rather than the local machine.
+
+Usage:
+    python benchmarks/fetch.py
+    python benchmarks/fetch.py --records 200k --latency 20
+    python benchmarks/fetch.py --update-baseline
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from baseline import (exit_with_regressions, find_regressions, load_baseline,  # noqa: E402
+                      report, save_baseline)
+from es_standin import Dataset, StandinServer  # noqa: E402
+from generate_large_test import parse_count  # noqa: E402
+
+# Hits per page for search and scroll
+PAGE_SIZE = 1000
+
+
+def best_of(repeat: int, func) -> float:
+    """Best wall time in seconds over repeat runs"""
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_search(results: dict, url: str, records: int, repeat: int):
+    from src.kibana_client import KibanaClient
+
+    client = KibanaClient(url)
+    pages = max(records // PAGE_SIZE, 1)
+
+    def run():
+        for _ in range(pages):
+            client.fetch_logs('logs-*', size=PAGE_SIZE)
+
+    seconds = best_of(repeat, run)
+    client.close()
+    results['fetch.search.records_per_sec'] = pages * PAGE_SIZE / seconds
+
+
+def bench_scroll(results: dict, url: str, records: int, repeat: int):
+    from src.kibana_client import KibanaClient
+
+    client = KibanaClient(url)
+    seconds = best_of(repeat, lambda: client.fetch_logs_scroll('logs-*', scroll_size=PAGE_SIZE))
+    client.close()
+    results['fetch.scroll.records_per_sec'] = records / seconds
+
+
+def bench_async_clusters(results: dict, urls: list, repeat: int):
+    from src.async_kibana_client import AsyncKibanaClient
+
+    async def fetch():
+        async with AsyncKibanaClient(urls) as client:
+            return await client.fetch_logs('logs-*', size=PAGE_SIZE)
+
+    seconds = best_of(repeat, lambda: asyncio.run(fetch()))
+    results['fetch.async_clusters.records_per_sec'] = PAGE_SIZE / seconds
+
+
+@click.command()
+@click.option('--records', default='20k', help='Documents fetched per run (default: 20k)')
+@click.option('--latency', default=5.0, type=float,
+              help='Simulated milliseconds per response (default: 5)')
+@click.option('--repeat', default=3, type=int, help='Runs per benchmark, best is kept (default: 3)')
+@click.option('--tolerance', default=0.25, type=float,
+              help='Allowed throughput drop against the baseline (default: 0.25 = 25%)')
+@click.option('--update-baseline', is_flag=True, help='Store these results as the new baseline')
+def main(records, latency, repeat, tolerance, update_baseline):
+    """Measure fetch throughput against local stand-in clusters."""
+
+    count = parse_count(records)
+    results = {}
+
+    servers = [StandinServer(Dataset(count, seed=seed), port=0, latency=latency / 1000)
+               for seed in (0, 1)]
+    urls = [server.start() for server in servers]
+
+    try:
+        bench_search(results, urls[0], count, repeat)
+        bench_scroll(results, urls[0], count, repeat)
+        bench_async_clusters(results, urls, repeat)
+    finally:
+        for server in servers:
+            server.stop()
+
+    baseline = load_baseline('fetch')
+    report('Fetch throughput (higher is better)', results, baseline, '/s')
+
+    if update_baseline:
+        path = save_baseline('fetch', results)
+        print(f'\nBaseline written to {path.relative_to(ROOT)}')
+        return
+
+    exit_with_regressions(find_regressions(results, baseline, tolerance, lower_is_better=False))
+
+
+if __name__ == '__main__':
+    main()
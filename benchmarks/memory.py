@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Memory-usage regression harness
+
+Runs each case in a fresh subprocess against fixtures of increasing size
+and records:
+
+  * peak_rss      - peak resident set growth while the case runs (bytes)
+  * traced_peak   - peak memory allocated by Python during the case (tracemalloc)
+  * blocks        - memory blocks still allocated by the case when it returns
+
+Memory growth per record (slope between the smallest and largest size) is
+then checked against a budget:
+
+  * streaming cases must stay flat: their memory must not depend on the
+    number of records beyond STREAMING_BYTES_PER_RECORD
+  * buffered cases hold every record in memory; their growth must stay
+    within the documented bytes-per-record budget in BUDGETS
+
+Sink cases receive already decrypted logs, so their numbers only cover the
+memory the sink itself needs on top of its input. Slopes are also compared
+with benchmarks/baselines/memory.json.
+
+Usage:
+    python benchmarks/memory.py
+    python benchmarks/memory.py --sizes 20k,100k,500k --only main.file
+    python benchmarks/memory.py --update-baseline
+"""
+
+import gc
+import io
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from baseline import (exit_with_regressions, find_regressions, load_baseline,  # noqa: E402
+                      report, save_baseline)
+from generate_large_test import KEY, parse_count, write_fixture  # noqa: E402
+
+# Allowed growth per record for streaming cases (allocator noise only)
+STREAMING_BYTES_PER_RECORD = 16
+
+# Documented memory budgets per record for buffered cases: measured peak
+# RSS growth with the ~300 byte generate_large_test.py records, plus ~50%
+# headroom. Larger records scale these roughly linearly.
+BUDGETS = {
+    # Whole file text plus one dict per record
+    'read.json': 4_500,
+    # One dict per record; lines are parsed as they are read
+    'read.ndjson': 6_000,
+    # decrypt_hits adds encrypted_/decrypted_ copies to every record
+    'decrypt': 1_000,
+    # decrypt_records releases each hit as its LogRecord is built
+    'decrypt.records': 900,
+    # read + decrypt + save_json for a --file job
+    'main.file': 5_000,
+    # rich keeps a table row per record
+    'sink.print_table': 18_000,
+    # The whole document is rendered with syntax highlighting and line
+    # numbers before printing; by far the most expensive output per record
+    'sink.print_json': 200_000,
+}
+
+# name -> ('streaming' or 'buffered', fraction of --sizes the case runs at);
+# terminal sinks render through rich and are far slower per record
+CASES = {
+    'fixture.write': ('streaming', 1),
+    'read.json': ('buffered', 1),
+    'read.ndjson': ('buffered', 1),
+    'decrypt': ('buffered', 1),
+    'decrypt.records': ('buffered', 1),
+    'main.file': ('buffered', 1),
+    'sink.save_json': ('streaming', 1),
+    'sink.save_text': ('streaming', 1),
+    'sink.save_csv': ('streaming', 1),
+    'sink.print_text': ('streaming', 0.1),
+    'sink.print_json': ('buffered', 0.025),
+    'sink.print_table': ('buffered', 0.025),
+}
+
+
+def current_rss() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS (VmHWM) for this process (Linux only)"""
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def decrypt_hits(logs: list, decryptor) -> list:
+    """Decrypt hits in place, keeping them as dicts (the baseline of decrypt.records)"""
+    from src.pipeline import decrypt_log
+
+    for log in logs:
+        decrypt_log(log, decryptor)
+    return logs
+
+
+def decrypted_logs(fixture_dir: Path, records: int) -> list:
+    from src.decryptor import LogDecryptor
+    from src.pipeline import decrypt_records
+    from src.reader import read_logs_from_file
+
+    logs = read_logs_from_file(str(fixture_dir / f'{records}.json'))
+    return decrypt_records(logs, LogDecryptor(KEY))[0]
+
+
+def prepare(case: str, fixture_dir: Path, records: int, output: Path):
+    """Build the case's input and return a callable running the case"""
+
+    if case == 'fixture.write':
+        return lambda: write_fixture(output, records, 'ndjson', workers=1)
+
+    if case.startswith('read.'):
+        from src.reader import read_logs_from_file
+        path = fixture_dir / f"{records}.{case.split('.')[1]}"
+        return lambda: read_logs_from_file(str(path))
+
+    if case == 'decrypt':
+        from src.decryptor import LogDecryptor
+        from src.reader import read_logs_from_file
+        logs = read_logs_from_file(str(fixture_dir / f'{records}.json'))
+        decryptor = LogDecryptor(KEY)
+        return lambda: decrypt_hits(logs, decryptor)
+
+    if case == 'decrypt.records':
+        from src.decryptor import LogDecryptor
+        from src.pipeline import decrypt_records
+        from src.reader import read_logs_from_file
+        logs = read_logs_from_file(str(fixture_dir / f'{records}.json'))
+        decryptor = LogDecryptor(KEY)
+        return lambda: decrypt_records(logs, decryptor)
+
+    if case == 'main.file':
+        from loggin_genie import main
+        args = ['--file', str(fixture_dir / f'{records}.json'), '--key', KEY,
+                '--format', 'json', '--output', str(output)]
+        return lambda: main.main(args, standalone_mode=False)
+
+    from rich.console import Console
+    from src.formatter import LogFormatter
+
+    logs = decrypted_logs(fixture_dir, records)
+    formatter = LogFormatter()
+    sink = case.split('.', 1)[1]
+
+    if sink.startswith('save_'):
+        return lambda: getattr(formatter, sink)(logs, output)
+
+    # Terminal sinks write to a discarding console
+    formatter._console = Console(file=io.TextIOWrapper(open('/dev/null', 'wb')), width=120)
+    return lambda: getattr(formatter, sink)(logs)
+
+
+def run_child(case: str, fixture_dir: Path, records: int, trace: bool) -> dict:
+    """Measure one case in this process"""
+
+    output = Path(tempfile.mkdtemp()) / 'out'
+    run = prepare(case, fixture_dir, records, output)
+
+    gc.collect()
+    rss_before = current_rss()
+    reset_peak_rss()
+
+    if trace:
+        tracemalloc.start()
+
+    result = run()
+
+    measured = {'peak_rss': max(peak_rss() - rss_before, 0)}
+    if trace:
+        measured['traced_peak'] = tracemalloc.get_traced_memory()[1]
+        # Blocks still held on return (the case's result stays alive here)
+        measured['blocks'] = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        tracemalloc.stop()
+
+    del result
+    return measured
+
+
+def measure(case: str, fixture_dir: Path, records: int) -> dict:
+    """Run a case in fresh subprocesses, with and without tracemalloc"""
+
+    measured = {}
+    # tracemalloc's own bookkeeping inflates RSS, so RSS is measured untraced
+    for trace in (False, True):
+        proc = subprocess.run(
+            [sys.executable, __file__, '--child', case, '--fixture-dir', str(fixture_dir),
+             '--records', str(records)] + (['--trace'] if trace else []),
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        measured.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return measured
+
+
+def check(case: str, rows: list, results: dict) -> list:
+    """Compute per-record growth and return budget violations"""
+
+    (small, first), (large, last) = rows[0], rows[-1]
+    span = large - small
+    violations = []
+
+    for metric in ('traced_peak', 'peak_rss'):
+        slope = max(last[metric] - first[metric], 0) / span
+        results[f'{case}.{metric}.bytes_per_record'] = slope
+
+        mode = CASES[case][0]
+        if mode == 'streaming':
+            limit = STREAMING_BYTES_PER_RECORD
+            # RSS moves in pages and arenas; allow it some slack on small runs
+            if metric == 'peak_rss':
+                limit += 4 * 1024 * 1024 / span
+        else:
+            limit = BUDGETS[case]
+
+        if slope > limit:
+            violations.append(f'{case}: {metric} grows {slope:,.0f} bytes/record '
+                              f'({mode} budget {limit:,.0f})')
+
+    return violations
+
+
+@click.command()
+@click.option('--sizes', default='20k,60k', help='Fixture sizes, at least two (default: 20k,60k)')
+@click.option('--only', type=click.Choice(list(CASES)), multiple=True, help='Run only these cases')
+@click.option('--tolerance', default=0.25, type=float,
+              help='Allowed growth increase against the baseline (default: 0.25 = 25%)')
+@click.option('--update-baseline', is_flag=True, help='Store these results as the new baseline')
+@click.option('--child', hidden=True)
+@click.option('--fixture-dir', hidden=True, type=click.Path())
+@click.option('--records', hidden=True, type=int)
+@click.option('--trace', hidden=True, is_flag=True)
+def main(sizes, only, tolerance, update_baseline, child, fixture_dir, records, trace):
+    """Measure memory growth of streaming and buffered paths."""
+
+    if child:
+        print(json.dumps(run_child(child, Path(fixture_dir), records, trace)))
+        return
+
+    counts = sorted({parse_count(s) for s in sizes.split(',')})
+    if len(counts) < 2:
+        raise click.BadParameter('at least two sizes are needed to measure growth', param_hint='--sizes')
+
+    cases = list(only or CASES)
+    results = {}
+    violations = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fixture_counts = sorted({max(int(count * CASES[case][1]), 100)
+                                 for case in cases for count in counts})
+        for count in fixture_counts:
+            write_fixture(tmp / f'{count}.json', count, 'json', workers=1, layout='concat')
+            write_fixture(tmp / f'{count}.ndjson', count, 'ndjson', workers=1, layout='concat')
+
+        print(f"{'Case':<20}{'Mode':<11}{'Records':>10}{'Peak RSS':>14}{'Traced peak':>14}{'Blocks':>10}")
+        for case in cases:
+            mode, scale = CASES[case]
+            rows = []
+            for count in counts:
+                count = max(int(count * scale), 100)
+                measured = measure(case, tmp, count)
+                rows.append((count, measured))
+                print(f"{case:<20}{mode:<11}{count:>10,}{measured['peak_rss'] / 1e6:>12.1f}MB"
+                      f"{measured['traced_peak'] / 1e6:>12.1f}MB{measured['blocks']:>10,}", flush=True)
+            violations += check(case, rows, results)
+
+    baseline = load_baseline('memory')
+    report('Memory growth per record (lower is better)', results, baseline, 'B/rec')
+
+    if update_baseline:
+        merged = dict(baseline.get('results', {}), **results)
+        path = save_baseline('memory', merged)
+        print(f'\nBaseline written to {path.relative_to(ROOT)}')
+        exit_with_regressions(violations)
+        return
+
+    # Small absolute slopes are noise; compare only against meaningful baselines
+    regressions = find_regressions(
+        {name: value for name, value in results.items() if value > STREAMING_BYTES_PER_RECORD},
+        baseline, tolerance, lower_is_better=True,
+    )
+    exit_with_regressions(violations + regressions)
+
+
+if __name__ == '__main__':
+    main()
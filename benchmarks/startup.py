@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the loggin_genie CLI
+
+The API spawns the CLI once per job, so interpreter start-up and imports
+are paid on every request. This measures (median of several runs):
+
+  * import_ms      - cumulative `python -X importtime` time of loggin_genie
+  * help_ms        - wall time of `loggin_genie.py --help`
+  * file_job_ms    - wall time of a small headless --file job (JSON output)
+
+and checks that the headless --file job does not import modules it never
+uses (elasticsearch, rich, asyncio, the GCM backend).
+
+Usage:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --update-baseline
+"""
+
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from baseline import (exit_with_regressions, find_regressions, load_baseline,
+                      report, save_baseline)
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / 'loggin_genie.py'
+KEY = '04c8ec0929fb619f3da9151d542ef41591044245bebb0cb22f9704645a99e948'
+
+# Top-level packages a headless AES-CBC --file job must not import
+FORBIDDEN_IMPORTS = ['elasticsearch', 'elastic_transport', 'aiohttp', 'rich',
+                     'asyncio', 'cryptography']
+
+
+def write_fixture(path: Path, count: int = 10):
+    """Write a small AES-256-CBC encrypted log file"""
+
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+
+    key = bytes.fromhex(KEY)
+    logs = []
+    for i in range(count):
+        cipher = AES.new(key, AES.MODE_CBC)
+        ciphertext = cipher.encrypt(pad(f'startup benchmark message {i}'.encode(), AES.block_size))
+        logs.append({
+            '_id': str(i),
+            '_index': 'bench',
+            '_source': {
+                '@timestamp': f'2026-01-01T00:00:{i:02d}Z',
+                'message': base64.b64encode(cipher.iv + ciphertext).decode(),
+            },
+        })
+
+    path.write_text(json.dumps(logs), encoding='utf-8')
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Map module name -> cumulative import time (us) from -X importtime output"""
+
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def run(args: list, env: dict) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def timed(args: list, env: dict, runs: int) -> float:
+    """Median wall time in milliseconds"""
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run(args, env)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+@click.command()
+@click.option('--runs', default=7, type=int, help='Runs per measurement (default: 7)')
+@click.option('--tolerance', default=0.25, type=float,
+              help='Allowed slowdown against the baseline (default: 0.25 = 25%)')
+@click.option('--update-baseline', is_flag=True, help='Store these results as the new baseline')
+def main(runs, tolerance, update_baseline):
+    """Measure CLI startup time and compare it with the stored baseline."""
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = Path(tmp) / 'logs.json'
+        output = Path(tmp) / 'out.json'
+        write_fixture(fixture)
+
+        job = [str(SCRIPT), '--file', str(fixture), '--key', KEY,
+               '--format', 'json', '--output', str(output)]
+
+        # Warm the bytecode cache so the first run is not an outlier
+        run(job, env)
+
+        import_samples = []
+        for _ in range(runs):
+            proc = run(['-X', 'importtime', '-c', 'import loggin_genie'], env)
+            import_samples.append(parse_importtime(proc.stderr)['loggin_genie'] / 1000)
+
+        results = {
+            'import_ms': statistics.median(import_samples),
+            'help_ms': timed([str(SCRIPT), '--help'], env, runs),
+            'file_job_ms': timed(job, env, runs),
+        }
+
+        imported = parse_importtime(run(['-X', 'importtime', *job], env).stderr)
+
+    unexpected = sorted(name for name in FORBIDDEN_IMPORTS if name in imported)
+
+    baseline = load_baseline('startup')
+    report('CLI startup', results, baseline, 'ms')
+
+    if update_baseline:
+        path = save_baseline('startup', results)
+        print(f'\nBaseline written to {path.relative_to(ROOT)}')
+        return
+
+    regressions = find_regressions(results, baseline, tolerance, lower_is_better=True)
+    regressions += [f'headless --file job imported {name}' for name in unexpected]
+    exit_with_regressions(regressions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmarks for the decrypt, parse and format hot paths
+
+Measures records/sec and bytes/sec (best of --repeat runs, and of at least
+MIN_SECONDS of runs) for:
+
+  * decrypt.<algorithm>     - LogDecryptor.decrypt for every supported algorithm
+  * read.<format>.<size>    - read_logs_from_file on JSON arrays and NDJSON
+  * sink.<method>           - every LogFormatter save_*/print_* sink
+
+Results are compared with benchmarks/baselines/throughput.json and the
+script exits non-zero when any metric drops by more than --tolerance.
+
+Usage:
+    python benchmarks/throughput.py
+    python benchmarks/throughput.py --sizes 10k,1m,10m
+    python benchmarks/throughput.py --update-baseline
+"""
+
+import base64
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from baseline import (exit_with_regressions, find_regressions, load_baseline,  # noqa: E402
+                      report, save_baseline)
+from src.decryptor import LogDecryptor  # noqa: E402
+from src.formatter import LogFormatter  # noqa: E402
+from src.reader import read_logs_from_file  # noqa: E402
+
+KEY = '04c8ec0929fb619f3da9151d542ef41591044245bebb0cb22f9704645a99e948'
+LEVELS = ['INFO', 'WARN', 'ERROR', 'DEBUG']
+SERVICES = ['user-service', 'auth-service', 'payment-service', 'order-service']
+
+# Shortest time each benchmark keeps repeating for, in seconds: a sink
+# writing 2000 records takes a few milliseconds, so a best of three would
+# fall inside a single burst of scheduling noise
+MIN_SECONDS = 1.0
+
+# Distinct ciphertexts per fixture; larger fixtures cycle through them so
+# generating 10M records does not require 10M encryptions
+UNIQUE_MESSAGES = 2000
+
+
+def parse_size(value: str) -> int:
+    """Parse 10k / 1m / 10m style record counts"""
+
+    value = value.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1], 1)
+    return int(value.rstrip('km')) * multiplier
+
+
+def encrypt(plaintext: str, key: bytes, algorithm: str) -> str:
+    """Encrypt in the layout LogDecryptor expects (IV [+ tag] + ciphertext)"""
+
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+
+    if 'CBC' in algorithm:
+        cipher = AES.new(key, AES.MODE_CBC)
+        return base64.b64encode(cipher.iv + cipher.encrypt(pad(plaintext.encode(), AES.block_size))).decode()
+
+    cipher = AES.new(key, AES.MODE_GCM, nonce=os.urandom(12))
+    ciphertext, tag = cipher.encrypt_and_digest(plaintext.encode())
+    return base64.b64encode(cipher.nonce + tag + ciphertext).decode()
+
+
+def make_ciphertexts(algorithm: str, count: int) -> list:
+    key = LogDecryptor(KEY, algorithm).key
+    return [
+        encrypt(f'Benchmark event {i}: user_{i % 97} completed request in {i % 500}ms', key, algorithm)
+        for i in range(count)
+    ]
+
+
+def make_source(i: int, message) -> dict:
+    return {
+        '@timestamp': f'2026-01-01T{(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d}.000Z',
+        'level': LEVELS[i % len(LEVELS)],
+        'service': SERVICES[i % len(SERVICES)],
+        'host': f'server-{i % 10}',
+        'message': message,
+    }
+
+
+def write_fixture(path: Path, count: int, ndjson: bool):
+    """Write an encrypted AES-256-CBC fixture of count records"""
+
+    ciphertexts = make_ciphertexts('AES-256-CBC', min(count, UNIQUE_MESSAGES))
+    messages = itertools.cycle(ciphertexts)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        if ndjson:
+            for i in range(count):
+                f.write(json.dumps(make_source(i, next(messages))))
+                f.write('\n')
+        else:
+            f.write('[')
+            for i in range(count):
+                if i:
+                    f.write(',')
+                f.write(json.dumps({'_id': str(i), '_index': 'bench',
+                                    '_source': make_source(i, next(messages))}))
+            f.write(']')
+
+
+def best_of(repeat: int, func) -> float:
+    """Best wall time in seconds over repeat runs, or over MIN_SECONDS of runs"""
+
+    best = float('inf')
+    deadline = time.perf_counter() + MIN_SECONDS
+    runs = 0
+    while runs < repeat or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+        runs += 1
+    return best
+
+
+def bench_decrypt(results: dict, records: int, repeat: int):
+    for algorithm in LogDecryptor.SUPPORTED_ALGORITHMS:
+        decryptor = LogDecryptor(KEY, algorithm)
+        ciphertexts = make_ciphertexts(algorithm, records)
+        nbytes = sum(len(c) for c in ciphertexts)
+
+        def run():
+            for ciphertext in ciphertexts:
+                decryptor.decrypt(ciphertext)
+
+        seconds = best_of(repeat, run)
+        results[f'decrypt.{algorithm}.records_per_sec'] = records / seconds
+        results[f'decrypt.{algorithm}.bytes_per_sec'] = nbytes / seconds
+
+
+def bench_read(results: dict, sizes: list, repeat: int, tmp: Path):
+    for count, label in sizes:
+        for fmt in ('json', 'ndjson'):
+            path = tmp / f'read-{label}.{fmt}'
+            write_fixture(path, count, ndjson=fmt == 'ndjson')
+            nbytes = path.stat().st_size
+
+            seconds = best_of(repeat, lambda: read_logs_from_file(str(path)))
+            results[f'read.{fmt}.{label}.records_per_sec'] = count / seconds
+            results[f'read.{fmt}.{label}.bytes_per_sec'] = nbytes / seconds
+            path.unlink()
+
+
+def bench_sinks(results: dict, records: int, repeat: int, tmp: Path):
+    from rich.console import Console
+
+    logs = []
+    for i in range(records):
+        source = make_source(i, f'Benchmark event {i}')
+        source['decrypted_message'] = source['message']
+        source['_decrypted'] = True
+        logs.append({'_id': str(i), '_index': 'bench', '_source': source})
+
+    formatter = LogFormatter()
+    # name -> (sink, file it writes or None for terminal output)
+    sinks = {
+        'save_json': (lambda: formatter.save_json(logs, tmp / 'sink.json'), tmp / 'sink.json'),
+        'save_text': (lambda: formatter.save_text(logs, tmp / 'sink.txt'), tmp / 'sink.txt'),
+        'save_csv': (lambda: formatter.save_csv(logs, tmp / 'sink.csv'), tmp / 'sink.csv'),
+        'print_json': (lambda: formatter.print_json(logs), None),
+        'print_text': (lambda: formatter.print_text(logs), None),
+        'print_table': (lambda: formatter.print_table(logs), None),
+    }
+
+    # The sinks take turns, one best_of() each per round, so noise lasting
+    # a few seconds on a shared host cannot decide any sink's result
+    best = {}
+    for _ in range(repeat):
+        for name, (sink, path) in sinks.items():
+            output = io.StringIO()
+            formatter._console = Console(file=output, width=120, force_terminal=False)
+
+            def run():
+                output.seek(0)
+                output.truncate()
+                sink()
+
+            seconds = min(best.get(name, float('inf')), best_of(1, run))
+            best[name] = seconds
+            nbytes = path.stat().st_size if path else len(output.getvalue().encode('utf-8'))
+
+            results[f'sink.{name}.records_per_sec'] = records / seconds
+            results[f'sink.{name}.bytes_per_sec'] = nbytes / seconds
+
+
+@click.command()
+@click.option('--sizes', default='10k', help='Record counts for read benchmarks (default: 10k)')
+@click.option('--decrypt-records', default=20000, type=int,
+              help='Records per decrypt benchmark (default: 20000)')
+@click.option('--sink-records', default=2000, type=int,
+              help='Records per sink benchmark (default: 2000)')
+@click.option('--repeat', default=3, type=int, help='Runs per benchmark, best is kept (default: 3)')
+@click.option('--only', type=click.Choice(['decrypt', 'read', 'sink']), multiple=True,
+              help='Run only these groups')
+@click.option('--tolerance', default=0.25, type=float,
+              help='Allowed throughput drop against the baseline (default: 0.25 = 25%)')
+@click.option('--update-baseline', is_flag=True, help='Store these results as the new baseline')
+def main(sizes, decrypt_records, sink_records, repeat, only, tolerance, update_baseline):
+    """Measure hot-path throughput and compare it with the stored baseline."""
+
+    groups = set(only or ['decrypt', 'read', 'sink'])
+    size_list = [(parse_size(s), s.strip().lower()) for s in sizes.split(',')]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if 'decrypt' in groups:
+            bench_decrypt(results, decrypt_records, repeat)
+        if 'read' in groups:
+            bench_read(results, size_list, repeat, Path(tmp))
+        if 'sink' in groups:
+            bench_sinks(results, sink_records, repeat, Path(tmp))
+
+    baseline = load_baseline('throughput')
+    report('Throughput (higher is better)', results, baseline, '/s')
+
+    if update_baseline:
+        # Keep baseline entries for groups/sizes that were not run this time
+        merged = dict(baseline.get('results', {}), **results)
+        path = save_baseline('throughput', merged)
+        print(f'\nBaseline written to {path.relative_to(ROOT)}')
+        return
+
+    exit_with_regressions(find_regressions(results, baseline, tolerance, lower_is_better=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,7 @@ from Crypto.Util.Padding import pad
 from Crypto.Random import get_random_bytes
 from src.decryptor import LogDecryptor
 import json
+import threading
 
 
 def encrypt_sample_data(plaintext: str, key: bytes, algorithm: str = 'AES-256-CBC') -> str:
@@ -135,5 +136,742 @@ def main():
         print("✗ Error: Decryption does not match")
 
 
+def test_client_registry():
+    """Pooled clients are reused per cluster and credentials, pinged once per TTL and closed when idle"""
+    import time
+    from src.connection_pool import ClientRegistry
+    
+    registry = ClientRegistry(connections_per_node=4, keep_alive=60.0, health_ttl=60.0)
+    key, es = registry.get('http://127.0.0.1:9200/', username='reader', password='secret')
+    same_key, same_es = registry.get('http://127.0.0.1:9200', username='reader', password='secret')
+    other_key, other_es = registry.get('http://127.0.0.1:9200', api_key='key')
+    assert same_key == key and same_es is es and other_key != key and other_es is not es
+    assert 'secret' not in key and registry.stats()['in_use'] == 3
+    
+    pings = []
+    es.ping = lambda: pings.append(1) or True
+    assert registry.is_healthy(key) and registry.is_healthy(key) and len(pings) == 1
+    registry.invalidate(key)
+    assert registry.is_healthy(key) and len(pings) == 2
+    other_es.ping = lambda: False
+    assert not registry.is_healthy(other_key)
+    
+    # Clients in use are never closed, idle ones are after keep_alive
+    registry.keep_alive = 0.0
+    registry.release(key)
+    registry.release(other_key)
+    time.sleep(0.01)
+    registry.get('http://127.0.0.1:9201')
+    assert registry.stats()['clients'] == 2
+    registry.release(same_key)
+    time.sleep(0.01)
+    registry.get('http://127.0.0.1:9202')
+    stats = registry.stats()
+    assert stats['clients'] == 2 and stats['in_use'] == 2
+    assert registry.get('http://127.0.0.1:9200/', username='reader', password='secret')[1] is not es
+    
+    registry.close_all()
+    assert registry.stats()['clients'] == 0
+    print("✓ Client registry reuses, health-checks and closes pooled clients")
+
+
+def test_worker_jsonrpc():
+    """The resident worker answers pings, runs decrypt jobs and streams their records"""
+    import io
+    import tempfile
+    from src.connection_pool import ClientRegistry
+    from src.worker import DecryptionWorker, METHOD_NOT_FOUND, PARSE_ERROR
+    
+    key = get_random_bytes(32)
+    hits = [{'_index': 'logs', '_id': str(i),
+             '_source': {'message': encrypt_sample_data(f'message {i}', key)}} for i in range(5)]
+    hits[4]['_source']['message'] = 'bm90IGVuY3J5cHRlZA=='
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'logs.json'
+        source.write_text(json.dumps(hits))
+        output = Path(tmp) / 'out.json'
+        job = {'file': str(source), 'key': key.hex()}
+        requests = [
+            {'jsonrpc': '2.0', 'id': 1, 'method': 'ping'},
+            {'jsonrpc': '2.0', 'id': 2, 'method': 'decrypt',
+             'params': dict(job, output=str(output), progress=True)},
+            {'jsonrpc': '2.0', 'id': 3, 'method': 'decrypt', 'params': dict(job, stream=True)},
+            {'jsonrpc': '2.0', 'id': 4, 'method': 'decrypt', 'params': {'file': str(source)}},
+            {'jsonrpc': '2.0', 'id': 5, 'method': 'restart'},
+        ]
+        rfile = io.StringIO(''.join(json.dumps(request) + '\n' for request in requests)
+                            + '{"jsonrpc": \n')
+        wfile = io.StringIO()
+        
+        worker = DecryptionWorker(max_workers=2, stream_batch_size=2, registry=ClientRegistry())
+        try:
+            assert worker.serve(rfile, wfile) is False
+            stats = worker.stats()
+        finally:
+            worker.close()
+        
+        messages = [json.loads(line) for line in wfile.getvalue().splitlines()]
+        replies = {message.get('id'): message for message in messages if 'method' not in message}
+        
+        assert replies[1]['result']['pong'] is True
+        assert replies[2]['result'] == {'total': 5, 'decrypted': 4, 'failed': 1,
+                                        'output': str(output)}
+        assert replies[4]['error']['message'] == "'key' is required"
+        assert replies[5]['error']['code'] == METHOD_NOT_FOUND
+        assert replies[None]['error']['code'] == PARSE_ERROR
+        assert stats['jobs_completed'] == 2 and stats['jobs_failed'] == 1
+        
+        progress = [message['params'] for message in messages
+                    if message.get('method') == 'job.progress' and message['params']['id'] == 2]
+        assert progress[-1]['event'] == 'done'
+        assert progress[-1]['bytes_written'] == output.stat().st_size > 0
+        
+        # Streamed jobs send their records in batches instead of the result
+        batches = [message['params'] for message in messages
+                   if message.get('method') == 'job.records']
+        assert [batch['offset'] for batch in batches] == [0, 2, 4]
+        assert all(batch['id'] == 3 for batch in batches)
+        logs = [log for batch in batches for log in batch['logs']]
+        assert [log['_source'].get('decrypted_message') for log in logs] == \
+            [f'message {i}' for i in range(4)] + [None]
+        assert 'logs' not in replies[3]['result'] and replies[3]['result']['failed'] == 1
+    print("✓ Worker answers JSON-RPC requests and streams job records")
+
+
+class FakePitClient:
+    """Stands in for KibanaClient.iter_pit_pages() over a fixed list of hits"""
+    
+    def __init__(self, hits, fail_after_pages=None):
+        self.hits = hits
+        self.fail_after_pages = fail_after_pages
+    
+    def iter_pit_pages(self, index, query=None, page_size=1000, keep_alive='5m',
+                       pit_id=None, search_after=None, **kwargs):
+        remaining = [hit for hit in self.hits if search_after is None or hit['sort'] > search_after]
+        for page, start in enumerate(range(0, len(remaining), page_size)):
+            if self.fail_after_pages is not None and page >= self.fail_after_pages:
+                raise ConnectionError("connection lost")
+            yield [dict(hit) for hit in remaining[start:start + page_size]], 'pit-1'
+
+
+def test_export_resume():
+    """An interrupted export resumes where it stopped, writing every record once"""
+    import tempfile
+    from src.export import export_logs
+    
+    key = get_random_bytes(32)
+    
+    hits = [{'_index': 'logs', '_id': f'log-{i}', 'sort': [1700000000000 + i // 2, i],
+             '_source': {'@timestamp': 1700000000000 + i // 2,
+                         'message': encrypt_sample_data(f'message {i}', key)}}
+            for i in range(25)]
+    decryptor = LogDecryptor(key=key.hex(), algorithm='AES-256-CBC')
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / 'export.json'
+        try:
+            export_logs(FakePitClient(hits, fail_after_pages=2), 'logs', None, decryptor, output,
+                        'job', page_size=10)
+            raise AssertionError("the export should have been interrupted")
+        except ConnectionError:
+            pass
+        
+        state = export_logs(FakePitClient(hits), 'logs', None, decryptor, output, 'job',
+                            page_size=10, resume=True)
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+    
+    assert state['complete'] and state['records'] == 25 and state['failed'] == 0
+    assert [record['_id'] for record in records] == [hit['_id'] for hit in hits]
+    assert records[3]['_source']['decrypted_message'] == 'message 3'
+    print("✓ Export resume writes every record exactly once")
+
+
+def test_read_new_logs_rotation():
+    """Incremental reads follow appends, rotation and truncate-and-rewrite"""
+    import os
+    import tempfile
+    from src.reader import read_new_logs
+    
+    def lines(*messages):
+        return ''.join(json.dumps({'message': message}) + '\n' for message in messages)
+    
+    def messages(logs):
+        return [log['_source']['message'] for log in logs]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'app.ndjson'
+        path.write_text(lines('a', 'b') + '{"message": "partial')
+        logs, watermark = read_new_logs(str(path))
+        assert messages(logs) == ['a', 'b']
+        
+        with open(path, 'a') as f:
+            f.write('"}\n' + lines('c'))
+        logs, watermark = read_new_logs(str(path), watermark)
+        assert messages(logs) == ['partial', 'c']
+        
+        # Lines written just before rotation are read from the renamed file
+        with open(path, 'a') as f:
+            f.write(lines('d'))
+        os.rename(path, Path(tmp) / 'app.ndjson.1')
+        path.write_text(lines('e'))
+        warnings = []
+        logs, watermark = read_new_logs(str(path), watermark, on_warning=warnings.append)
+        assert messages(logs) == ['d', 'e'] and not warnings
+        
+        # Truncated and rewritten below HEAD_BYTES, to the same length
+        path.write_text(lines('x'))
+        logs, watermark = read_new_logs(str(path), watermark)
+        assert messages(logs) == ['x']
+        
+        # Rotated away without a trace: the skipped tail is reported
+        with open(path, 'a') as f:
+            f.write(lines('y'))
+        replacement = Path(tmp) / 'replacement'
+        replacement.write_text(lines('z'))
+        os.replace(replacement, path)
+        logs, watermark = read_new_logs(str(path), watermark, on_warning=warnings.append)
+        assert messages(logs) == ['z'] and len(warnings) == 1
+    
+    print("✓ Incremental reads follow appends, rotation and truncation")
+
+
+def test_compressed_input():
+    """Compression is detected from magic bytes and multi-frame files are read whole"""
+    import bz2
+    import gzip
+    import tempfile
+    from src.compression import detect_compression, open_log_file, zstd_available
+    
+    lines = [json.dumps({'message': f'line {i}'}) + '\n' for i in range(1000)]
+    first, second = ''.join(lines[:400]).encode(), ''.join(lines[400:]).encode()
+    files = {
+        None: first + second,
+        'gzip': gzip.compress(first) + gzip.compress(second),
+        'bzip2': bz2.compress(first + second),
+    }
+    if zstd_available():
+        import zstandard
+        files['zstd'] = (zstandard.ZstdCompressor().compress(first)
+                         + zstandard.ZstdCompressor().compress(second))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for compression, data in files.items():
+            # The name says nothing about the compression
+            path = Path(tmp) / f'{compression}.log'
+            path.write_bytes(data)
+            assert detect_compression(str(path)) == compression
+            for threaded in (False, True):
+                with open_log_file(str(path), threaded=threaded, buffer_size=4096) as f:
+                    assert f.readlines() == lines, (compression, threaded)
+            with open_log_file(str(path), binary=True) as f:
+                assert f.read() == first + second
+        
+        if not zstd_available():
+            path = Path(tmp) / 'zstd.log'
+            path.write_bytes(b'\x28\xb5\x2f\xfd' + bytes(16))
+            try:
+                open_log_file(str(path))
+                raise AssertionError("zstd input should need zstandard")
+            except RuntimeError:
+                pass
+    print("✓ Compressed input is detected and read whole")
+
+
+def test_batch_files():
+    """--file directories and globs are decrypted in parallel, merged or one output per file"""
+    import gzip
+    import tempfile
+    from src.batch import expand_inputs, output_name, process_files
+    from src.stats import LogSummary
+    
+    assert output_name('logs/app-01.ndjson.gz', 'json') == 'app-01.json'
+    assert output_name('app.v2.log', 'text') == 'app.v2.txt'
+    
+    key = get_random_bytes(32)
+    
+    def ndjson(*entries):
+        return ''.join(json.dumps({'@timestamp': timestamp,
+                                   'message': encrypt_sample_data(message, key)}) + '\n'
+                       for timestamp, message in entries)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'in'
+        (root / 'sub').mkdir(parents=True)
+        (root / 'app-01.ndjson.gz').write_bytes(gzip.compress(ndjson(
+            ('2026-01-01T00:00:01Z', 'a1'), ('2026-01-01T00:00:03Z', 'a3')).encode()))
+        (root / 'app-02.ndjson').write_text(ndjson(
+            ('2026-01-01T00:00:02Z', 'b2'), ('2026-01-01T00:00:04Z', 'b4')))
+        (root / 'sub' / 'app-03.ndjson').write_text(ndjson(('2026-01-01T00:00:00Z', 'c0')))
+        (root / '.app-04.ndjson').write_text(ndjson(('2026-01-01T00:00:05Z', 'hidden')))
+        (root / 'notes.txt').write_text('not encrypted\n')
+        
+        assert expand_inputs(str(root)) == [str(root / 'app-01.ndjson.gz'),
+                                            str(root / 'app-02.ndjson'), str(root / 'notes.txt')]
+        files = expand_inputs(str(root / '**' / '*.ndjson*'))
+        assert [Path(path).name for path in files] == ['app-01.ndjson.gz', 'app-02.ndjson',
+                                                       'app-03.ndjson']
+        assert expand_inputs(files[1]) == [files[1]] and expand_inputs(str(root / 'none*')) == []
+        
+        summary = LogSummary()
+        logs, results = process_files(files + [str(root / 'missing.ndjson')], key.hex(), workers=2,
+                                      merge_sorted=True, summary=summary)
+        assert [log.plaintext for log in logs] == ['c0', 'a1', 'b2', 'a3', 'b4']
+        assert [result['total'] for result in results] == [2, 2, 1, 0]
+        assert 'error' in results[3] and summary.total == 5
+        
+        out = Path(tmp) / 'out'
+        logs, results = process_files(files, key.hex(), workers=2, output_dir=str(out))
+        assert list(logs) == []
+        assert sorted(path.name for path in out.iterdir()) == ['app-01.json', 'app-02.json',
+                                                               'app-03.json']
+        saved = json.loads((out / 'app-02.json').read_text())
+        assert saved[1]['_source']['decrypted_message'] == 'b4'
+        
+        # Outputs named after inputs must not overwrite each other
+        (root / 'app-02.json').write_text('[]')
+        try:
+            process_files([str(root / 'app-02.ndjson'), str(root / 'app-02.json')], key.hex(),
+                          output_dir=str(out))
+            raise AssertionError("colliding output names should be rejected")
+        except ValueError:
+            pass
+    print("✓ Batch decryption expands inputs, merges and names outputs")
+
+
+def test_ndjson_stream_batches():
+    """Piped NDJSON is parsed as it arrives, not after the writer closes the pipe"""
+    import os
+    import threading
+    from src.reader import iter_ndjson_batches
+    
+    read_fd, write_fd = os.pipe()
+    first_batch = threading.Event()
+    
+    def writer():
+        with os.fdopen(write_fd, 'wb') as pipe:
+            pipe.write(b'{"message": "caf\xc3\xa9"}\n\n{"message": "sec')
+            pipe.flush()
+            # The rest is only written once the first line has been parsed
+            first_batch.wait(5)
+            pipe.write(b'ond"}\nplain text\n{"message": "last"}')
+    
+    thread = threading.Thread(target=writer)
+    thread.start()
+    batches = []
+    with os.fdopen(read_fd, 'rb') as pipe:
+        for batch in iter_ndjson_batches(pipe, block_size=8):
+            batches.append(batch)
+            first_batch.set()
+    thread.join()
+    
+    logs = [log for batch in batches for log in batch]
+    assert batches[0] == [{'_id': '0', '_index': 'file-logs', '_source': {'message': 'café'}}]
+    assert [log['_source']['message'] for log in logs] == ['café', 'second', 'plain text', 'last']
+    assert [log['_id'] for log in logs] == ['0', '2', '3', '4']
+    print("✓ NDJSON streams are parsed batch by batch as they arrive")
+
+
+def test_merge_by_timestamp():
+    """Sorted streams merge into one ordered stream, whatever the timestamp format"""
+    from src.merge import merge_by_timestamp
+    
+    def hit(name, timestamp):
+        return {'_id': name, '_source': {'@timestamp': timestamp}}
+    
+    first = [hit('a1', '2026-01-01T00:00:01Z'), hit('a2', 1767225603000)]
+    second = [hit('b1', '2026-01-01T00:00:00Z'), hit('b2', '2026-01-01T00:00:02+00:00'),
+              hit('b3', '2026-01-01T00:00:04Z')]
+    
+    merged = [log['_id'] for log in merge_by_timestamp([first, second], descending=False)]
+    assert merged == ['b1', 'a1', 'b2', 'a2', 'b3']
+    
+    newest_first = [list(reversed(first)), list(reversed(second)), []]
+    merged = [log['_id'] for log in merge_by_timestamp(newest_first)]
+    assert merged == ['b3', 'a2', 'b2', 'a1', 'b1']
+    print("✓ Timestamp merge orders hits across streams")
+
+
+def test_record_round_trip():
+    """Compact records serialise exactly like the decrypted hit dicts they replace"""
+    import copy
+    import pickle
+    from src.pipeline import decrypt_log, decrypt_records
+    from src.record import json_default
+    
+    key = get_random_bytes(32)
+    
+    decryptor = LogDecryptor(key=key.hex(), algorithm='AES-256-CBC')
+    hits = [
+        {'_index': 'logs', '_id': '1', '_score': None,
+         '_source': {'@timestamp': '2026-01-01T00:00:00Z', 'level': 'INFO',
+                     'message': encrypt_sample_data('hello', key)}, 'sort': [1767225600000]},
+        {'_index': 'logs', '_id': '2', '_source': {'level': 'ERROR', 'message': 'not encrypted'}},
+        {'_index': 'logs', '_id': '3', '_source': {'level': 'INFO'}},
+    ]
+    
+    for include_ciphertext in (True, False):
+        expected = copy.deepcopy(hits)
+        for hit in expected:
+            decrypt_log(hit, decryptor, include_ciphertext=include_ciphertext)
+        records, failed = decrypt_records(copy.deepcopy(hits), decryptor)
+        assert failed == 1 and [record.ok for record in records] == [True, False, True]
+        assert [record.to_hit(include_ciphertext) for record in records] == expected
+        assert json.loads(json.dumps(records, default=lambda obj: json_default(
+            obj, include_ciphertext=include_ciphertext))) == expected
+    
+    record = records[0]
+    assert record.get('_id') == '1' and record.get('sort') == [1767225600000]
+    assert record.value('level') == 'INFO' and record.plaintext == 'hello'
+    assert pickle.loads(pickle.dumps(record)).to_hit() == record.to_hit()
+    
+    # A job with a high-cardinality field does not stop sharing in later jobs
+    def level_hits(levels):
+        # join() gives every hit its own string object, as JSON parsing does
+        return [{'_id': str(i), '_source': {'level': ''.join(level)}}
+                for i, level in enumerate(levels)]
+    
+    decrypt_records(level_hits(f'level-{i}' for i in range(1000)), decryptor)
+    records, _ = decrypt_records(level_hits(['WARN', 'WARN']), decryptor)
+    assert records[0].value('level') is records[1].value('level')
+    print("✓ Compact records round-trip to decrypted hits")
+
+
+def test_summary_sketches():
+    """Heavy hitters and distinct counts stay accurate and merge like one pass"""
+    import random
+    from src.stats import HyperLogLog, SpaceSaving
+    
+    rng = random.Random(7)
+    items = [f'common-{i}' for i in range(5) for _ in range(200)]
+    items += [f'rare-{rng.randrange(5000)}' for _ in range(4000)]
+    rng.shuffle(items)
+    
+    top = SpaceSaving(capacity=100)
+    halves = [SpaceSaving(capacity=100), SpaceSaving(capacity=100)]
+    for i, item in enumerate(items):
+        top.add(item)
+        halves[i % 2].add(item)
+    halves[0].merge(halves[1])
+    
+    for sketch in (top, halves[0]):
+        ranked = sketch.top(5)
+        assert {item for item, _, _ in ranked} == {f'common-{i}' for i in range(5)}
+        # Counts overestimate by at most their error
+        assert all(count - error <= 200 <= count for _, count, error in ranked)
+    
+    distinct = HyperLogLog(precision=12)
+    parts = [HyperLogLog(precision=12), HyperLogLog(precision=12)]
+    for i in range(20000):
+        distinct.add(f'value-{i}')
+        parts[i % 2].add(f'value-{i}')
+    parts[0].merge(parts[1])
+    # ~1.6% standard error at precision 12
+    assert abs(distinct.count() - 20000) < 20000 * 0.05
+    assert parts[0].count() == distinct.count()
+    
+    small = HyperLogLog()
+    for value in ('a', 'b', 'c', 'a'):
+        small.add(value)
+    assert small.count() == 3
+    print("✓ Summary sketches find heavy hitters and count distinct values")
+
+
+def test_result_table():
+    """Arrow table filters and group-by counts match the decrypted logs"""
+    from src.pipeline import decrypt_records
+    from src.table import ResultTable, parse_interval, pyarrow_available
+    
+    assert parse_interval('15m') == (15, 'minute') and parse_interval('1d') == (1, 'day')
+    for interval in ('0h', '5w', 'soon'):
+        try:
+            parse_interval(interval)
+            raise AssertionError(f"{interval} should be rejected")
+        except ValueError:
+            pass
+    
+    if not pyarrow_available():
+        print("- ResultTable skipped (pyarrow not installed)")
+        return
+    
+    key = get_random_bytes(32)
+    decryptor = LogDecryptor(key=key.hex(), algorithm='AES-256-CBC')
+    hits = [{'_index': 'logs', '_id': str(i),
+             '_source': {'@timestamp': f'2026-02-01T{i // 4:02d}:{i % 4 * 15:02d}:00Z',
+                         'level': 'ERROR' if i % 3 == 0 else 'INFO',
+                         'service': f'service-{i % 2}',
+                         'message': encrypt_sample_data(f'request {i} timed out' if i % 5 == 0
+                                                        else f'request {i} ok', key)}}
+            for i in range(24)]
+    hits.append({'_index': 'logs', '_id': 'broken',
+                 '_source': {'@timestamp': 1769904000000, 'level': 'ERROR',
+                             'message': 'bm90IGVuY3J5cHRlZA=='}})
+    
+    records, failed = decrypt_records([dict(hit) for hit in hits], decryptor)
+    table = ResultTable.from_logs(records, batch_size=10)
+    assert len(table) == 25 and failed == 1
+    assert table.to_pylist()[3]['message'] == 'request 3 ok'
+    
+    errors = table.filter(level='ERROR', failed=False)
+    assert len(errors) == 8
+    assert len(table.filter(failed=True)) == 1
+    assert len(table.filter(contains='TIMED OUT', ignore_case=True)) == 5
+    assert len(table.filter(start='2026-02-01T01:00:00Z', end='2026-02-01T02:00:00Z')) == 4
+    assert len(table.filter(service=['service-0', 'service-1'], level='INFO')) == 16
+    
+    counts = table.count_by('service', 'level').to_pylist()
+    # Ties are ordered by the group columns
+    assert counts[:2] == [{'service': 'service-0', 'level': 'INFO', 'count': 8},
+                          {'service': 'service-1', 'level': 'INFO', 'count': 8}]
+    assert sum(row['count'] for row in counts) == 25
+    hourly = table.filter(failed=False).count_by(interval='1h').to_pylist()
+    assert len(hourly) == 6 and all(row['count'] == 4 for row in hourly)
+    print("✓ ResultTable filters and counts decrypted logs")
+
+
+class FakeCountClient:
+    """Stands in for KibanaClient.count() and date_histogram()"""
+    
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.counts = 0
+    
+    def count(self, index, query=None):
+        self.counts += 1
+        return sum(count for _, count in self.histogram)
+    
+    def date_histogram(self, index, query=None, buckets=200, field='@timestamp'):
+        return self.histogram, 1000
+
+
+class FakeSearchES:
+    """Stands in for Elasticsearch.search() over a number of matching logs"""
+    
+    def __init__(self, matches):
+        self.matches = matches
+        self.bodies = []
+    
+    def search(self, index=None, body=None):
+        self.bodies.append(body)
+        hits = [{'_id': str(i), '_source': {}} for i in range(min(body['size'], self.matches))]
+        total = ({'value': self.matches, 'relation': 'eq'} if body.get('track_total_hits')
+                 else {'value': min(self.matches, 10000), 'relation': 'gte'})
+        return {'hits': {'total': total, 'hits': hits}}
+
+
+def test_fetch_planning():
+    """Time ranges hold about equal shares of the logs; small fetches are not counted"""
+    from src.planner import balance_partitions, plan_fetch
+    
+    # A busy hour in the middle of quiet ones
+    histogram = [(hour * 3600000, 100) for hour in range(10)]
+    histogram[5] = (5 * 3600000, 3000)
+    partitions = balance_partitions(histogram, 3)
+    
+    assert partitions[0][0] is None and partitions[-1][1] is None
+    assert all(upper == lower for (_, upper, _), (lower, _, _) in zip(partitions, partitions[1:]))
+    assert sum(expected for _, _, expected in partitions) == 3900
+    # The busy bucket cannot be split, so it is a range of its own
+    assert (5 * 3600000, 6 * 3600000, 3000) in partitions
+    assert balance_partitions(histogram[:1], 4) == [(None, None, 100)]
+    
+    client = FakeCountClient([(minute * 60000, 1000) for minute in range(120)])
+    plan = plan_fetch(client, 'logs', None, 500, readers=4)
+    assert plan.strategy == 'search' and client.counts == 0
+    
+    # The uncounted search tracks total hits, so a small --size still warns
+    from src.kibana_client import KibanaClient
+    kibana = KibanaClient.__new__(KibanaClient)
+    kibana.es, kibana.controller, kibana.hit_cache = FakeSearchES(120000), None, None
+    assert not plan.truncated
+    logs = kibana.fetch_planned('logs', None, plan)
+    assert len(logs) == 500 and kibana.es.bodies[0]['track_total_hits'] is True
+    assert plan.total == 120000 and plan.truncated
+    
+    plan = plan_fetch(client, 'logs', None, 100)
+    kibana.es = FakeSearchES(40)
+    assert len(kibana.fetch_planned('logs', None, plan)) == 40
+    assert plan.total == 40 and not plan.truncated
+    
+    plan = plan_fetch(client, 'logs', None, 50000, readers=4)
+    assert plan.strategy == 'pit' and plan.truncated and client.counts == 1
+    
+    plan = plan_fetch(client, 'logs', None, 10 ** 9, readers=4)
+    assert plan.strategy == 'parallel' and not plan.truncated and plan.readers == 4
+    assert sum(expected for _, _, expected in plan.partitions) == 120000
+    assert len(plan.partitions) == 6
+    print("✓ Fetch planning balances time ranges and skips needless counts")
+
+
+class FakeShardES:
+    """Stands in for the point in time API over one log per millisecond"""
+    
+    def __init__(self, count, fail_lower=None):
+        self.count = count
+        self.fail_lower = fail_lower
+        self.searches = 0
+        self.open_pits = set()
+        self.lock = threading.Lock()
+    
+    def open_point_in_time(self, index, keep_alive):
+        with self.lock:
+            pit_id = f'pit-{len(self.open_pits)}-{self.searches}'
+            self.open_pits.add(pit_id)
+        return {'id': pit_id}
+    
+    def close_point_in_time(self, id):
+        with self.lock:
+            self.open_pits.discard(id)
+    
+    def search(self, body):
+        from elasticsearch import ConnectionError as ESConnectionError
+        
+        bounds = body['query']['bool']['filter'][1]['range']['@timestamp']
+        lower, upper = bounds.get('gte', 0), bounds.get('lt', self.count)
+        with self.lock:
+            self.searches += 1
+            if lower == self.fail_lower:
+                # Only the first attempt of this range fails
+                self.fail_lower = None
+                raise ESConnectionError('connection reset')
+        
+        descending = body['sort'][0]['@timestamp']['order'] == 'desc'
+        stamps = range(upper - 1, lower - 1, -1) if descending else range(lower, upper)
+        if body.get('search_after'):
+            after = body['search_after'][0]
+            stamps = [t for t in stamps if (t < after if descending else t > after)]
+        hits = [{'_id': str(t), '_source': {'@timestamp': t}, 'sort': [t, t]}
+                for t in list(stamps)[:body['size']]]
+        return {'hits': {'hits': hits}}
+
+
+def test_parallel_time_shards():
+    """Time ranges are fetched concurrently, retried alone and yielded in order"""
+    import sys
+    from src.kibana_client import KibanaClient
+    from src.metrics import Metrics
+    
+    shards = [(None, 250, 250), (250, 600, 350), (600, 900, 300), (900, None, 100)]
+    client = KibanaClient.__new__(KibanaClient)
+    client.controller = client.hit_cache = None
+    
+    client.es = FakeShardES(1000, fail_lower=600)
+    ranges = list(client.iter_time_shards('logs', None, shards, readers=3, page_size=64))
+    assert [number for number, _ in ranges] == [3, 2, 1, 0]
+    stamps = [hit['_source']['@timestamp'] for _, hits in ranges for hit in hits]
+    assert stamps == list(range(999, -1, -1)) and not client.es.open_pits
+    assert client.es.fail_lower is None
+    
+    client.es = FakeShardES(1000)
+    ranges = client.iter_time_shards('logs', None, shards, readers=2, ordered=False,
+                                     descending=False, page_size=100)
+    ranges = dict(ranges)
+    assert sorted(ranges) == [0, 1, 2, 3]
+    assert [hit['_id'] for hit in ranges[1]] == [str(t) for t in range(250, 600)]
+    
+    # Concurrent updates and reads of the metrics lose nothing
+    metrics = Metrics(enabled=True)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        def update():
+            for i in range(20000):
+                metrics.inc('records')
+                metrics.inc(f'key_{i % 50}')
+                metrics.observe('fetch', 0.001)
+        
+        threads = [threading.Thread(target=update) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            metrics.summary()
+            metrics.to_prometheus()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    
+    summary = metrics.summary()
+    assert summary['counters']['records'] == 80000 and summary['counters']['key_7'] == 1600
+    assert summary['stages']['fetch']['count'] == 80000
+    print("✓ Time ranges are fetched in parallel and metrics stay exact")
+
+
+def test_fetch_controller():
+    """Page size and concurrency grow on fast responses and back off on overload"""
+    import threading
+    from elastic_transport import ApiResponseMeta, HttpHeaders
+    from elasticsearch import ApiError
+    from src.throttle import FetchController
+    
+    controller = FetchController(page_size=1000, min_page_size=100, max_page_size=2000,
+                                 max_concurrency=3, target_latency=1.0, page_step=250)
+    for _ in range(20):
+        controller.call(lambda size: {'hits': size})
+    # Hard ceilings, however fast the responses
+    assert controller.page_size == 2000 and controller.concurrency == 3
+    
+    # A 429 halves both and the request is sent again
+    meta = ApiResponseMeta(status=429, http_version='1.1', headers=HttpHeaders({'retry-after': '0'}),
+                           duration=0.0, node=None)
+    attempts = []
+    
+    def overloaded_once(size):
+        attempts.append(size)
+        if len(attempts) == 1:
+            raise ApiError('too many requests', meta=meta, body={})
+        return {'hits': size}
+    
+    controller.call(overloaded_once)
+    assert attempts == [2000, 1000] and controller.concurrency == 1
+    
+    # Slow responses shrink the page, never below min_page_size
+    for _ in range(10):
+        controller._observe(controller.page_size, 4.0, None)
+    assert controller.page_size == 100
+    
+    # Requests in flight never exceed the allowed concurrency
+    controller = FetchController(concurrency=2, max_concurrency=2)
+    lock = threading.Lock()
+    in_flight = [0, 0]
+    
+    def request(size):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        threading.Event().wait(0.01)
+        with lock:
+            in_flight[0] -= 1
+    
+    threads = [threading.Thread(target=controller.call, args=(request,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert in_flight[1] <= 2
+    print("✓ Fetch controller adapts within its ceilings")
+
+
+def run_tests():
+    """Behaviour tests of the processing modules"""
+    
+    print("\n=== Module Tests ===\n")
+    test_client_registry()
+    test_worker_jsonrpc()
+    test_export_resume()
+    test_read_new_logs_rotation()
+    test_compressed_input()
+    test_batch_files()
+    test_ndjson_stream_batches()
+    test_merge_by_timestamp()
+    test_record_round_trip()
+    test_summary_sketches()
+    test_result_table()
+    test_fetch_planning()
+    test_parallel_time_shards()
+    test_fetch_controller()
+
+
 if __name__ == '__main__':
     main()
+    run_tests()
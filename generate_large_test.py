@@ -1,23 +1,112 @@
 #!/usr/bin/env python3
-"""Generate a large test file with 200+ encrypted Kibana logs"""
+"""
+Generate large encrypted Kibana log fixtures
 
+Output is deterministic for a given --seed: records are built in fixed-size
+chunks, each from its own seeded RNG, so the bytes written do not depend on
+the number of worker processes. Chunks are generated in parallel and
+streamed to disk in order, either as NDJSON (one source document per line)
+or as a JSON array of Elasticsearch hits.
+
+Every LogDecryptor algorithm is supported, in both ciphertext layouts:
+
+  * concat - base64(IV [+ tag] + ciphertext)
+  * colon  - base64(IV):base64(ciphertext), or IV:tag:ciphertext for GCM
+
+Usage:
+    python generate_large_test.py
+    python generate_large_test.py --count 10m --output /tmp/logs-10m.ndjson
+    python generate_large_test.py --algorithm all --layout concat \\
+        --failure-ratio 0.01 --duplicate-ratio 0.05 --output /tmp/logs.ndjson
+"""
+
+import base64
+import functools
 import json
+import os
 import random
-from datetime import datetime, timedelta
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad
-import base64
+import time
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import click
+
+from src.decryptor import LogDecryptor
+
+# Encryption key (hex), same as examples/encryption_key.txt
+KEY = '04c8ec0929fb619f3da9151d542ef41591044245bebb0cb22f9704645a99e948'
+
+LAYOUTS = ['concat', 'colon']
+FORMATS = ['ndjson', 'json']
+
+# Ways a generated record is made undecryptable
+FAILURE_KINDS = ['truncated', 'not_base64']
+
+# Records per chunk; part of the seed derivation, so changing it changes output
+CHUNK_SIZE = 10_000
+
+START_TIME = '2026-02-01T00:00:00Z'
+
+
+@functools.lru_cache(maxsize=None)
+def _raw_key(key: str, algorithm: str) -> bytes:
+    """Key bytes exactly as LogDecryptor derives them for this algorithm"""
+
+    return LogDecryptor(key, algorithm).key
+
+
+def encrypt(plaintext: str, key: bytes, algorithm: str, layout: str = 'concat',
+            iv: Optional[bytes] = None, truncate: bool = False) -> str:
+    """
+    Encrypt a message in a layout LogDecryptor can read
+
+    Args:
+        plaintext: Message to encrypt
+        key: Raw key bytes
+        algorithm: One of LogDecryptor.SUPPORTED_ALGORITHMS
+        layout: 'concat' or 'colon'
+        iv: IV/nonce to use (default: random)
+        truncate: Drop the last ciphertext byte so decryption fails
+
+    Returns:
+        Encrypted message string
+    """
+
+    data = plaintext.encode('utf-8')
 
-# Encryption key
-KEY = bytes.fromhex('04c8ec0929fb619f3da9151d542ef41591044245bebb0cb22f9704645a99e948')
+    if 'CBC' in algorithm:
+        iv = iv or os.urandom(16)
+        padding = 16 - len(data) % 16
+        encryptor = _cipher(key, iv)
+        parts = [iv, encryptor.update(data + bytes([padding]) * padding) + encryptor.finalize()]
+    else:
+        iv = iv or os.urandom(12)
+        # AESGCM appends the tag; LogDecryptor expects it before the ciphertext
+        sealed = _aesgcm(key).encrypt(iv, data, None)
+        parts = [iv, sealed[-16:], sealed[:-16]]
+
+    if truncate:
+        parts[-1] = parts[-1][:-1]
+
+    if layout == 'colon':
+        return ':'.join(base64.b64encode(part).decode('ascii') for part in parts)
+    return base64.b64encode(b''.join(parts)).decode('ascii')
+
+
+def _cipher(key: bytes, iv: bytes):
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    return Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+
+
+@functools.lru_cache(maxsize=None)
+def _aesgcm(key: bytes):
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    return AESGCM(key)
 
-def encrypt_aes_cbc(plaintext, key):
-    """Encrypt with AES-256-CBC"""
-    cipher = AES.new(key, AES.MODE_CBC)
-    ct_bytes = cipher.encrypt(pad(plaintext.encode('utf-8'), AES.block_size))
-    iv = base64.b64encode(cipher.iv).decode('utf-8')
-    ct = base64.b64encode(ct_bytes).decode('utf-8')
-    return f"{iv}:{ct}"
 
 # Services and their typical messages
 SERVICES = {
@@ -142,167 +231,329 @@ EVENTS = ['page_view', 'button_click', 'form_submit', 'video_play', 'download',
 PAGES = ['/home', '/products', '/checkout', '/profile', '/search', '/cart', '/help', '/about']
 SEARCH_QUERIES = ['laptop deals', 'wireless headphones', 'gaming mouse', 'office chair', '4k monitor', 'usb-c cable']
 
-def generate_message(service):
+def generate_message(service: str, rng: random.Random) -> str:
     """Generate a realistic log message for the service"""
-    template = random.choice(SERVICES[service])
+    template = rng.choice(SERVICES[service])
     
     # Fill in template placeholders
     if service == 'user-service':
-        return template.format(random.choice(USERNAMES))
+        return template.format(rng.choice(USERNAMES))
     elif service == 'auth-service':
         if 'provider' in template:
-            return template.format(random.choice(['Google', 'Facebook', 'GitHub']))
+            return template.format(rng.choice(['Google', 'Facebook', 'GitHub']))
         elif 'attempting to access' in template:
-            return template.format(random.choice(USERNAMES), random.choice(PAGES))
+            return template.format(rng.choice(USERNAMES), rng.choice(PAGES))
         elif 'client' in template:
-            return template.format(f'CLIENT-{random.randint(1000,9999)}')
+            return template.format(f'CLIENT-{rng.randint(1000,9999)}')
         else:
-            return template.format(random.choice(USERNAMES))
+            return template.format(rng.choice(USERNAMES))
     elif service == 'payment-service':
         if 'Amount' in template:
-            return template.format(random.choice(ORDERS), f'{random.randint(10, 500):.2f}')
+            return template.format(rng.choice(ORDERS), f'{rng.randint(10, 500):.2f}')
         elif 'Reason' in template:
-            return template.format(random.choice(ORDERS), random.choice(ERROR_REASONS))
+            return template.format(rng.choice(ORDERS), rng.choice(ERROR_REASONS))
         elif 'customer' in template:
-            return template.format(random.choice(USERNAMES))
+            return template.format(rng.choice(USERNAMES))
         else:
-            return template.format(random.choice(TRANSACTIONS))
+            return template.format(rng.choice(TRANSACTIONS))
     elif service == 'notification-service':
         if 'device' in template:
-            return template.format(f'DEVICE-{random.randint(1000,9999)}')
+            return template.format(f'DEVICE-{rng.randint(1000,9999)}')
         elif 'users' in template:
-            return template.format(random.randint(10, 1000))
+            return template.format(rng.randint(10, 1000))
         elif 'template' in template:
-            return template.format(random.choice(['welcome_email', 'order_confirmation', 'password_reset']))
+            return template.format(rng.choice(['welcome_email', 'order_confirmation', 'password_reset']))
         else:
-            return template.format(random.choice(EMAILS))
+            return template.format(rng.choice(EMAILS))
     elif service == 'analytics-service':
         if 'Event tracked' in template:
-            return template.format(random.choice(EVENTS), random.choice(USERNAMES))
+            return template.format(rng.choice(EVENTS), rng.choice(USERNAMES))
         elif 'funnel step' in template:
-            return template.format(random.randint(1, 5), random.choice(USERNAMES))
+            return template.format(rng.randint(1, 5), rng.choice(USERNAMES))
         elif 'variant' in template:
-            return template.format(random.choice(['A', 'B']), random.choice(USERNAMES))
+            return template.format(rng.choice(['A', 'B']), rng.choice(USERNAMES))
         elif 'Custom metric' in template:
-            return template.format(random.choice(['conversion_rate', 'avg_session_time', 'bounce_rate']), 
-                                 f'{random.uniform(0.1, 100):.2f}')
+            return template.format(rng.choice(['conversion_rate', 'avg_session_time', 'bounce_rate']), 
+                                 f'{rng.uniform(0.1, 100):.2f}')
         elif 'spent' in template:
-            return template.format(random.choice(USERNAMES), random.randint(1, 60), random.choice(PAGES))
+            return template.format(rng.choice(USERNAMES), rng.randint(1, 60), rng.choice(PAGES))
         elif 'report' in template:
             return template.format('January 2026')
         elif 'Dashboard' in template:
-            return template.format(random.choice(['sales', 'users', 'traffic']))
+            return template.format(rng.choice(['sales', 'users', 'traffic']))
         elif 'event' in template:
-            return template.format(random.choice(EVENTS))
+            return template.format(rng.choice(EVENTS))
         elif 'segment' in template:
-            return template.format(random.choice(['high_value_customers', 'returning_users', 'new_signups']))
+            return template.format(rng.choice(['high_value_customers', 'returning_users', 'new_signups']))
         else:
-            return template.format(random.choice(['Summer Sale', 'Email Campaign']), f'{random.uniform(0.5, 10):.1f}')
+            return template.format(rng.choice(['Summer Sale', 'Email Campaign']), f'{rng.uniform(0.5, 10):.1f}')
     elif service == 'inventory-service':
         if 'updated' in template or 'available' in template:
-            return template.format(random.choice(PRODUCTS), random.randint(0, 500))
+            return template.format(rng.choice(PRODUCTS), rng.randint(0, 500))
         elif 'alert' in template or 'Backorder' in template or 'out of stock' in template:
-            return template.format(random.choice(PRODUCTS))
+            return template.format(rng.choice(PRODUCTS))
         elif 'warehouse' in template and 'added' in template:
-            return template.format(random.choice(PRODUCTS), f'WH-{random.randint(1,5)}')
+            return template.format(rng.choice(PRODUCTS), f'WH-{rng.randint(1,5)}')
         elif 'sync' in template or 'import' in template:
-            return template.format(random.randint(50, 500))
+            return template.format(rng.randint(50, 500))
         elif 'transfer' in template:
-            return template.format(random.randint(10, 100), random.choice(PRODUCTS), 
-                                 f'WH-{random.randint(1,5)}', f'WH-{random.randint(1,5)}')
+            return template.format(rng.randint(10, 100), rng.choice(PRODUCTS), 
+                                 f'WH-{rng.randint(1,5)}', f'WH-{rng.randint(1,5)}')
         elif 'discrepancy' in template:
-            return template.format(random.choice(PRODUCTS))
+            return template.format(rng.choice(PRODUCTS))
         else:
-            return template.format(random.choice(ORDERS))
+            return template.format(rng.choice(ORDERS))
     elif service == 'order-service':
-        order_id = random.choice(ORDERS)
+        order_id = rng.choice(ORDERS)
         if 'created' in template:
-            return template.format(order_id, random.choice(USERNAMES))
+            return template.format(order_id, rng.choice(USERNAMES))
         elif 'status updated' in template:
-            return template.format(order_id, random.choice(['processing', 'shipped', 'delivered', 'cancelled']))
+            return template.format(order_id, rng.choice(['processing', 'shipped', 'delivered', 'cancelled']))
         elif 'shipped' in template:
-            return template.format(order_id, random.choice(['FedEx', 'UPS', 'USPS']), 
-                                 f'1Z{random.randint(100000000,999999999)}')
+            return template.format(order_id, rng.choice(['FedEx', 'UPS', 'USPS']), 
+                                 f'1Z{rng.randint(100000000,999999999)}')
         elif 'cancelled by' in template:
-            return template.format(order_id, random.choice(USERNAMES))
+            return template.format(order_id, rng.choice(USERNAMES))
         else:
             return template.format(order_id)
     elif service == 'search-service':
         if 'query executed' in template:
-            return template.format(random.choice(SEARCH_QUERIES), random.randint(0, 500))
+            return template.format(rng.choice(SEARCH_QUERIES), rng.randint(0, 500))
         elif 'index updated' in template:
-            return template.format(random.randint(100, 10000))
+            return template.format(rng.randint(100, 10000))
         elif 'Autocomplete' in template or 'Zero results' in template:
-            return template.format(random.choice(SEARCH_QUERIES))
+            return template.format(rng.choice(SEARCH_QUERIES))
         elif 'filter applied' in template:
-            return template.format(random.choice(['price', 'category', 'brand']), random.choice(USERNAMES))
+            return template.format(rng.choice(['price', 'category', 'brand']), rng.choice(USERNAMES))
         elif 'Popular' in template:
             return template.format('last 7 days')
         elif 'relevance' in template or 'synonym' in template:
-            return template.format(random.choice(['electronics', 'accessories', 'computers']))
+            return template.format(rng.choice(['electronics', 'accessories', 'computers']))
         else:
-            return template.format(random.choice(SEARCH_QUERIES), random.randint(50, 500))
+            return template.format(rng.choice(SEARCH_QUERIES), rng.randint(50, 500))
     
     return template
 
-def generate_logs(count=200):
-    """Generate encrypted Kibana logs"""
-    logs = []
-    start_time = datetime.now() - timedelta(hours=24)
-    
-    for i in range(count):
-        # Generate timestamp
-        timestamp = start_time + timedelta(seconds=random.randint(0, 86400))
-        
-        # Select service
-        service = random.choice(list(SERVICES.keys()))
-        
-        # Generate message
-        message = generate_message(service)
-        
-        # Select log level (weighted)
-        level = random.choices(LOG_LEVELS, weights=LEVEL_WEIGHTS)[0]
-        
-        # Encrypt the message
-        encrypted_message = encrypt_aes_cbc(message, KEY)
-        
-        # Create log entry
-        log_entry = {
-            "_index": random.choice(INDICES),
-            "_id": f"log-{i+1:04d}",
+
+def record_time(i: int, count: int, start: str = START_TIME, span: float = 86400.0) -> datetime:
+    """Timestamp (naive UTC) of record i; records are spread evenly over span seconds"""
+
+    return _parse_start(start) + timedelta(seconds=i * span / max(count - 1, 1))
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_start(start: str) -> datetime:
+    return datetime.fromisoformat(start.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def generate_chunk(chunk_index: int, count: int, seed: int = 0,
+                   algorithm: str = 'AES-256-CBC', layout: str = 'colon', key: str = KEY,
+                   failure_ratio: float = 0.0, duplicate_ratio: float = 0.0,
+                   start: str = START_TIME, span: float = 86400.0,
+                   chunk_size: int = CHUNK_SIZE) -> List[dict]:
+    """
+    Generate one chunk of encrypted log hits
+
+    Chunk chunk_index holds records [chunk_index * chunk_size, ...) of a
+    fixture of count records. Its content depends only on the arguments, so
+    chunks can be generated in any order or process.
+
+    Args:
+        chunk_index: Chunk number
+        count: Total records in the fixture
+        seed: Fixture seed
+        algorithm: Encryption algorithm
+        layout: Ciphertext layout ('concat' or 'colon')
+        key: Encryption key, in any format LogDecryptor accepts
+        failure_ratio: Fraction of records whose message cannot be decrypted
+        duplicate_ratio: Fraction of records repeating an earlier record of the chunk
+        start: Timestamp of the first record (ISO 8601)
+        span: Seconds between the first and last record
+        chunk_size: Records per chunk
+
+    Returns:
+        List of hits in Elasticsearch format, in timestamp order
+    """
+
+    rng = random.Random(f'{seed}:{chunk_index}')
+    raw_key = _raw_key(key, algorithm)
+    iv_size = 16 if 'CBC' in algorithm else 12
+    services = list(SERVICES)
+
+    first = chunk_index * chunk_size
+    hits = []
+
+    for i in range(first, min(first + chunk_size, count)):
+        if hits and rng.random() < duplicate_ratio:
+            # Same _id and content, as when a document is delivered twice
+            original = rng.choice(hits)
+            hits.append(dict(original, _source=dict(original['_source'])))
+            continue
+
+        timestamp = record_time(i, count, start, span)
+        service = rng.choice(services)
+        message = generate_message(service, rng)
+        level = rng.choices(LOG_LEVELS, weights=LEVEL_WEIGHTS)[0]
+
+        failure = rng.choice(FAILURE_KINDS) if rng.random() < failure_ratio else None
+        if failure == 'not_base64':
+            encrypted_message = f'!{message}'
+        else:
+            encrypted_message = encrypt(message, raw_key, algorithm, layout,
+                                        iv=rng.randbytes(iv_size), truncate=failure == 'truncated')
+
+        hits.append({
+            "_index": rng.choice(INDICES),
+            "_id": f"log-{i + 1:04d}",
             "_score": None,
             "_source": {
-                "@timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+                "@timestamp": timestamp.isoformat(timespec='milliseconds') + "Z",
                 "level": level,
                 "service": service,
                 "message": encrypted_message,
-                "host": f"server-{random.randint(1,10)}",
-                "environment": random.choice(["production", "staging"]),
-                "request_id": f"req-{random.randint(100000,999999)}",
-                "duration_ms": random.randint(10, 5000) if random.random() > 0.7 else None
+                "host": f"server-{rng.randint(1, 10)}",
+                "environment": rng.choice(["production", "staging"]),
+                "request_id": f"req-{rng.randint(100000, 999999)}",
+                "duration_ms": rng.randint(10, 5000) if rng.random() > 0.7 else None
             }
-        }
-        
-        logs.append(log_entry)
-    
-    # Sort by timestamp
-    logs.sort(key=lambda x: x['_source']['@timestamp'])
-    
-    return logs
-
-# Generate the logs
-print("Generating 200 encrypted log entries...")
-logs = generate_logs(200)
-
-# Write to file
-output_file = 'examples/kibana_logs_large.json'
-with open(output_file, 'w') as f:
-    json.dump(logs, f, indent=2)
-
-print(f"✅ Generated {len(logs)} logs")
-print(f"📝 Saved to: {output_file}")
-print(f"📊 Services: {list(SERVICES.keys())}")
-print(f"📈 Log levels distribution:")
-for level in LOG_LEVELS:
-    count = sum(1 for log in logs if log['_source']['level'] == level)
-    print(f"   {level}: {count}")
+        })
+
+    return hits
+
+
+def iter_hits(count: int, chunk_size: int = CHUNK_SIZE, **options) -> Iterator[dict]:
+    """Yield the hits of a fixture in order, one chunk in memory at a time"""
+
+    for chunk_index in range(_chunk_count(count, chunk_size)):
+        yield from generate_chunk(chunk_index, count, chunk_size=chunk_size, **options)
+
+
+def _chunk_count(count: int, chunk_size: int) -> int:
+    return (count + chunk_size - 1) // chunk_size
+
+
+def _render_chunk(chunk_index: int, count: int, format: str, **options) -> str:
+    """Generate a chunk and serialise it for the output format"""
+
+    hits = generate_chunk(chunk_index, count, **options)
+    if format == 'ndjson':
+        return ''.join(json.dumps(hit['_source']) + '\n' for hit in hits)
+    return ',\n'.join(json.dumps(hit) for hit in hits)
+
+
+def write_fixture(path, count: int, format: str = 'ndjson', workers: Optional[int] = None,
+                  chunk_size: int = CHUNK_SIZE, **options) -> int:
+    """
+    Generate a fixture and stream it to a file
+
+    Args:
+        path: Output file
+        count: Number of records
+        format: 'ndjson' (source documents) or 'json' (array of hits)
+        workers: Generator processes (default: CPU count)
+        chunk_size: Records per chunk
+        **options: Passed to generate_chunk (seed, algorithm, layout, ...)
+
+    Returns:
+        Number of bytes written
+    """
+
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported format: {format}. Supported: {', '.join(FORMATS)}")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    chunks = range(_chunk_count(count, chunk_size))
+    render = functools.partial(_render_chunk, count=count, format=format,
+                               chunk_size=chunk_size, **options)
+    workers = min(workers or os.cpu_count() or 1, len(chunks)) or 1
+
+    with open(path, 'w', encoding='utf-8') as f:
+        if format == 'json':
+            f.write('[\n')
+
+        def write_all(rendered):
+            for i, text in enumerate(rendered):
+                if format == 'json' and i:
+                    f.write(',\n')
+                f.write(text)
+
+        if workers > 1:
+            with Pool(workers) as pool:
+                # imap keeps chunk order, so output is identical to a serial run
+                write_all(pool.imap(render, chunks))
+        else:
+            write_all(map(render, chunks))
+
+        if format == 'json':
+            f.write('\n]\n')
+
+        return f.tell()
+
+
+def parse_count(value: str) -> int:
+    """Parse 200 / 10k / 10m style record counts"""
+
+    value = value.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1], 1)
+    return int(value.rstrip('km')) * multiplier
+
+
+def output_path(output: str, algorithm: str, algorithms: List[str]) -> Path:
+    """Output path, suffixed with the algorithm when several are generated"""
+
+    path = Path(output)
+    if len(algorithms) == 1:
+        return path
+    return path.with_name(f'{path.stem}-{algorithm.lower()}{path.suffix}')
+
+
+@click.command()
+@click.option('--count', default='200', help='Number of records, e.g. 200, 10k, 10m (default: 200)')
+@click.option('--output', '-o', default='examples/kibana_logs_large.json',
+              help='Output file (default: examples/kibana_logs_large.json)')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS),
+              help='Output format (default: ndjson for .ndjson files, json otherwise)')
+@click.option('--seed', default=0, type=int, help='Seed; equal seeds give identical files (default: 0)')
+@click.option('--algorithm', '-a', multiple=True,
+              type=click.Choice(LogDecryptor.SUPPORTED_ALGORITHMS + ['all']),
+              help='Encryption algorithm, repeatable or "all" (default: AES-256-CBC)')
+@click.option('--layout', type=click.Choice(LAYOUTS), default='colon',
+              help='Ciphertext layout (default: colon)')
+@click.option('--key', default=KEY, help='Encryption key (default: examples/encryption_key.txt)')
+@click.option('--failure-ratio', default=0.0, type=float,
+              help='Fraction of records that cannot be decrypted (default: 0)')
+@click.option('--duplicate-ratio', default=0.0, type=float,
+              help='Fraction of records that repeat an earlier record (default: 0)')
+@click.option('--start', default=START_TIME, help=f'First timestamp (default: {START_TIME})')
+@click.option('--span', default=86400.0, type=float,
+              help='Seconds covered by the timestamps (default: 86400)')
+@click.option('--workers', '-w', type=int, help='Generator processes (default: CPU count)')
+def main(count, output, fmt, seed, algorithm, layout, key, failure_ratio, duplicate_ratio,
+         start, span, workers):
+    """Generate a deterministic encrypted log fixture."""
+
+    records = parse_count(count)
+    fmt = fmt or ('ndjson' if output.endswith('.ndjson') else 'json')
+    algorithms = list(algorithm) or ['AES-256-CBC']
+    if 'all' in algorithms:
+        algorithms = list(LogDecryptor.SUPPORTED_ALGORITHMS)
+
+    for name in algorithms:
+        path = output_path(output, name, algorithms)
+        print(f"Generating {records:,} {name} log entries ({layout} layout, seed {seed})...")
+
+        started = time.perf_counter()
+        written = write_fixture(path, records, fmt, workers=workers, seed=seed, algorithm=name,
+                                layout=layout, key=key, failure_ratio=failure_ratio,
+                                duplicate_ratio=duplicate_ratio, start=start, span=span)
+        elapsed = time.perf_counter() - started
+
+        print(f"✅ Generated {records:,} logs, {written / 1e6:.1f} MB in {elapsed:.2f}s "
+              f"({records / elapsed:,.0f} records/s)")
+        print(f"📝 Saved to: {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,90 +5,306 @@ Loggin Genie - Decrypt encrypted logs from Kibana/Elasticsearch
 
 import click
 import json
+import os
 import sys
 from pathlib import Path
-from rich.console import Console
-from rich.table import Table
 from dotenv import load_dotenv
-import os
 
-from src.kibana_client import KibanaClient
+# Heavy dependencies (elasticsearch, asyncio, rich, crypto backends) are
+# imported on the code paths that need them to keep per-job startup fast
+from src.console import get_console
 from src.decryptor import LogDecryptor
 from src.formatter import LogFormatter
+from src.reader import load_watermarks, read_logs_from_file, read_new_logs, save_watermarks
+from src.pipeline import append_output, decrypt_log, decrypt_records, output_format, save_output
+from src.batch import expand_inputs
+from src.progress import ProgressReporter
+from src.metrics import metrics
 
 # Load environment variables
 load_dotenv()
 
-console = Console()
+console = get_console()
+
+
+def result_callback(reporter=None, summary=None):
+    """on_result callback feeding finished logs to the progress reporter and summary"""
+    
+    callbacks = [callback for callback in (reporter and reporter.add_record,
+                                           summary and summary.add) if callback]
+    if len(callbacks) < 2:
+        return callbacks[0] if callbacks else None
+    
+    def on_result(log, ok):
+        for callback in callbacks:
+            callback(log, ok)
+    return on_result
+
+
+def fetch_controller(adaptive_fetch: bool, max_page_size: int, workers: int):
+    """FetchController for --adaptive-fetch, None without it"""
+    if not adaptive_fetch:
+        return None
+    from src.throttle import FetchController
+    
+    return FetchController(page_size=min(1000, max_page_size),
+                           min_page_size=min(100, max_page_size),
+                           max_page_size=max_page_size, max_concurrency=max(workers, 1))
+
+
+def save_summary(summary, output):
+    """Write a job's summary next to its output"""
+    from src.stats import summary_path
+    
+    path = summary.save(summary_path(output))
+    console.print(f"[green]Summary saved to {path}[/green]")
+
+
+async def fetch_logs_concurrently(urls: list, indices: list, query, size: int,
+                                  username=None, password=None, api_key=None) -> list:
+    """
+    Fetch logs from several clusters and index patterns concurrently
+    
+    Args:
+        urls: Elasticsearch URLs
+        indices: Index names or patterns
+        query: Elasticsearch query DSL
+        size: Number of logs to fetch in total
+    
+    Returns:
+        List of log entries merged by timestamp
+    """
+    from src.async_kibana_client import AsyncKibanaClient
+    
+    async with AsyncKibanaClient(
+        elasticsearch_urls=urls,
+        username=username,
+        password=password,
+        api_key=api_key
+    ) as client:
+        return await client.fetch_logs(index=indices, query=query, size=size)
+
+
+def decrypt_stdin(decryptor: LogDecryptor, field: str, output=None, reporter=None,
+                  include_ciphertext: bool = True, summary=None):
+    """
+    Decrypt NDJSON read from stdin, writing each record as NDJSON as soon as
+    its line has arrived
+    
+    Args:
+        decryptor: Decryptor to use
+        field: Field name containing encrypted data
+        output: File to write to instead of stdout
+        reporter: Progress reporter
+        include_ciphertext: Keep a copy of the ciphertext as encrypted_<field>
+        summary: LogSummary every record is added to
+    
+    Returns:
+        Tuple of (logs processed, number of failures)
+    """
+    from src.reader import iter_ndjson_batches
+    
+    out = open(output, 'w', encoding='utf-8') if output else sys.stdout
+    processed = failed = 0
+    on_result = result_callback(reporter, summary)
+    
+    def warn(msg):
+        console.print(f"[yellow]Warning: {msg}[/yellow]")
+    
+    try:
+        for batch in iter_ndjson_batches(sys.stdin.buffer):
+            if reporter:
+                reporter.add_fetched(len(batch))
+            
+            lines = []
+            for log in batch:
+                ok = decrypt_log(log, decryptor, field=field, on_warning=warn,
+                                 include_ciphertext=include_ciphertext)
+                if not ok:
+                    failed += 1
+                if on_result:
+                    on_result(log, ok)
+                lines.append(json.dumps(log, default=str))
+            processed += len(batch)
+            
+            text = '\n'.join(lines) + '\n'
+            out.write(text)
+            # Hand over everything read so far before waiting for more input
+            out.flush()
+            if reporter:
+                reporter.add_bytes_written(len(text.encode('utf-8')))
+    except BrokenPipeError:
+        # The reading end went away (e.g. piped into head); stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if output:
+            out.close()
+    
+    if metrics.enabled:
+        metrics.inc('records_decrypted', processed - failed)
+        metrics.inc('records_failed', failed)
+    
+    return processed, failed
 
 
-def read_logs_from_file(file_path: str) -> list:
+def decrypt_files(files: list, key: str, algorithm: str, field: str, workers: int,
+                  output=None, format: str = 'table', per_file: bool = False,
+                  merge_sorted: bool = False, include_ciphertext: bool = True,
+                  reporter=None, summary=None) -> int:
     """
-    Read logs from a JSON or NDJSON file
+    Decrypt several files in parallel and output them per file or combined
     
     Args:
-        file_path: Path to the log file
+        files: Input files
+        workers: Worker processes
+        output: Output file, or directory with per_file
+        per_file: Write one output per input file into the output directory
+        merge_sorted: Merge the files' logs by timestamp instead of concatenating
+        include_ciphertext: Keep a copy of the ciphertext as encrypted_<field> in JSON output
+        reporter: Progress reporter
+        summary: LogSummary every record is added to
     
     Returns:
-        List of log entries in Elasticsearch hit format
+        Number of files that could not be read
     """
-    logs = []
+    from src.batch import process_files
+    
+    console.print(f"[cyan]Decrypting {len(files)} files with "
+                  f"{max(1, min(workers, len(files)))} workers...[/cyan]")
+    
+    def on_file(result):
+        if 'error' in result:
+            console.print(f"[red]{result['file']}: {result['error']}[/red]")
+            return
+        console.print(f"[green]{result['file']}: decrypted {result['total'] - result['failed']} logs"
+                      + (f", {result['failed']} failed" if result['failed'] else '') + "[/green]")
+        if reporter:
+            reporter.add_fetched(result['total'])
+            if per_file:
+                reporter.add_results(result['total'] - result['failed'], result['failed'])
+    
+    logs, results = process_files(files, key, algorithm=algorithm, field=field, workers=workers,
+                                  output_dir=output if per_file else None, format=format,
+                                  merge_sorted=merge_sorted,
+                                  include_ciphertext=include_ciphertext, summary=summary,
+                                  on_file=on_file)
+    
+    total = sum(result['total'] for result in results)
+    failed_count = sum(result['failed'] for result in results)
+    errors = sum(1 for result in results if 'error' in result)
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read().strip()
+    if not per_file:
+        decrypted_logs = list(logs)
+        if reporter:
+            for log in decrypted_logs:
+                reporter.add_record(log, log.ok)
         
-        # Try to parse as JSON array first
-        try:
-            data = json.loads(content)
+        formatter = LogFormatter()
+        if output:
+            output_path = save_output(decrypted_logs, output, format=format, field=field,
+                                      formatter=formatter, include_ciphertext=include_ciphertext)
+            console.print(f"[green]Decrypted logs saved to {output}[/green]")
+            if reporter:
+                reporter.add_bytes_written(output_path.stat().st_size)
+        elif reporter:
+            # Records were already streamed as progress events
+            pass
+        elif format == 'json':
+            formatter.print_json(decrypted_logs, include_ciphertext=include_ciphertext)
+        elif format == 'text':
+            formatter.print_text(decrypted_logs, field=field)
+        else:
+            formatter.print_table(decrypted_logs, field=field)
+    elif reporter:
+        reporter.add_bytes_written(sum(Path(result['output']).stat().st_size
+                                       for result in results if 'output' in result))
+    
+    console.print(f"[green]Decrypted {total - failed_count} logs from "
+                  f"{len(files) - errors} files[/green]")
+    if failed_count > 0:
+        console.print(f"[yellow]Failed to decrypt {failed_count} logs[/yellow]")
+    if errors:
+        console.print(f"[red]Could not read {errors} of {len(files)} files[/red]")
+    if reporter:
+        reporter.finish(output=output, files=len(files), file_errors=errors)
+    
+    return errors
+
+
+def follow_logs(client, index: str, query, size: int, decryptor: LogDecryptor, field: str,
+                output=None, format: str = 'table', reporter=None,
+                min_interval: float = 1.0, max_interval: float = 30.0,
+                include_ciphertext: bool = True, summary=None):
+    """
+    Decrypt the most recent logs, then new logs as they arrive, until interrupted
+    
+    Args:
+        client: KibanaClient to poll
+        index: Index name or pattern
+        query: Elasticsearch query DSL
+        size: Number of most recent logs shown before following
+        output: File new logs are appended to (NDJSON for JSON output)
+        reporter: Progress reporter records are streamed to
+        min_interval: Shortest pause between polls (seconds)
+        max_interval: Longest pause between polls (seconds)
+        include_ciphertext: Keep a copy of the ciphertext as encrypted_<field> in JSON output
+        summary: LogSummary every record is added to, rewritten next to
+                 output after every batch
+    
+    Returns:
+        Tuple of (logs processed, number of failures)
+    """
+    import itertools
+    from src.follow import LogFollower
+    
+    follower = LogFollower(client, index, query=query,
+                           min_interval=min_interval, max_interval=max_interval)
+    formatter = LogFormatter()
+    processed = failed = 0
+    
+    if output:
+        # Like a regular run, start the output afresh
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        open(output, 'w').close()
+    
+    try:
+        for logs in itertools.chain([follower.backlog(size)], follower.follow()):
+            if not logs:
+                continue
+            if reporter:
+                reporter.add_fetched(len(logs))
             
-            # If it's already in Elasticsearch format with hits
-            if isinstance(data, dict) and 'hits' in data:
-                if 'hits' in data['hits']:
-                    return data['hits']['hits']
-                else:
-                    logs = data['hits']
-            # If it's a plain array of log objects
-            elif isinstance(data, list):
-                # Check if first item has Elasticsearch structure
-                if data and isinstance(data[0], dict) and '_source' in data[0]:
-                    # Already in Elasticsearch format
-                    return data
-                
-                # Convert plain logs to Elasticsearch format
-                for i, item in enumerate(data):
-                    logs.append({
-                        '_id': str(i),
-                        '_index': 'file-logs',
-                        '_source': item if isinstance(item, dict) else {'message': str(item)}
-                    })
-            # If it's a single object
+            decrypted_logs, failed_count = decrypt_records(
+                logs, decryptor, field=field,
+                on_warning=lambda msg: console.print(f"[yellow]Warning: {msg}[/yellow]"),
+                on_result=result_callback(reporter, summary)
+            )
+            
+            if output:
+                written = append_output(decrypted_logs, output, format=format, field=field,
+                                        formatter=formatter, start=processed + 1,
+                                        include_ciphertext=include_ciphertext)
+                if reporter:
+                    reporter.add_bytes_written(written)
+                if summary:
+                    from src.stats import summary_path
+                    summary.save(summary_path(output))
+            elif reporter:
+                # Stream records as soon as they arrive
+                reporter.flush_records()
+            elif format == 'json':
+                formatter.print_json(decrypted_logs, include_ciphertext=include_ciphertext)
+            elif format == 'text':
+                formatter.print_text(decrypted_logs, field=field, start=processed + 1)
             else:
-                logs.append({
-                    '_id': '0',
-                    '_index': 'file-logs',
-                    '_source': data
-                })
-        
-        except json.JSONDecodeError:
-            # Try NDJSON (newline-delimited JSON)
-            for i, line in enumerate(content.split('\n')):
-                if line.strip():
-                    try:
-                        item = json.loads(line)
-                        logs.append({
-                            '_id': str(i),
-                            '_index': 'file-logs',
-                            '_source': item if isinstance(item, dict) else {'message': str(item)}
-                        })
-                    except json.JSONDecodeError:
-                        # Plain text line
-                        logs.append({
-                            '_id': str(i),
-                            '_index': 'file-logs',
-                            '_source': {'message': line.strip()}
-                        })
-    
-    return logs
+                formatter.print_table(decrypted_logs, field=field)
+            
+            processed += len(decrypted_logs)
+            failed += failed_count
+    except KeyboardInterrupt:
+        pass
+    
+    return processed, failed
 
 
 @click.command()
@@ -97,12 +313,13 @@ def read_logs_from_file(file_path: str) -> list:
               help='Kibana URL (can be set via KIBANA_URL env var)')
 @click.option('--elasticsearch-url',
               envvar='ELASTICSEARCH_URL', 
-              help='Elasticsearch URL (can be set via ELASTICSEARCH_URL env var)')
+              help='Elasticsearch URL, or comma-separated URLs to query several '
+                   'clusters concurrently (can be set via ELASTICSEARCH_URL env var)')
 @click.option('--index', 
-              help='Elasticsearch index name (not required when using --file)')
+              help='Elasticsearch index name, or comma-separated index patterns to '
+                   'query concurrently (not required when using --file)')
 @click.option('--key', 
               envvar='ENCRYPTION_KEY',
-              required=True,
               help='Encryption key (can be set via ENCRYPTION_KEY env var)')
 @click.option('--algorithm',
               envvar='ENCRYPTION_ALGORITHM',
@@ -134,10 +351,118 @@ def read_logs_from_file(file_path: str) -> list:
               envvar='ELASTICSEARCH_API_KEY',
               help='Elasticsearch API key')
 @click.option('--file',
-              type=click.Path(exists=True),
-              help='Read logs from JSON/NDJSON file instead of Kibana')
+              help='Read logs from JSON/NDJSON file instead of Kibana (gzip, bzip2 and '
+                   'zstd compressed files are decompressed on the fly); a directory or '
+                   'glob pattern decrypts all its files in parallel, and - streams NDJSON '
+                   'from stdin to NDJSON on stdout')
+@click.option('--per-file',
+              is_flag=True,
+              help='With several --file inputs, write one output per input file into '
+                   'the --output directory')
+@click.option('--merge-sorted',
+              is_flag=True,
+              help='With several --file inputs, merge their logs by @timestamp (oldest '
+                   'first) instead of concatenating them in file order')
+@click.option('--decompress-thread',
+              is_flag=True,
+              help='Decompress a compressed --file on a separate thread from parsing')
+@click.option('--watermark',
+              type=click.Path(dir_okay=False),
+              help='With --file, only process NDJSON lines appended since the last run '
+                   'with this watermark file (follows rotation and truncation)')
+@click.option('--ciphertext-copy/--no-ciphertext-copy',
+              default=True,
+              help='Keep a copy of the ciphertext as encrypted_<field> next to '
+                   'decrypted_<field> in JSON output (default: on; --export never does)')
+@click.option('--summary', 'summarize',
+              is_flag=True,
+              help='Write statistics of the decrypted logs (counts by level, service, host '
+                   'and time, top messages, distinct counts) to <output>.summary.json')
+@click.option('--summary-interval',
+              default='1h',
+              help='Time bucket width of --summary counts, e.g. 15m, 1h, 1d (default: 1h)')
+@click.option('--summary-top',
+              default=10,
+              type=int,
+              help='Number of most frequent decrypted messages in --summary (default: 10)')
+@click.option('--progress',
+              type=click.Choice(['none', 'ndjson']),
+              default='none',
+              help='Emit machine-readable progress events on stdout (status messages go to stderr)')
+@click.option('--progress-interval',
+              default=1.0,
+              type=float,
+              help='Minimum seconds between progress events (default: 1.0)')
+@click.option('--progress-records',
+              is_flag=True,
+              help='Also emit finished records in progress events (implied without --output)')
+@click.option('--metrics', 'show_metrics',
+              is_flag=True,
+              help='Print per-stage timings and counters at exit')
+@click.option('--metrics-file',
+              type=click.Path(),
+              help='Write metrics to a Prometheus textfile (.prom) or JSON file')
+@click.option('--profile',
+              type=click.Choice(['cprofile', 'sample']),
+              help='Profile the job and write .profile.txt, .folded (flamegraph) '
+                   'and, for cprofile, .pstats reports next to the output file')
+@click.option('--cache-dir',
+              envvar='LOGGIN_GENIE_CACHE_DIR',
+              type=click.Path(file_okay=False),
+              help='Reuse outputs of identical jobs from this directory (with --output; '
+                   'can be set via LOGGIN_GENIE_CACHE_DIR env var)')
+@click.option('--cache-max-size',
+              envvar='LOGGIN_GENIE_CACHE_MAX_SIZE',
+              default='1GB',
+              help='Size limit of --cache-dir, least recently used outputs are evicted (default: 1GB)')
+@click.option('--follow',
+              is_flag=True,
+              help='Keep polling the index and decrypt new logs as they arrive, after '
+                   'the --size most recent ones (Ctrl+C to stop)')
+@click.option('--poll-interval',
+              default=1.0,
+              type=float,
+              help='Shortest pause between --follow polls in seconds; the pause adapts '
+                   'to the arrival rate (default: 1.0)')
+@click.option('--max-poll-interval',
+              default=30.0,
+              type=float,
+              help='Longest pause between --follow polls in seconds (default: 30)')
+@click.option('--export',
+              is_flag=True,
+              help='Export every matching log to --output page by page, checkpointing '
+                   'progress to <output>.checkpoint (--size is ignored)')
+@click.option('--resume',
+              is_flag=True,
+              help='Continue an interrupted --export from its checkpoint, appending to --output')
+@click.option('--serve',
+              is_flag=True,
+              help='Run as a resident JSON-RPC worker on stdin/stdout (or --socket)')
+@click.option('--socket', 'socket_path',
+              type=click.Path(),
+              help='Unix socket path to serve on instead of stdin/stdout (with --serve)')
+@click.option('--workers',
+              default=4,
+              type=int,
+              help='Number of concurrent jobs in --serve mode, of files decrypted '
+                   'in parallel with several --file inputs, or of parallel readers for '
+                   'large Elasticsearch fetches (default: 4)')
+@click.option('--adaptive-fetch',
+              is_flag=True,
+              help='Tune the Elasticsearch page size and concurrent requests to the '
+                   'cluster\'s response times and sizes, backing off on 429s and timeouts')
+@click.option('--max-page-size',
+              default=5000,
+              type=click.IntRange(min=1),
+              help='Most documents per request with --adaptive-fetch; requests in flight '
+                   'never exceed --workers (default: 5000)')
 def main(kibana_url, elasticsearch_url, index, key, algorithm, field, 
-         query, size, output, format, username, password, api_key, file):
+         query, size, output, format, username, password, api_key, file, per_file,
+         merge_sorted, decompress_thread,
+         watermark, ciphertext_copy, summarize, summary_interval, summary_top,
+         progress, progress_interval, progress_records, show_metrics, metrics_file,
+         profile, cache_dir, cache_max_size, follow, poll_interval, max_poll_interval,
+         export, resume, serve, socket_path, workers, adaptive_fetch, max_page_size):
     """
     Fetch and decrypt encrypted logs from Kibana/Elasticsearch.
     
@@ -145,8 +470,46 @@ def main(kibana_url, elasticsearch_url, index, key, algorithm, field,
         loggin_genie.py --index "app-logs" --key "your-key" --output decrypted.json
     """
     
+    if serve:
+        # Resident worker: stdout carries the JSON-RPC protocol only
+        from src.worker import DecryptionWorker, serve_stdio, serve_unix_socket
+        from src.result_cache import ResultCache, parse_size
+        
+        result_cache = ResultCache(cache_dir, max_size=parse_size(cache_max_size)) if cache_dir else None
+        worker = DecryptionWorker(max_workers=workers, result_cache=result_cache)
+        try:
+            if socket_path:
+                serve_unix_socket(worker, socket_path)
+            else:
+                serve_stdio(worker)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.close()
+        return
+    
+    metrics.enabled = show_metrics or bool(metrics_file)
+    
+    profiler = None
+    if profile:
+        from src.profiler import PipelineProfiler
+        
+        profiler = PipelineProfiler(mode=profile)
+        profiler.start()
+    
+    reporter = None
+    if progress == 'ndjson':
+        # stdout carries the event stream only
+        console.file = sys.stderr
+        reporter = ProgressReporter(interval=progress_interval,
+                                    emit_records=progress_records or not output)
+    
     try:
         # Validate inputs
+        if not key:
+            console.print("[red]Error: --key is required (or set ENCRYPTION_KEY)[/red]")
+            sys.exit(1)
+        
         if not file and not (kibana_url or elasticsearch_url):
             console.print("[red]Error: Either --file, --kibana-url, or --elasticsearch-url must be provided[/red]")
             sys.exit(1)
@@ -155,6 +518,28 @@ def main(kibana_url, elasticsearch_url, index, key, algorithm, field,
             console.print("[red]Error: --index is required when not using --file[/red]")
             sys.exit(1)
         
+        files = [file] if file == '-' else expand_inputs(file) if file else []
+        if file and not files:
+            console.print(f"[red]Error: No files match --file {file}[/red]")
+            sys.exit(1)
+        
+        if watermark and not file:
+            console.print("[red]Error: --watermark requires --file[/red]")
+            sys.exit(1)
+        
+        summary = None
+        if summarize:
+            if not output or export or resume:
+                console.print("[red]Error: --summary needs --output and cannot be used "
+                              "with --export[/red]")
+                sys.exit(1)
+            from src.stats import LogSummary
+            try:
+                summary = LogSummary(field=field, interval=summary_interval, top_k=summary_top)
+            except ValueError as e:
+                console.print(f"[red]Error: {e}[/red]")
+                sys.exit(1)
+        
         if file and not index:
             # When reading from file, index is optional
             index = "file-logs"
@@ -168,62 +553,241 @@ def main(kibana_url, elasticsearch_url, index, key, algorithm, field,
                 console.print(f"[red]Error: Invalid JSON query: {e}[/red]")
                 sys.exit(1)
         
-        # Fetch logs from file or Kibana
-        if file:
-            # Read from file
-            console.print(f"[cyan]Reading logs from file: {file}[/cyan]")
-            logs = read_logs_from_file(file)
-            console.print(f"[green]Read {len(logs)} log entries[/green]")
-        else:
-            # Initialize Kibana client
+        if reporter:
+            reporter.start(source='file' if file else 'elasticsearch', input=file or index)
+        
+        urls = [u.strip() for u in (elasticsearch_url or kibana_url or '').split(',') if u.strip()]
+        indices = [i.strip() for i in index.split(',') if i.strip()]
+        
+        if file == '-':
+            if watermark or per_file:
+                console.print("[red]Error: --watermark and --per-file need files, not stdin[/red]")
+                sys.exit(1)
+            if reporter and not output:
+                console.print("[red]Error: --progress with --file - needs --output, "
+                              "stdout carries the decrypted records[/red]")
+                sys.exit(1)
+            
+            # stdout carries the records only
+            console.file = sys.stderr
+            processed, failed_count = decrypt_stdin(
+                LogDecryptor(key=key, algorithm=algorithm), field, output=output, reporter=reporter,
+                include_ciphertext=ciphertext_copy, summary=summary
+            )
+            console.print(f"[green]Successfully decrypted {processed - failed_count} logs[/green]")
+            if failed_count > 0:
+                console.print(f"[yellow]Failed to decrypt {failed_count} logs[/yellow]")
+            if summary:
+                save_summary(summary, output)
+            if reporter:
+                reporter.finish(output=output)
+            return
+        
+        if file and files != [file]:
+            if watermark:
+                console.print("[red]Error: --watermark takes a single --file[/red]")
+                sys.exit(1)
+            if per_file and not output:
+                console.print("[red]Error: --per-file needs --output (a directory)[/red]")
+                sys.exit(1)
+            
+            errors = decrypt_files(files, key, algorithm, field, workers, output=output,
+                                   format=format, per_file=per_file,
+                                   merge_sorted=merge_sorted,
+                                   include_ciphertext=ciphertext_copy, reporter=reporter,
+                                   summary=summary)
+            if summary:
+                save_summary(summary, output)
+            if errors:
+                sys.exit(1)
+            return
+        
+        if follow:
+            if file or len(urls) > 1 or len(indices) > 1:
+                console.print("[red]Error: --follow needs a single Elasticsearch URL and index[/red]")
+                sys.exit(1)
+            
+            from src.kibana_client import KibanaClient
+            from src.connection_pool import get_default_registry
+            
+            # Polls must always reach the cluster, so no hit cache here
             console.print("[cyan]Connecting to Elasticsearch/Kibana...[/cyan]")
             client = KibanaClient(
-                elasticsearch_url=elasticsearch_url or kibana_url,
+                elasticsearch_url=urls[0],
                 username=username,
                 password=password,
-                api_key=api_key
+                api_key=api_key,
+                registry=get_default_registry()
             )
             
-            # Fetch logs
-            console.print(f"[cyan]Fetching logs from index '{index}'...[/cyan]")
-            logs = client.fetch_logs(index=index, query=es_query, size=size)
+            console.print(f"[cyan]Following index '{index}' (Ctrl+C to stop)...[/cyan]")
+            processed, failed_count = follow_logs(
+                client, index, es_query, size, LogDecryptor(key=key, algorithm=algorithm),
+                field, output=output, format=format, reporter=reporter,
+                min_interval=poll_interval, max_interval=max_poll_interval,
+                include_ciphertext=ciphertext_copy, summary=summary
+            )
+            client.close()
+            if summary:
+                save_summary(summary, output)
+            
+            console.print(f"[green]Stopped following: decrypted {processed - failed_count} logs[/green]")
+            if failed_count > 0:
+                console.print(f"[yellow]Failed to decrypt {failed_count} logs[/yellow]")
+            if reporter:
+                reporter.finish(output=output)
+            return
+        
+        if export or resume:
+            if file or len(urls) > 1 or len(indices) > 1 or not output:
+                console.print("[red]Error: --export needs a single Elasticsearch URL and index, "
+                              "and --output[/red]")
+                sys.exit(1)
+            
+            from src.kibana_client import KibanaClient
+            from src.connection_pool import get_default_registry
+            from src.export import export_fingerprint, export_logs
+            
+            # Pages are streamed to the output, so no hit cache here
+            console.print("[cyan]Connecting to Elasticsearch/Kibana...[/cyan]")
+            client = KibanaClient(
+                elasticsearch_url=urls[0],
+                username=username,
+                password=password,
+                api_key=api_key,
+                registry=get_default_registry(),
+                controller=fetch_controller(adaptive_fetch, max_page_size, workers)
+            )
+            
+            console.print(f"[cyan]{'Resuming' if resume else 'Starting'} export of '{index}' "
+                          f"to {output}...[/cyan]")
+            try:
+                result = export_logs(
+                    client, index, es_query, LogDecryptor(key=key, algorithm=algorithm), output,
+                    export_fingerprint(urls[0], index, es_query, key, algorithm, field,
+                                       output_format(output, format)),
+                    field=field, format=format, resume=resume, reporter=reporter,
+                    on_warning=lambda msg: console.print(f"[yellow]Warning: {msg}[/yellow]")
+                )
+            finally:
+                client.close()
+            
+            console.print(f"[green]Exported {result['records']} logs to {output}: "
+                          f"{result['decrypted']} decrypted, {result['failed']} failed[/green]")
+            if reporter:
+                reporter.finish(output=output)
+            return
+        
+        # Identical jobs (same input, key and output format) reuse the cached output
+        cache = cache_key = None
+        if cache_dir and output and not watermark and not summary:
+            from src.result_cache import ResultCache, job_cache_key, parse_size
+            
+            cache = ResultCache(cache_dir, max_size=parse_size(cache_max_size))
+            cache_key = job_cache_key(
+                key, algorithm, field, output_format(output, format), file=file,
+                urls=urls, indices=indices, query=es_query, size=size,
+                include_ciphertext=ciphertext_copy, username=username, password=password,
+                api_key=api_key
+            )
+            cached = cache.restore(cache_key, output) if cache_key else None
+            if cached:
+                console.print(f"[green]Reused cached result of an identical job: "
+                              f"{cached['decrypted']} decrypted, {cached['failed']} failed[/green]")
+                console.print(f"[green]Decrypted logs saved to {output}[/green]")
+                if reporter:
+                    reporter.add_fetched(cached['total'])
+                    reporter.add_results(cached['decrypted'], cached['failed'])
+                    reporter.add_bytes_written(Path(output).stat().st_size)
+                    reporter.finish(output=output, cached=True)
+                return
+        
+        # Fetch logs from file or Kibana
+        if file:
+            # Read from file
+            console.print(f"[cyan]Reading logs from file: {file}[/cyan]")
+            if watermark:
+                # Only lines appended since the last run; the new watermark
+                # is saved once they were processed
+                watermarks = load_watermarks(watermark)
+                watermark_key = str(Path(file).resolve())
+                logs, new_watermark = read_new_logs(
+                    file, watermarks.get(watermark_key),
+                    on_warning=lambda msg: console.print(f"[yellow]Warning: {msg}[/yellow]")
+                )
+                watermarks[watermark_key] = new_watermark
+                console.print(f"[green]Read {len(logs)} new log entries[/green]")
+            else:
+                logs = read_logs_from_file(file, decompress_thread=decompress_thread)
+                console.print(f"[green]Read {len(logs)} log entries[/green]")
+        else:
+            if len(urls) > 1 or len(indices) > 1:
+                # Fan out over several clusters/indices concurrently
+                console.print(f"[cyan]Fetching logs from {len(indices)} index pattern(s) "
+                              f"on {len(urls)} cluster(s)...[/cyan]")
+                import asyncio
+                
+                logs = asyncio.run(fetch_logs_concurrently(
+                    urls, indices, es_query, size, username, password, api_key
+                ))
+            else:
+                from src.kibana_client import KibanaClient
+                from src.connection_pool import get_default_registry
+                from src.hit_cache import get_default_hit_cache
+                
+                # Initialize Kibana client
+                console.print("[cyan]Connecting to Elasticsearch/Kibana...[/cyan]")
+                client = KibanaClient(
+                    elasticsearch_url=urls[0],
+                    username=username,
+                    password=password,
+                    api_key=api_key,
+                    registry=get_default_registry(),
+                    hit_cache=get_default_hit_cache(),
+                    controller=fetch_controller(adaptive_fetch, max_page_size, workers)
+                )
+                
+                # Plan (counting large fetches first), then fetch the way that suits it
+                from src.planner import plan_fetch
+                plan = plan_fetch(client, index, es_query, size, readers=workers)
+                console.print(f"[cyan]Fetching {plan.size} logs from index '{index}' "
+                              f"({plan.strategy}"
+                              + (f", {len(plan.partitions)} time ranges by {plan.readers} readers"
+                                 if plan.partitions else "")
+                              + ")...[/cyan]")
+                logs = client.fetch_planned(index, es_query, plan)
+                # Small fetches learn the number of matches from the search
+                if plan.truncated:
+                    console.print(f"[yellow]Warning: the query matches {plan.total} logs, "
+                                  f"only the newest {plan.size} were fetched (raise --size "
+                                  f"to get more)[/yellow]")
+                if client.controller:
+                    console.print(f"[cyan]Adaptive fetch ended at {client.controller.page_size} "
+                                  f"logs per request, {client.controller.concurrency} in "
+                                  f"flight[/cyan]")
             console.print(f"[green]Fetched {len(logs)} log entries[/green]")
         
+        if reporter:
+            reporter.add_fetched(len(logs))
+        
         if not logs:
             console.print("[yellow]No logs found[/yellow]")
+            if watermark:
+                save_watermarks(watermark, watermarks)
+            if reporter:
+                reporter.finish()
             return
         
         # Initialize decryptor
         console.print("[cyan]Decrypting logs...[/cyan]")
         decryptor = LogDecryptor(key=key, algorithm=algorithm)
         
-        # Decrypt logs
-        decrypted_logs = []
-        failed_count = 0
-        
-        for log in logs:
-            try:
-                # Get the source object
-                source = log.get('_source', {})
-                encrypted_data = source.get(field)
-                
-                if encrypted_data:
-                    decrypted_data = decryptor.decrypt(encrypted_data)
-                    # Preserve original encrypted data and add decrypted version
-                    source[f'encrypted_{field}'] = encrypted_data
-                    source[f'decrypted_{field}'] = decrypted_data
-                    source['_decrypted'] = True
-                    log['_source'] = source
-                    decrypted_logs.append(log)
-                else:
-                    console.print(f"[yellow]Warning: Field '{field}' not found in log[/yellow]")
-                    decrypted_logs.append(log)
-            except Exception as e:
-                console.print(f"[yellow]Warning: Failed to decrypt log: {e}[/yellow]")
-                source['_decryption_error'] = str(e)
-                log['_source'] = source
-                decrypted_logs.append(log)
-                failed_count += 1
+        # Decrypt logs into compact records (this releases the fetched hits)
+        decrypted_logs, failed_count = decrypt_records(
+            logs, decryptor, field=field,
+            on_warning=lambda msg: console.print(f"[yellow]Warning: {msg}[/yellow]"),
+            on_result=result_callback(reporter, summary)
+        )
         
         console.print(f"[green]Successfully decrypted {len(decrypted_logs) - failed_count} logs[/green]")
         if failed_count > 0:
@@ -234,27 +798,58 @@ def main(kibana_url, elasticsearch_url, index, key, algorithm, field,
         
         if output:
             # Save to file
-            output_path = Path(output)
-            if format == 'json' or output_path.suffix == '.json':
-                formatter.save_json(decrypted_logs, output_path)
-                console.print(f"[green]Decrypted logs saved to {output}[/green]")
-            else:
-                formatter.save_text(decrypted_logs, output_path, field=field)
-                console.print(f"[green]Decrypted logs saved to {output}[/green]")
+            output_path = save_output(decrypted_logs, output, format=format, field=field,
+                                      formatter=formatter, include_ciphertext=ciphertext_copy)
+            console.print(f"[green]Decrypted logs saved to {output}[/green]")
+            if reporter:
+                reporter.add_bytes_written(output_path.stat().st_size)
+            if cache_key:
+                try:
+                    cache.put(cache_key, output_path, {
+                        'total': len(decrypted_logs),
+                        'decrypted': len(decrypted_logs) - failed_count,
+                        'failed': failed_count,
+                    })
+                except OSError as e:
+                    console.print(f"[yellow]Warning: could not cache result: {e}[/yellow]")
+        elif reporter:
+            # Records were already streamed as progress events
+            pass
         else:
             # Display in terminal
             if format == 'json':
-                formatter.print_json(decrypted_logs)
+                formatter.print_json(decrypted_logs, include_ciphertext=ciphertext_copy)
             elif format == 'text':
                 formatter.print_text(decrypted_logs, field=field)
             else:
                 formatter.print_table(decrypted_logs, field=field)
+        
+        if summary:
+            save_summary(summary, output)
+        
+        if watermark:
+            save_watermarks(watermark, watermarks)
+        
+        if reporter:
+            reporter.finish(output=output)
     
     except Exception as e:
+        if reporter:
+            reporter.error(str(e))
         console.print(f"[red]Error: {e}[/red]")
         if '--debug' in sys.argv:
             raise
         sys.exit(1)
+    
+    finally:
+        if profiler:
+            profiler.stop()
+            for report_path in profiler.write_reports(Path(output or 'loggin_genie')):
+                console.print(f"[cyan]Profile written to {report_path}[/cyan]")
+        if show_metrics:
+            console.print(f"\n[cyan]Pipeline metrics[/cyan]\n{metrics.format_summary()}")
+        if metrics_file:
+            metrics.write(metrics_file)
 
 
 if __name__ == '__main__':
@@ -25,6 +25,12 @@ setup(
     url='https://github.com/yourusername/loggin-genie',
     packages=find_packages(),
     install_requires=requirements,
+    extras_require={
+        # Reading zstd-compressed log files
+        'zstd': ['zstandard>=0.21.0'],
+        # Columnar result tables for analysis (src/table.py)
+        'arrow': ['pyarrow>=14.0.0'],
+    },
     entry_points={
         'console_scripts': [
             'loggin-genie=loggin_genie:main',
@@ -0,0 +1,161 @@
+"""
+Async Kibana/Elasticsearch client for concurrent multi-index and multi-cluster fetches
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Sequence, Union
+
+from elasticsearch import AsyncElasticsearch
+
+from .merge import is_descending, merge_by_timestamp
+from .metrics import metrics
+
+
+class AsyncKibanaClient:
+    """Async counterpart of KibanaClient that fans out over clusters and indices"""
+
+    def __init__(self, elasticsearch_urls: Union[str, Sequence[str]],
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 api_key: Optional[str] = None, verify_certs: bool = False):
+        """
+        Initialize async Elasticsearch clients, one per cluster
+
+        Args:
+            elasticsearch_urls: URL or list of URLs of Elasticsearch clusters
+            username: Basic auth username
+            password: Basic auth password
+            api_key: API key for authentication
+            verify_certs: Verify SSL certificates (default: False)
+        """
+
+        if isinstance(elasticsearch_urls, str):
+            elasticsearch_urls = [elasticsearch_urls]
+
+        if not elasticsearch_urls:
+            raise ValueError("At least one Elasticsearch URL is required")
+
+        # A repeated URL would return every document once per repetition
+        self.urls = list(dict.fromkeys(elasticsearch_urls))
+        self.clients: Dict[str, AsyncElasticsearch] = {}
+
+        for url in self.urls:
+            params = {
+                'hosts': [url],
+                'verify_certs': verify_certs,
+            }
+
+            if api_key:
+                params['api_key'] = api_key
+            elif username and password:
+                params['basic_auth'] = (username, password)
+
+            self.clients[url] = AsyncElasticsearch(**params)
+
+    async def connect(self):
+        """Ping every cluster concurrently and fail if any is unreachable"""
+
+        results = await asyncio.gather(
+            *(es.ping() for es in self.clients.values()),
+            return_exceptions=True
+        )
+
+        failed = [url for url, ok in zip(self.clients, results) if ok is not True]
+        if failed:
+            raise ConnectionError(f"Failed to connect to Elasticsearch: {', '.join(failed)}")
+
+    async def _search(self, url: str, index: str, search_body: Dict) -> List[Dict]:
+        """Run one search against one cluster/index pair"""
+
+        try:
+            with metrics.timer('fetch'):
+                response = await self.clients[url].search(index=index, body=search_body)
+        except Exception as e:
+            raise Exception(f"Failed to fetch logs from {url} ({index}): {str(e)}")
+
+        hits = response['hits']['hits']
+
+        if metrics.enabled:
+            metrics.inc('fetch_requests')
+            metrics.inc('fetched_records', len(hits))
+
+        if len(self.clients) > 1:
+            for hit in hits:
+                hit['_cluster'] = url
+
+        return hits
+
+    async def fetch_logs(self, index: Union[str, Sequence[str]], query: Optional[Dict] = None,
+                         size: int = 100, sort: Optional[List] = None) -> List[Dict]:
+        """
+        Fetch logs from every cluster and index pattern concurrently
+
+        Each cluster/index pair is queried for the top ``size`` hits, and the
+        per-target results are k-way merged by timestamp. A document matched
+        by several overlapping patterns (e.g. ``logs-2026.*,logs-*``) is
+        returned once, so the result is the same as a single search over the
+        union of all targets.
+
+        Args:
+            index: Index name/pattern, list of them, or comma-separated string
+            query: Elasticsearch query DSL (default: match_all)
+            size: Number of logs to return in total (default: 100)
+            sort: Sort order (default: timestamp descending)
+
+        Returns:
+            List of log documents ordered by timestamp
+        """
+
+        if isinstance(index, str):
+            index = [i.strip() for i in index.split(',') if i.strip()]
+        index = list(dict.fromkeys(index))
+
+        if query is None:
+            query = {"match_all": {}}
+
+        if sort is None:
+            sort = [{"@timestamp": {"order": "desc"}}]
+
+        search_body = {
+            "query": query,
+            "size": size,
+            "sort": sort
+        }
+
+        results = await asyncio.gather(*(
+            self._search(url, pattern, search_body)
+            for url in self.urls
+            for pattern in index
+        ))
+
+        merged = merge_by_timestamp(results, descending=is_descending(sort))
+
+        # Drop repeats before cutting to size, so overlaps do not crowd out
+        # other documents (_cluster is only set with several clusters)
+        seen = set()
+        unique = []
+        for hit in merged:
+            key = (hit.get('_cluster'), hit.get('_index'), hit.get('_id'))
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(hit)
+            if len(unique) >= size:
+                break
+
+        return unique
+
+    async def close(self):
+        """Close all Elasticsearch connections"""
+
+        await asyncio.gather(*(es.close() for es in self.clients.values()))
+
+    async def __aenter__(self):
+        try:
+            await self.connect()
+        except Exception:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,51 @@
+"""
+Atomic file replacement
+
+Checkpoints, watermarks, summaries, metrics files and cache entries are
+read by other processes (or a later run) while they may be rewritten, so
+they are written to a temporary file next to the target and renamed over
+it: readers see the old or the new contents, never a partial file.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, Optional
+
+
+@contextmanager
+def atomic_write(path, mode: str = 'w', encoding: Optional[str] = 'utf-8',
+                 permissions: int = 0o666, fsync: bool = False) -> Iterator[IO]:
+    """
+    Open a temporary file that replaces path when the block completes
+
+    If the block raises, path is left untouched and the temporary file is
+    removed.
+
+    Args:
+        path: File to replace (its directory must exist)
+        mode: 'w' for text or 'wb' for bytes
+        encoding: Text encoding (ignored for bytes)
+        permissions: Mode of the new file (before the umask)
+        fsync: Flush the contents to disk before the rename, so a crash
+               never leaves an empty file behind (checkpoints)
+
+    Yields:
+        The open temporary file
+    """
+
+    path = Path(path)
+    # Unique per process and thread, so concurrent writers do not collide
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, permissions)
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
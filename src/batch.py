@@ -0,0 +1,159 @@
+"""
+Decrypt many log files in parallel
+
+--file accepts a directory or glob pattern as well as a single file. The
+files are read and decrypted by a pool of worker processes, each of which
+either writes its own output file or returns its logs to be combined into
+one output (in input order, or k-way merged by timestamp).
+"""
+
+import glob
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .decryptor import LogDecryptor
+from .merge import merge_by_timestamp, timestamp_key
+from .pipeline import decrypt_records, save_output
+from .reader import read_logs_from_file
+from .stats import LogSummary
+
+# Suffixes dropped from input names when naming per-file outputs
+INPUT_SUFFIXES = ('.gz', '.bz2', '.zst', '.json', '.ndjson', '.jsonl', '.log', '.txt')
+
+_decryptor: Optional[LogDecryptor] = None
+
+
+def expand_inputs(spec: str) -> List[str]:
+    """
+    Files named by a --file argument
+
+    Args:
+        spec: A file, a directory (its files, hidden ones excluded) or a glob
+              pattern (** matches subdirectories)
+
+    Returns:
+        Sorted file paths (empty if nothing matches)
+    """
+
+    if os.path.isfile(spec):
+        return [spec]
+
+    if os.path.isdir(spec):
+        paths = (entry.path for entry in os.scandir(spec) if not entry.name.startswith('.'))
+    else:
+        paths = glob.glob(spec, recursive=True)
+
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def output_name(path: str, output_format: str) -> str:
+    """Per-file output name for an input file, e.g. app-01.ndjson.gz -> app-01.json"""
+
+    name = Path(path).name
+    while True:
+        stem, suffix = os.path.splitext(name)
+        if suffix.lower() not in INPUT_SUFFIXES:
+            break
+        name = stem
+    return f"{name}.{'json' if output_format == 'json' else 'txt'}"
+
+
+def _init_worker(key: str, algorithm: str):
+    global _decryptor
+    _decryptor = LogDecryptor(key=key, algorithm=algorithm)
+
+
+def _process_file(path: str, field: str, sort: bool, output: Optional[str],
+                  format: str, include_ciphertext: bool,
+                  summary_options: Optional[Dict]) -> Dict:
+    """Read and decrypt one file, in a worker process"""
+
+    try:
+        summary = LogSummary(**summary_options) if summary_options else None
+        logs = read_logs_from_file(path)
+        # LogRecords also pickle much smaller than hits on the way back
+        decrypted_logs, failed = decrypt_records(logs, _decryptor, field=field,
+                                                 on_result=summary.add if summary else None)
+        if sort:
+            decrypted_logs.sort(key=timestamp_key)
+        result = {'file': path, 'total': len(decrypted_logs), 'failed': failed, 'logs': None}
+        if summary:
+            result['summary'] = summary
+
+        if output:
+            save_output(decrypted_logs, output, format=format, field=field,
+                        include_ciphertext=include_ciphertext)
+            result['output'] = output
+        else:
+            result['logs'] = decrypted_logs
+        return result
+    except Exception as e:
+        return {'file': path, 'total': 0, 'failed': 0, 'logs': None, 'error': str(e)}
+
+
+def process_files(files: List[str], key: str, algorithm: str = 'AES-256-CBC',
+                  field: str = 'message', workers: int = 4,
+                  output_dir: Optional[str] = None, format: str = 'json',
+                  merge_sorted: bool = False, include_ciphertext: bool = True,
+                  summary: Optional[LogSummary] = None,
+                  on_file: Optional[Callable[[Dict], None]] = None) -> Tuple[Iterator[Dict], List[Dict]]:
+    """
+    Decrypt files concurrently
+
+    Args:
+        files: Input files
+        key: Encryption key
+        algorithm: Encryption algorithm
+        field: Field name containing encrypted data
+        workers: Worker processes
+        output_dir: Write one output per input file into this directory
+                    (named by output_name()) instead of returning the logs
+        format: Output format of per-file outputs
+        merge_sorted: Return the logs k-way merged by timestamp (oldest
+                      first) instead of in input order
+        include_ciphertext: Keep encrypted_<field> in per-file JSON outputs
+        summary: Summary every file's logs are added to (each worker
+                 summarises its files and the summaries are merged)
+        on_file: Called with each file's result (file, total, failed,
+                 output or error), in input order
+
+    Returns:
+        Tuple of (combined decrypted logs as LogRecords, per-file results in
+        input order); the logs are empty with output_dir
+    """
+
+    # multiprocessing is only imported when files are actually processed
+    from concurrent.futures import ProcessPoolExecutor
+
+    outputs = [None] * len(files)
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        fmt = 'json' if format == 'json' else 'text'
+        outputs = [str(Path(output_dir) / output_name(path, fmt)) for path in files]
+        if len(set(outputs)) < len(outputs):
+            raise ValueError("Several input files have the same name; their per-file "
+                             "outputs would overwrite each other")
+
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(files))),
+                             initializer=_init_worker, initargs=(key, algorithm)) as executor:
+        futures = [executor.submit(_process_file, path, field, merge_sorted, output, format,
+                                   include_ciphertext, summary.options if summary else None)
+                   for path, output in zip(files, outputs)]
+
+        results = []
+        for future in futures:
+            result = future.result()
+            if summary and 'summary' in result:
+                summary.merge(result.pop('summary'))
+            if on_file:
+                on_file(result)
+            results.append(result)
+
+    streams = [result.pop('logs') or [] for result in results]
+    if merge_sorted:
+        logs = merge_by_timestamp(streams, descending=False)
+    else:
+        logs = (log for stream in streams for log in stream)
+
+    return logs, results
@@ -0,0 +1,174 @@
+"""
+Transparent decompression of log files
+
+Compression is detected from the file's magic bytes, not its name, so
+gzip, bzip2 and zstd files are read directly, without decompressing to a
+temporary file first. zstd needs the optional zstandard package.
+"""
+
+import bz2
+import gzip
+import importlib.util
+import io
+import queue
+import threading
+from typing import Optional
+
+from .metrics import metrics
+
+# Read size for compressed input and decompressed output
+BUFFER_SIZE = 1 << 20
+
+MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'BZh': 'bzip2',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+
+def zstd_available() -> bool:
+    """Whether zstandard can be imported"""
+
+    return importlib.util.find_spec('zstandard') is not None
+
+
+def detect_compression(file_path: str) -> Optional[str]:
+    """'gzip', 'bzip2' or 'zstd' from the file's magic bytes, or None if uncompressed"""
+
+    with open(file_path, 'rb') as f:
+        head = f.read(4)
+
+    for magic, name in MAGIC.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+class _DecompressedReader(io.RawIOBase):
+    """Decompressed view of a compressed file that closes both when closed"""
+
+    def __init__(self, decompressor, compressed):
+        self._decompressor = decompressor
+        self._compressed = compressed
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        return self._decompressor.readinto(buffer)
+
+    def close(self):
+        if not self.closed:
+            self._decompressor.close()
+            self._compressed.close()
+        super().close()
+
+
+class _PrefetchReader(io.RawIOBase):
+    """Read a stream block by block on a background thread"""
+
+    def __init__(self, stream, block_size: int = BUFFER_SIZE, depth: int = 4):
+        self._stream = stream
+        self._block_size = block_size
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._block = memoryview(b'')
+        self._eof = False
+
+        self._thread = threading.Thread(target=self._run, name='decompress', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                block = self._stream.read(self._block_size)
+                self._put(block)
+                if not block:
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        # Give up when the reader was closed before consuming everything
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._block:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                raise item
+            if not item:
+                self._eof = True
+                return 0
+            self._block = memoryview(item)
+
+        count = min(len(buffer), len(self._block))
+        buffer[:count] = self._block[:count]
+        self._block = self._block[count:]
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._stream.close()
+        super().close()
+
+
+def open_log_file(file_path: str, binary: bool = False, threaded: bool = False,
+                  buffer_size: int = BUFFER_SIZE):
+    """
+    Open a log file for reading, decompressing it if needed
+
+    Args:
+        file_path: Path to the (possibly compressed) file
+        binary: Return a binary stream instead of UTF-8 text
+        threaded: Decompress on a background thread, overlapping it with
+                  whatever the caller does with the data (decompressors
+                  release the GIL)
+        buffer_size: Read size for both the compressed and decompressed data
+
+    Returns:
+        Readable file object
+    """
+
+    compression = detect_compression(file_path)
+    if compression is None:
+        if binary:
+            return open(file_path, 'rb', buffering=buffer_size)
+        return open(file_path, 'r', encoding='utf-8', buffering=buffer_size)
+
+    if metrics.enabled:
+        metrics.inc(f'read_{compression}_files')
+
+    raw = open(file_path, 'rb', buffering=buffer_size)
+    if compression == 'gzip':
+        decompressor = gzip.GzipFile(fileobj=raw, mode='rb')
+    elif compression == 'bzip2':
+        decompressor = bz2.BZ2File(raw, mode='rb')
+    else:
+        if not zstd_available():
+            raw.close()
+            raise RuntimeError(f"{file_path} is zstd-compressed; install the zstandard package "
+                               f"(pip install 'loggin-genie[zstd]') to read it")
+        import zstandard
+        decompressor = zstandard.ZstdDecompressor().stream_reader(raw, read_size=buffer_size)
+    stream = _DecompressedReader(decompressor, raw)
+
+    if threaded:
+        stream = _PrefetchReader(stream, block_size=buffer_size)
+
+    stream = io.BufferedReader(stream, buffer_size=buffer_size)
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8')
@@ -0,0 +1,195 @@
+"""
+Registry of pooled Elasticsearch clients shared across jobs
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from elasticsearch import Elasticsearch
+
+
+class ClientRegistry:
+    """Reuse Elasticsearch clients (and their HTTP connection pools) per URL and credentials"""
+
+    def __init__(self, connections_per_node: int = 10, keep_alive: float = 300.0,
+                 health_ttl: float = 30.0, request_timeout: float = 30.0):
+        """
+        Initialize client registry
+
+        Args:
+            connections_per_node: HTTP connection pool size per Elasticsearch node
+            keep_alive: Seconds an unused client is kept open before it is closed
+            health_ttl: Seconds a successful ping is trusted before pinging again
+            request_timeout: Default request timeout in seconds
+        """
+
+        self.connections_per_node = connections_per_node
+        self.keep_alive = keep_alive
+        self.health_ttl = health_ttl
+        self.request_timeout = request_timeout
+
+        self._clients: Dict[str, Elasticsearch] = {}
+        self._last_used: Dict[str, float] = {}
+        self._in_use: Dict[str, int] = {}
+        self._healthy_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(elasticsearch_url: str, username: Optional[str] = None,
+                 password: Optional[str] = None, api_key: Optional[str] = None,
+                 verify_certs: bool = False) -> str:
+        """
+        Build the registry key for a connection
+
+        Credentials are hashed so they are never held in the key itself.
+        """
+
+        material = '\0'.join([
+            elasticsearch_url.rstrip('/'),
+            username or '',
+            password or '',
+            api_key or '',
+            str(verify_certs),
+        ])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, elasticsearch_url: str, username: Optional[str] = None,
+            password: Optional[str] = None, api_key: Optional[str] = None,
+            verify_certs: bool = False) -> Tuple[str, Elasticsearch]:
+        """
+        Get a pooled client, creating it on first use
+
+        Every call must be paired with release() once the caller is done.
+
+        Returns:
+            Tuple of (registry key, Elasticsearch client)
+        """
+
+        key = self.make_key(elasticsearch_url, username, password, api_key, verify_certs)
+        now = time.monotonic()
+
+        with self._lock:
+            self._close_idle(now)
+
+            es = self._clients.get(key)
+            if es is None:
+                params = {
+                    'hosts': [elasticsearch_url],
+                    'verify_certs': verify_certs,
+                    'connections_per_node': self.connections_per_node,
+                    'request_timeout': self.request_timeout,
+                }
+
+                if api_key:
+                    params['api_key'] = api_key
+                elif username and password:
+                    params['basic_auth'] = (username, password)
+
+                es = Elasticsearch(**params)
+                self._clients[key] = es
+
+            self._last_used[key] = now
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        return key, es
+
+    def release(self, key: str):
+        """Hand a client back to the registry, keeping its connections open"""
+
+        with self._lock:
+            if self._in_use.get(key, 0) > 0:
+                self._in_use[key] -= 1
+            self._last_used[key] = time.monotonic()
+
+    def is_healthy(self, key: str) -> bool:
+        """
+        Check client health, pinging only when the cached status has expired
+
+        Args:
+            key: Registry key returned by get()
+
+        Returns:
+            True if the cluster answered a ping within the last health_ttl seconds
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            if self._healthy_until.get(key, 0.0) > now:
+                return True
+            es = self._clients.get(key)
+
+        if es is None or not es.ping():
+            self.invalidate(key)
+            return False
+
+        with self._lock:
+            self._healthy_until[key] = now + self.health_ttl
+
+        return True
+
+    def invalidate(self, key: str):
+        """Forget the cached health status for a client"""
+
+        with self._lock:
+            self._healthy_until.pop(key, None)
+
+    def _close_idle(self, now: float):
+        """Close clients unused for longer than keep_alive (lock must be held)"""
+
+        for key, last_used in list(self._last_used.items()):
+            if self._in_use.get(key, 0) == 0 and now - last_used > self.keep_alive:
+                self._clients.pop(key).close()
+                self._last_used.pop(key)
+                self._in_use.pop(key, None)
+                self._healthy_until.pop(key, None)
+
+    def stats(self) -> Dict:
+        """Return pool statistics"""
+
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'in_use': sum(self._in_use.values()),
+                'connections_per_node': self.connections_per_node,
+                'keep_alive': self.keep_alive,
+                'health_ttl': self.health_ttl,
+            }
+
+    def close_all(self):
+        """Close every pooled client"""
+
+        with self._lock:
+            for es in self._clients.values():
+                es.close()
+            self._clients.clear()
+            self._last_used.clear()
+            self._in_use.clear()
+            self._healthy_until.clear()
+
+
+_default_registry: Optional[ClientRegistry] = None
+
+
+def get_default_registry() -> ClientRegistry:
+    """
+    Return the process-wide client registry
+
+    Pool settings can be tuned via the ES_POOL_CONNECTIONS, ES_POOL_KEEP_ALIVE,
+    ES_HEALTH_TTL and ES_REQUEST_TIMEOUT environment variables.
+    """
+
+    global _default_registry
+
+    if _default_registry is None:
+        _default_registry = ClientRegistry(
+            connections_per_node=int(os.getenv('ES_POOL_CONNECTIONS', '10')),
+            keep_alive=float(os.getenv('ES_POOL_KEEP_ALIVE', '300')),
+            health_ttl=float(os.getenv('ES_HEALTH_TTL', '30')),
+            request_timeout=float(os.getenv('ES_REQUEST_TIMEOUT', '30')),
+        )
+
+    return _default_registry
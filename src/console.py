@@ -0,0 +1,59 @@
+"""
+Terminal output that only pulls in rich when it is actually rendering
+"""
+
+import importlib.util
+import re
+import sys
+from typing import Optional, TextIO
+
+# Markup tags used in our status messages, e.g. [red]...[/red] or [bold cyan]
+_MARKUP_RE = re.compile(
+    r'\[/?(?:(?:bold|dim|italic|red|green|yellow|cyan|blue|magenta|white)\s*)*\]'
+)
+
+
+class PlainConsole:
+    """Minimal stand-in for rich.console.Console that strips markup"""
+
+    def __init__(self, file: Optional[TextIO] = None):
+        self.file = file
+
+    def print(self, *objects, **kwargs):
+        """Print objects, dropping rich markup tags"""
+
+        text = ' '.join(str(obj) for obj in objects)
+        file = self.file or sys.stdout
+        file.write(_MARKUP_RE.sub('', text) + '\n')
+        file.flush()
+
+
+def rich_available() -> bool:
+    """Whether rich can be imported"""
+
+    return importlib.util.find_spec('rich') is not None
+
+
+def get_console(stderr: bool = False, headless: Optional[bool] = None):
+    """
+    Return a console for status output
+
+    Headless runs (output not attached to a terminal, e.g. jobs spawned by
+    the API) get a PlainConsole so rich is never imported; interactive runs
+    get a rich Console when rich is installed.
+
+    Args:
+        stderr: Write to stderr instead of stdout
+        headless: Force plain output (default: detect from the stream's tty)
+    """
+
+    stream = sys.stderr if stderr else sys.stdout
+
+    if headless is None:
+        headless = not stream.isatty()
+
+    if not headless and rich_available():
+        from rich.console import Console
+        return Console(stderr=stderr)
+
+    return PlainConsole(file=stream if stderr else None)
@@ -4,13 +4,12 @@ Log decryption module supporting multiple encryption algorithms
 
 import base64
 import json
+from time import perf_counter
 from typing import Union
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
 import hashlib
 
+from .metrics import metrics
+
 
 class LogDecryptor:
     """Decrypt encrypted log data"""
@@ -37,6 +36,21 @@ class LogDecryptor:
         
         self.algorithm = algorithm
         self.key = self._parse_key(key, algorithm)
+        
+        # Import only the crypto backend this algorithm needs; both
+        # libraries are slow to import and most jobs use one mode
+        if 'CBC' in algorithm:
+            from Crypto.Cipher import AES
+            from Crypto.Util.Padding import unpad
+            self._aes = AES
+            self._unpad = unpad
+        else:
+            from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+            from cryptography.hazmat.backends import default_backend
+            self._cipher = Cipher
+            self._algorithms = algorithms
+            self._modes = modes
+            self._backend = default_backend()
     
     def _parse_key(self, key: str, algorithm: str) -> bytes:
         """
@@ -86,15 +100,29 @@ class LogDecryptor:
         Decrypt encrypted data
         
         Args:
-            encrypted_data: Base64 encoded encrypted data
+            encrypted_data: Base64 encoded encrypted data, either one
+                base64 string or colon-separated base64 parts
         
         Returns:
             Decrypted string or JSON object
         """
         
+        timed = metrics.enabled
+        
         try:
-            # Decode base64
-            encrypted_bytes = base64.b64decode(encrypted_data)
+            if timed:
+                start = perf_counter()
+            
+            # Decode base64; "iv:ciphertext" (and "iv:tag:ciphertext")
+            # layouts are base64 parts in the same order as the concatenated form
+            if ':' in encrypted_data:
+                encrypted_bytes = b''.join(base64.b64decode(part) for part in encrypted_data.split(':'))
+            else:
+                encrypted_bytes = base64.b64decode(encrypted_data)
+            
+            if timed:
+                decoded_at = perf_counter()
+                metrics.observe('base64', decoded_at - start)
             
             # Decrypt based on algorithm
             if 'CBC' in self.algorithm:
@@ -104,11 +132,20 @@ class LogDecryptor:
             else:
                 raise ValueError(f"Unsupported algorithm: {self.algorithm}")
             
+            if timed:
+                decrypted_at = perf_counter()
+                metrics.observe('aes', decrypted_at - decoded_at)
+            
             # Try to parse as JSON
             try:
-                return json.loads(decrypted)
+                result = json.loads(decrypted)
             except json.JSONDecodeError:
-                return decrypted
+                result = decrypted
+            
+            if timed:
+                metrics.observe('plaintext_json', perf_counter() - decrypted_at)
+            
+            return result
         
         except Exception as e:
             raise Exception(f"Decryption failed: {str(e)}")
@@ -125,11 +162,11 @@ class LogDecryptor:
         ciphertext = encrypted_bytes[16:]
         
         # Create cipher
-        cipher = AES.new(self.key, AES.MODE_CBC, iv)
+        cipher = self._aes.new(self.key, self._aes.MODE_CBC, iv)
         
         # Decrypt and unpad
         decrypted_padded = cipher.decrypt(ciphertext)
-        decrypted = unpad(decrypted_padded, AES.block_size)
+        decrypted = self._unpad(decrypted_padded, self._aes.block_size)
         
         return decrypted.decode('utf-8')
     
@@ -146,10 +183,10 @@ class LogDecryptor:
         ciphertext = encrypted_bytes[28:]
         
         # Create cipher
-        cipher = Cipher(
-            algorithms.AES(self.key),
-            modes.GCM(iv, tag),
-            backend=default_backend()
+        cipher = self._cipher(
+            self._algorithms.AES(self.key),
+            self._modes.GCM(iv, tag),
+            backend=self._backend
         )
         
         decryptor = cipher.decryptor()
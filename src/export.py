@@ -0,0 +1,236 @@
+"""
+Checkpointed, resumable exports of every log matching a query
+
+An export pages through the index oldest first with a point in time and
+search_after, decrypts each page and appends it to the output. After every
+page the output is flushed to disk and a checkpoint is written next to it
+(<output>.checkpoint) with:
+
+  * the point in time id and search_after sort values of the last page
+  * the timestamp of the newest exported log and the _ids exported at it
+  * records written and the byte size of the output
+
+Exported records do not repeat the ciphertext (no encrypted_<field> copy
+next to decrypted_<field>; the original field is still there).
+
+A resumed export truncates the output to the checkpointed size (dropping
+anything written after the last checkpoint) and continues in the same point
+in time. If that has expired, it opens a new one restricted to logs at or
+after the checkpointed timestamp and skips the _ids already exported, so no
+record is written twice.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from .atomic import atomic_write
+from .decryptor import LogDecryptor
+from .formatter import LogFormatter
+from .pipeline import append_output, decrypt_records
+from .result_cache import key_fingerprint
+
+CHECKPOINT_VERSION = 2
+EXPORT_PAGE_SIZE = 1000
+
+
+class ExportError(Exception):
+    """An export cannot be started or resumed"""
+
+
+def checkpoint_path(output) -> Path:
+    """Checkpoint file of an export writing to output"""
+
+    return Path(f'{output}.checkpoint')
+
+
+def export_fingerprint(url: str, index: str, query: Optional[Dict], key: str, algorithm: str,
+                       field: str, output_format: str) -> str:
+    """Digest identifying an export, so a checkpoint only resumes the same export"""
+
+    parts = {
+        'url': url.rstrip('/'),
+        'index': index,
+        'query': query,
+        'key': key_fingerprint(key),
+        'algorithm': algorithm,
+        'field': field,
+        'format': output_format,
+    }
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def load_checkpoint(path) -> Optional[Dict]:
+    """Saved checkpoint, or None if there is none"""
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise ExportError(f"Corrupt checkpoint {path}: {e}")
+
+
+def save_checkpoint(path, checkpoint: Dict):
+    """Write a checkpoint atomically"""
+
+    with atomic_write(path, fsync=True) as f:
+        json.dump(checkpoint, f)
+
+
+def _sync(path: Path):
+    """Flush a file's contents to disk"""
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def export_logs(client, index: str, query: Optional[Dict], decryptor: LogDecryptor,
+                output, fingerprint: str, field: str = 'message', format: str = 'json',
+                resume: bool = False, page_size: int = EXPORT_PAGE_SIZE,
+                keep_alive: str = '5m', reporter=None, on_warning=None) -> Dict:
+    """
+    Export every log matching query to output, checkpointing after each page
+
+    Args:
+        client: KibanaClient to fetch with
+        index: Index name or pattern
+        query: Elasticsearch query DSL
+        decryptor: Decryptor to use
+        output: Output file (NDJSON for JSON output, see append_output())
+        fingerprint: export_fingerprint() of the export
+        field: Field name containing encrypted data
+        format: Output format
+        resume: Continue from the output's checkpoint instead of starting over
+        page_size: Documents fetched per page
+        keep_alive: Point in time lifetime between pages
+        reporter: Progress reporter
+        on_warning: Called with a message for every missing field or failure
+
+    Returns:
+        The final checkpoint (records, decrypted, failed, bytes, ...)
+    """
+
+    output = Path(output)
+    ckpt_path = checkpoint_path(output)
+
+    if resume:
+        state = load_checkpoint(ckpt_path)
+        if state is None:
+            raise ExportError(f"No checkpoint to resume from at {ckpt_path}")
+        if state.get('version') != CHECKPOINT_VERSION or state.get('job') != fingerprint:
+            raise ExportError(f"{ckpt_path} belongs to a different export (index, query, "
+                              f"key, field or format changed)")
+        if state['complete']:
+            return state
+
+        size = output.stat().st_size if output.exists() else 0
+        if size < state['bytes']:
+            raise ExportError(f"{output} is shorter than its checkpoint "
+                              f"({size} < {state['bytes']} bytes), cannot resume")
+        # Drop whatever was written after the last checkpoint
+        os.truncate(output, state['bytes'])
+    else:
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'job': fingerprint,
+            'pit_id': None,
+            'search_after': None,
+            'timestamp': None,
+            'ids_at_timestamp': [],
+            'records': 0,
+            'decrypted': 0,
+            'failed': 0,
+            'bytes': 0,
+            'complete': False,
+        }
+        output.parent.mkdir(parents=True, exist_ok=True)
+        open(output, 'w').close()
+        save_checkpoint(ckpt_path, state)
+
+    if reporter:
+        reporter.add_fetched(state['records'])
+        reporter.add_results(state['decrypted'], state['failed'])
+        reporter.add_bytes_written(state['bytes'])
+
+    formatter = LogFormatter()
+    seen = set(state['ids_at_timestamp'])
+
+    def pages():
+        from elasticsearch import NotFoundError
+
+        while True:
+            if state['pit_id'] and state['search_after']:
+                pit_id, search_after, page_query = state['pit_id'], state['search_after'], query
+            else:
+                # New point in time: restart at the newest exported timestamp
+                pit_id = search_after = None
+                page_query = query
+                if state['timestamp'] is not None:
+                    page_query = {"bool": {"filter": [
+                        query or {"match_all": {}},
+                        {"range": {"@timestamp": {"gte": state['timestamp'],
+                                                  "format": "epoch_millis"}}},
+                    ]}}
+            progressed = False
+            try:
+                for page in client.iter_pit_pages(index, query=page_query, page_size=page_size,
+                                                  keep_alive=keep_alive, pit_id=pit_id,
+                                                  search_after=search_after):
+                    progressed = True
+                    yield page
+                return
+            except NotFoundError:
+                # A new point in time that fails straight away will not
+                # recover (e.g. the index is gone)
+                if pit_id is None and not progressed:
+                    raise
+                # The point in time expired; continue in a new one
+                state['pit_id'] = None
+
+    for hits, pit_id in pages():
+        # Skip logs exported before a switch to a new point in time
+        new_hits = []
+        for hit in hits:
+            timestamp = hit['sort'][0]
+            if timestamp != state['timestamp']:
+                state['timestamp'] = timestamp
+                seen = set()
+            elif hit['_id'] in seen:
+                continue
+            seen.add(hit['_id'])
+            new_hits.append(hit)
+
+        if reporter:
+            reporter.add_fetched(len(new_hits))
+
+        if new_hits:
+            decrypted_logs, failed_count = decrypt_records(
+                new_hits, decryptor, field=field, on_warning=on_warning,
+                on_result=reporter.add_record if reporter else None
+            )
+            written = append_output(decrypted_logs, output, format=format, field=field,
+                                    formatter=formatter, start=state['records'] + 1,
+                                    include_ciphertext=False)
+            _sync(output)
+            if reporter:
+                reporter.add_bytes_written(written)
+
+            state['records'] += len(decrypted_logs)
+            state['decrypted'] += len(decrypted_logs) - failed_count
+            state['failed'] += failed_count
+            state['bytes'] += written
+
+        state.update(pit_id=pit_id, search_after=hits[-1]['sort'], ids_at_timestamp=sorted(seen))
+        save_checkpoint(ckpt_path, state)
+
+    state.update(complete=True, pit_id=None)
+    save_checkpoint(ckpt_path, state)
+    return state
@@ -0,0 +1,146 @@
+"""
+Follow an index: poll for documents newer than the last one seen
+
+The cursor is the timestamp (sort value) of the newest document seen plus
+the _ids seen at exactly that timestamp. Each poll asks for documents at or
+after the cursor timestamp and drops the _ids already seen, so documents
+indexed late with the same timestamp as the last one are not lost (a plain
+search_after on the timestamp would skip them, and sorting on _id is not
+allowed on current Elasticsearch versions).
+
+The poll interval adapts to the arrival rate: it is aimed at collecting
+about target_batch new documents per poll, within [min_interval,
+max_interval], and backs off while the index is idle.
+"""
+
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from .metrics import metrics
+
+
+class LogFollower:
+    """Incrementally fetch new documents from an index"""
+
+    def __init__(self, client, index: str, query: Optional[Dict] = None,
+                 timestamp_field: str = '@timestamp', page_size: int = 500,
+                 min_interval: float = 0.5, max_interval: float = 30.0,
+                 target_batch: int = 100):
+        """
+        Initialize follower
+
+        Args:
+            client: KibanaClient to poll with (without a hit cache, since
+                    polls must always reach the cluster)
+            index: Index name or pattern
+            query: Elasticsearch query DSL new documents must match
+            timestamp_field: Date field documents are ordered by
+            page_size: Documents requested per search
+            min_interval: Shortest pause between polls (seconds)
+            max_interval: Longest pause between polls (seconds)
+            target_batch: New documents per poll the interval is tuned for
+        """
+
+        self.client = client
+        self.index = index
+        self.query = query or {"match_all": {}}
+        self.timestamp_field = timestamp_field
+        self.page_size = page_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_batch = target_batch
+        self.interval = min_interval
+
+        # Sort value of the newest document seen and the _ids seen at it
+        self._last_value = None
+        self._last_ids: Set[str] = set()
+
+    def _advance(self, hits: List[Dict]) -> List[Dict]:
+        """Drop already seen hits (ascending order) and move the cursor past the rest"""
+
+        new_hits = []
+        for hit in hits:
+            value = hit['sort'][0]
+            if value == self._last_value:
+                if hit['_id'] in self._last_ids:
+                    continue
+                self._last_ids.add(hit['_id'])
+            else:
+                self._last_value = value
+                self._last_ids = {hit['_id']}
+            new_hits.append(hit)
+        return new_hits
+
+    def backlog(self, size: int) -> List[Dict]:
+        """
+        The most recent documents, oldest first; following starts after them
+
+        Args:
+            size: Number of documents (0 starts following from the newest
+                  document without returning any)
+        """
+
+        sort = [{self.timestamp_field: {"order": "desc"}}]
+        hits = self.client.fetch_logs(self.index, query=self.query, size=max(size, 1), sort=sort)
+        hits.reverse()
+        new_hits = self._advance(hits)
+        return new_hits if size > 0 else []
+
+    def poll(self) -> List[Dict]:
+        """All documents that arrived since the last poll, oldest first"""
+
+        sort = [{self.timestamp_field: {"order": "asc"}}]
+        new_hits = []
+
+        while True:
+            query = self.query
+            if self._last_value is not None:
+                query = {"bool": {"filter": [
+                    self.query,
+                    {"range": {self.timestamp_field: {"gte": self._last_value,
+                                                      "format": "epoch_millis"}}},
+                ]}}
+
+            # Documents already seen at the cursor timestamp sort first, so
+            # asking for that many more always yields a full page of new ones
+            size = self.page_size + len(self._last_ids)
+            hits = self.client.fetch_logs(self.index, query=query, size=size, sort=sort)
+            page = self._advance(hits)
+            new_hits.extend(page)
+
+            if len(hits) < size or not page:
+                break
+
+        if metrics.enabled:
+            metrics.inc('follow_polls')
+        return new_hits
+
+    def _adapt(self, arrived: int, elapsed: float):
+        """Aim the next interval at target_batch documents per poll"""
+
+        if arrived == 0:
+            interval = self.interval * 2
+        else:
+            rate = arrived / max(elapsed, 1e-3)
+            interval = self.target_batch / rate
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+
+    def follow(self, should_stop: Optional[Callable[[], bool]] = None) -> Iterator[List[Dict]]:
+        """
+        Poll forever (or until should_stop() is true), yielding each
+        non-empty batch of new documents
+        """
+
+        last_poll = time.monotonic()
+        while not (should_stop and should_stop()):
+            hits = self.poll()
+            now = time.monotonic()
+            self._adapt(len(hits), now - last_poll)
+            last_poll = now
+
+            if hits:
+                yield hits
+
+            if should_stop and should_stop():
+                break
+            time.sleep(self.interval)
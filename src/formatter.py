@@ -3,31 +3,49 @@ Output formatter for decrypted logs
 """
 
 import json
+from functools import partial
 from pathlib import Path
 from typing import List, Dict
-from rich.console import Console
-from rich.table import Table
-from rich.syntax import Syntax
 from datetime import datetime
 
+from .console import get_console, rich_available
+from .metrics import metrics
+from .record import json_default
+
 
 class LogFormatter:
     """Format and display decrypted logs"""
     
     def __init__(self):
-        self.console = Console()
+        # Created on first print so headless save_* runs never import rich
+        self._console = None
+    
+    @property
+    def console(self):
+        if self._console is None:
+            self._console = get_console(headless=not rich_available())
+        return self._console
     
-    def print_json(self, logs: List[Dict]):
+    @metrics.timed('render_json')
+    def print_json(self, logs: List[Dict], include_ciphertext: bool = True):
         """Print logs as formatted JSON"""
         
-        json_str = json.dumps(logs, indent=2, default=str)
+        json_str = json.dumps(logs, indent=2,
+                              default=partial(json_default, include_ciphertext=include_ciphertext))
+        
+        if not rich_available():
+            self.console.print(json_str)
+            return
+        
+        from rich.syntax import Syntax
         syntax = Syntax(json_str, "json", theme="monokai", line_numbers=True)
         self.console.print(syntax)
     
-    def print_text(self, logs: List[Dict], field: str = 'message'):
-        """Print logs as plain text"""
+    @metrics.timed('render_text')
+    def print_text(self, logs: List[Dict], field: str = 'message', start: int = 1):
+        """Print logs as plain text, numbered from start"""
         
-        for i, log in enumerate(logs, 1):
+        for i, log in enumerate(logs, start):
             source = log.get('_source', {})
             timestamp = source.get('@timestamp', source.get('timestamp', 'N/A'))
             message = source.get(field, 'N/A')
@@ -36,9 +54,17 @@ class LogFormatter:
             self.console.print(message)
             self.console.print("-" * 80)
     
+    @metrics.timed('render_table')
     def print_table(self, logs: List[Dict], field: str = 'message', max_width: int = 80):
         """Print logs as a formatted table"""
         
+        if not rich_available():
+            # Tables need rich; fall back to plain text output
+            self.print_text(logs, field=field)
+            return
+        
+        from rich.table import Table
+        
         table = Table(title="Decrypted Logs", show_lines=True)
         
         table.add_column("Index", style="cyan", width=6)
@@ -79,21 +105,37 @@ class LogFormatter:
         
         self.console.print(table)
     
-    def save_json(self, logs: List[Dict], output_path: Path):
+    @metrics.timed('write_json')
+    def save_json(self, logs: List[Dict], output_path: Path, include_ciphertext: bool = True):
         """Save logs as JSON file"""
         
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(logs, f, indent=2, default=str)
+            # LogRecords become hit dicts one at a time while writing
+            json.dump(logs, f, indent=2,
+                      default=partial(json_default, include_ciphertext=include_ciphertext))
     
-    def save_text(self, logs: List[Dict], output_path: Path, field: str = 'message'):
-        """Save logs as plain text file"""
+    @metrics.timed('write_ndjson')
+    def append_ndjson(self, logs: List[Dict], output_path: Path, include_ciphertext: bool = True):
+        """Append logs to a file, one JSON document per line"""
         
         output_path.parent.mkdir(parents=True, exist_ok=True)
+        default = partial(json_default, include_ciphertext=include_ciphertext)
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for i, log in enumerate(logs, 1):
+        with open(output_path, 'a', encoding='utf-8') as f:
+            for log in logs:
+                f.write(json.dumps(log, default=default) + '\n')
+    
+    @metrics.timed('write_text')
+    def save_text(self, logs: List[Dict], output_path: Path, field: str = 'message',
+                  append: bool = False, start: int = 1):
+        """Save logs as plain text file (or append to it), numbered from start"""
+        
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with open(output_path, 'a' if append else 'w', encoding='utf-8') as f:
+            for i, log in enumerate(logs, start):
                 source = log.get('_source', {})
                 timestamp = source.get('@timestamp', source.get('timestamp', 'N/A'))
                 message = source.get(field, 'N/A')
@@ -102,6 +144,7 @@ class LogFormatter:
                 f.write(f"{message}\n")
                 f.write("-" * 80 + "\n\n")
     
+    @metrics.timed('write_csv')
     def save_csv(self, logs: List[Dict], output_path: Path, fields: List[str] = None):
         """Save logs as CSV file"""
         
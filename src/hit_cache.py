@@ -0,0 +1,183 @@
+"""
+Compressed on-disk cache of raw Elasticsearch hits
+
+Pages are stored exactly as Elasticsearch returned them (zlib-compressed
+JSON), keyed by cluster and credentials, index, normalized query, sort and
+page cursor. They are written before any decryption happens, so the cache
+never holds plaintext. Entries expire after a TTL, and the least recently
+used are evicted once the cache exceeds its size limit.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .atomic import atomic_write
+from .metrics import metrics
+from .result_cache import parse_size
+
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_SIZE = 256 * 1024 ** 2
+
+
+class HitCache:
+    """TTL and size-bounded cache of fetched hit pages"""
+
+    def __init__(self, directory, ttl: float = DEFAULT_TTL, max_size: int = DEFAULT_MAX_SIZE,
+                 compression_level: int = 6):
+        """
+        Initialize cache
+
+        Args:
+            directory: Cache directory (created owner-only if missing)
+            ttl: Seconds a page is served after it was fetched
+            max_size: Total compressed bytes to keep (may be exceeded by
+                      up to 1/16th between evictions)
+            compression_level: zlib level (1 fastest .. 9 smallest)
+        """
+
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.compression_level = compression_level
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._written = 0
+
+        self.evict()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Digest of the JSON-serialisable parts (dict keys are normalized)"""
+
+        canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f'{key}.hits.z'
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached page (fresh objects on every call), or None if missing or expired"""
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                payload = json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            self._count('hit_cache_misses')
+            return None
+
+        if time.time() - payload.get('stored_at', 0) > self.ttl:
+            self._remove(path)
+            self._count('hit_cache_misses')
+            return None
+
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self._count('hit_cache_hits')
+        return payload
+
+    def put(self, key: str, hits: List[Dict], **fields):
+        """
+        Store a page of hits as returned by Elasticsearch
+
+        Args:
+            key: Page key from make_key()
+            hits: Raw hits, before any decryption
+            **fields: Extra JSON-serialisable values stored with the page
+        """
+
+        payload = dict(fields, hits=hits, stored_at=time.time())
+        data = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'),
+                             self.compression_level)
+        if len(data) > self.max_size:
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(mode=0o700, exist_ok=True)
+
+        # Readers never see a partial page
+        with atomic_write(path, 'wb', permissions=0o600) as f:
+            f.write(data)
+
+        if metrics.enabled:
+            metrics.inc('hit_cache_bytes_written', len(data))
+
+        # Scanning the directory on every page would make long scrolls
+        # quadratic; evict after every 1/16th of max_size written instead
+        self._written += len(data)
+        if self._written >= self.max_size // 16:
+            self._written = 0
+            self.evict()
+
+    def evict(self):
+        """Remove expired pages, then least recently used ones until under max_size"""
+
+        with self._lock:
+            now = time.time()
+            entries = []
+            for path in self.directory.glob('*/*.hits.z'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                # mtime is never older than the fetch time, so this only
+                # removes pages that are certainly expired
+                if now - stat.st_mtime > self.ttl:
+                    self._remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_size:
+                    break
+                self._remove(path)
+                total -= size
+
+    def clear(self):
+        """Remove every page"""
+
+        with self._lock:
+            for path in self.directory.glob('*/*.hits.z'):
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _count(name: str):
+        if metrics.enabled:
+            metrics.inc(name)
+
+
+def get_default_hit_cache() -> Optional[HitCache]:
+    """
+    Hit cache configured from the environment, or None when disabled
+
+    Enabled by HIT_CACHE_DIR; HIT_CACHE_TTL (seconds) and HIT_CACHE_MAX_SIZE
+    (e.g. 256MB) tune it.
+    """
+
+    directory = os.getenv('HIT_CACHE_DIR')
+    if not directory:
+        return None
+
+    return HitCache(
+        directory,
+        ttl=float(os.getenv('HIT_CACHE_TTL', str(DEFAULT_TTL))),
+        max_size=parse_size(os.getenv('HIT_CACHE_MAX_SIZE', str(DEFAULT_MAX_SIZE))),
+    )
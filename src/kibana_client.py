@@ -2,19 +2,46 @@
 Kibana/Elasticsearch client for fetching logs
 """
 
-from elasticsearch import Elasticsearch
-from typing import List, Dict, Optional
+from elasticsearch import ApiError, ConnectionError as ESConnectionError, Elasticsearch
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import math
+import time
 import warnings
 
+from .connection_pool import ClientRegistry
+from .hit_cache import HitCache
+from .metrics import metrics
+from .throttle import FetchController
+
 warnings.filterwarnings('ignore', message='Unverified HTTPS request')
 
+# Retries of a time range fetched by iter_time_shards() after a transient error
+SHARD_RETRIES = 2
+
+# Responses worth retrying: overloaded or unavailable cluster
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a failed request may succeed when tried again"""
+    
+    if isinstance(error, ESConnectionError):
+        return True
+    if isinstance(error, ApiError):
+        # An expired point in time is replaced by a new one on retry
+        return (error.meta.status in TRANSIENT_STATUSES
+                or error.error == 'search_context_missing_exception')
+    return False
+
 
 class KibanaClient:
     """Client for connecting to Elasticsearch/Kibana and fetching logs"""
     
     def __init__(self, elasticsearch_url: str, username: Optional[str] = None,
                  password: Optional[str] = None, api_key: Optional[str] = None,
-                 verify_certs: bool = False):
+                 verify_certs: bool = False, registry: Optional[ClientRegistry] = None,
+                 hit_cache: Optional[HitCache] = None,
+                 controller: Optional[FetchController] = None):
         """
         Initialize Kibana/Elasticsearch client
         
@@ -24,8 +51,35 @@ class KibanaClient:
             password: Basic auth password
             api_key: API key for authentication
             verify_certs: Verify SSL certificates (default: False)
+            registry: Client registry to borrow a pooled connection from
+                      instead of opening a new one (default: None)
+            hit_cache: Cache of raw fetched pages to serve repeat queries
+                       from (default: None)
+            controller: Adapts the page size of paged fetches and paces
+                        every fetch request to the cluster's responses,
+                        instead of fixed page sizes (default: None)
         """
         
+        self.registry = registry
+        self.controller = controller
+        self._registry_key = None
+        self.hit_cache = hit_cache
+        # Cached pages are only shared between clients with the same
+        # cluster and credentials
+        self._cache_scope = ClientRegistry.make_key(
+            elasticsearch_url, username, password, api_key, verify_certs
+        )
+        
+        if registry is not None:
+            # Reuse pooled connections and the cached health status
+            self._registry_key, self.es = registry.get(
+                elasticsearch_url, username, password, api_key, verify_certs
+            )
+            if not registry.is_healthy(self._registry_key):
+                self.close()
+                raise ConnectionError("Failed to connect to Elasticsearch")
+            return
+        
         # Build connection parameters
         params = {
             'hosts': [elasticsearch_url],
@@ -44,8 +98,34 @@ class KibanaClient:
         if not self.es.ping():
             raise ConnectionError("Failed to connect to Elasticsearch")
     
+    def _send(self, request: Callable[[Any, int], Any], page_size: int,
+              limit: Optional[int] = None) -> Any:
+        """
+        Send a fetch request, through the controller if there is one
+        
+        Args:
+            request: Sends the request with an Elasticsearch client and a
+                     page size
+            page_size: Page size without a controller
+            limit: Largest page size wanted either way
+        
+        Returns:
+            The response
+        """
+        
+        if self.controller is None:
+            return request(self.es, page_size if limit is None else min(page_size, limit))
+        
+        # Overload responses reach the controller instead of being retried
+        # by the client straight away
+        es = self.es.options(retry_on_status=())
+        return self.controller.call(
+            lambda size: request(es, size if limit is None else min(size, limit))
+        )
+    
     def fetch_logs(self, index: str, query: Optional[Dict] = None, 
-                   size: int = 100, sort: Optional[List] = None) -> List[Dict]:
+                   size: int = 100, sort: Optional[List] = None,
+                   on_total: Optional[Callable[[int], None]] = None) -> List[Dict]:
         """
         Fetch logs from Elasticsearch
         
@@ -54,6 +134,8 @@ class KibanaClient:
             query: Elasticsearch query DSL (default: match_all)
             size: Number of logs to fetch (default: 100)
             sort: Sort order (default: timestamp descending)
+            on_total: Called with the exact number of matching logs (the
+                      search then tracks total hits)
         
         Returns:
             List of log documents
@@ -67,19 +149,46 @@ class KibanaClient:
         if sort is None:
             sort = [{"@timestamp": {"order": "desc"}}]
         
+        # A cached page of at least this size (or the complete result)
+        # also answers smaller requests for the same query
+        cache_key = None
+        if self.hit_cache is not None:
+            cache_key = self.hit_cache.make_key('search', self._cache_scope, index, query, sort)
+            cached = self.hit_cache.get(cache_key)
+            if (cached and (len(cached['hits']) >= size or cached['exhausted'])
+                    and (on_total is None or cached.get('total') is not None)):
+                if on_total is not None:
+                    on_total(cached['total'])
+                return cached['hits'][:size]
+        
         # Build search body
         search_body = {
             "query": query,
             "size": size,
             "sort": sort
         }
+        if on_total is not None:
+            search_body["track_total_hits"] = True
         
         try:
             # Execute search
-            response = self.es.search(index=index, body=search_body)
+            with metrics.timer('fetch'):
+                response = self._send(lambda es, _: es.search(index=index, body=search_body), size)
             
             # Extract hits
             hits = response['hits']['hits']
+            total = response['hits']['total']['value'] if on_total is not None else None
+            
+            if metrics.enabled:
+                metrics.inc('fetch_requests')
+                metrics.inc('fetched_records', len(hits))
+            
+            # Store the page as returned, before callers decrypt it in place
+            if cache_key:
+                self.hit_cache.put(cache_key, hits, exhausted=len(hits) < size, total=total)
+            
+            if on_total is not None:
+                on_total(total)
             
             return hits
         
@@ -94,7 +203,9 @@ class KibanaClient:
         Args:
             index: Index name or pattern
             query: Elasticsearch query DSL
-            scroll_size: Number of documents per scroll
+            scroll_size: Number of documents per scroll (with a controller,
+                         its page size when the scroll starts; a scroll
+                         cannot change it later)
             scroll_time: Scroll context lifetime (e.g., '5m')
         
         Returns:
@@ -103,16 +214,28 @@ class KibanaClient:
         
         if query is None:
             query = {"match_all": {}}
+        if self.controller is not None:
+            scroll_size = self.controller.page_size
+        
+        # Serve a complete earlier scroll of the same query page by page
+        cache_base = None
+        if self.hit_cache is not None:
+            cache_base = self.hit_cache.make_key('scroll', self._cache_scope, index, query, scroll_size)
+            cached = self._cached_scroll(cache_base)
+            if cached is not None:
+                return cached
         
         all_logs = []
+        page = 0
         
         # Initial search
-        response = self.es.search(
-            index=index,
-            body={"query": query},
-            scroll=scroll_time,
-            size=scroll_size
-        )
+        with metrics.timer('fetch'):
+            response = self._send(lambda es, size: es.search(
+                index=index,
+                body={"query": query},
+                scroll=scroll_time,
+                size=size
+            ), scroll_size)
         
         scroll_id = response['_scroll_id']
         hits = response['hits']['hits']
@@ -120,16 +243,347 @@ class KibanaClient:
         
         # Continue scrolling
         while len(hits) > 0:
-            response = self.es.scroll(scroll_id=scroll_id, scroll=scroll_time)
+            if cache_base:
+                self.hit_cache.put(self.hit_cache.make_key(cache_base, page), hits)
+                page += 1
+            with metrics.timer('fetch'):
+                response = self._send(
+                    lambda es, _: es.scroll(scroll_id=scroll_id, scroll=scroll_time), scroll_size
+                )
             scroll_id = response['_scroll_id']
             hits = response['hits']['hits']
             all_logs.extend(hits)
         
+        if metrics.enabled:
+            metrics.inc('fetched_records', len(all_logs))
+        
+        # The manifest is written last, so only complete scrolls are served
+        if cache_base:
+            self.hit_cache.put(self.hit_cache.make_key(cache_base, 'manifest'), [], pages=page)
+        
         # Clear scroll
         self.es.clear_scroll(scroll_id=scroll_id)
         
         return all_logs
     
+    def iter_pit_pages(self, index: str, query: Optional[Dict] = None, page_size: int = 1000,
+                       keep_alive: str = '5m', pit_id: Optional[str] = None,
+                       search_after: Optional[List] = None, descending: bool = False,
+                       limit: Optional[int] = None,
+                       on_total: Optional[Callable[[int], None]] = None
+                       ) -> Iterator[Tuple[List[Dict], str]]:
+        """
+        Page through every matching log, oldest first, with a point in time
+        and search_after
+        
+        Args:
+            index: Index name or pattern
+            query: Elasticsearch query DSL
+            page_size: Number of documents per page (the controller's page
+                       size instead, with a controller)
+            keep_alive: Point in time lifetime between pages (e.g., '5m')
+            pit_id: Continue in this open point in time instead of opening one
+            search_after: Sort values of the last document already seen
+            descending: Newest first instead
+            limit: Stop after this many documents
+            on_total: Called with the exact number of matching logs (the
+                      first page then tracks total hits)
+        
+        Yields:
+            (hits, point in time id) per page; the 'sort' values of the last
+            hit continue after the page
+        """
+        
+        if query is None:
+            query = {"match_all": {}}
+        
+        order = "desc" if descending else "asc"
+        sort = [{"@timestamp": {"order": order}}, {"_shard_doc": {"order": order}}]
+        
+        if pit_id is None:
+            pit_id = self.es.open_point_in_time(index=index, keep_alive=keep_alive)['id']
+        
+        while limit is None or limit > 0:
+            body = {
+                "query": query,
+                "sort": sort,
+                "pit": {"id": pit_id, "keep_alive": keep_alive},
+            }
+            if search_after:
+                body["search_after"] = search_after
+            if on_total is not None:
+                body["track_total_hits"] = True
+            
+            with metrics.timer('fetch'):
+                response = self._send(lambda es, size: es.search(body={**body, "size": size}),
+                                      page_size, limit)
+            
+            pit_id = response.get('pit_id', pit_id)
+            hits = response['hits']['hits']
+            if on_total is not None:
+                on_total(response['hits']['total']['value'])
+                on_total = None
+            
+            if metrics.enabled:
+                metrics.inc('fetch_requests')
+                metrics.inc('fetched_records', len(hits))
+            
+            if not hits:
+                break
+            
+            yield hits, pit_id
+            search_after = hits[-1]['sort']
+            if limit is not None:
+                limit -= len(hits)
+        
+        # Left open on errors, so an interrupted caller can continue in it
+        # until it expires
+        self.es.close_point_in_time(id=pit_id)
+    
+    def count(self, index: str, query: Optional[Dict] = None) -> int:
+        """
+        Number of logs matching a query (exact, via _count)
+        
+        Args:
+            index: Index name or pattern
+            query: Elasticsearch query DSL
+        """
+        
+        if query is None:
+            query = {"match_all": {}}
+        
+        with metrics.timer('plan'):
+            response = self.es.count(index=index, body={"query": query})
+        return response['count']
+    
+    def date_histogram(self, index: str, query: Optional[Dict] = None, buckets: int = 100,
+                       field: str = '@timestamp') -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Document counts over time for a query
+        
+        The matching time range is looked up first (min/max aggregation) and
+        divided into about the given number of fixed-width buckets.
+        
+        Args:
+            index: Index name or pattern
+            query: Elasticsearch query DSL
+            buckets: Approximate number of buckets
+            field: Date field
+        
+        Returns:
+            Tuple of (non-empty buckets as (start epoch millis, doc count) in
+            time order, bucket width in milliseconds)
+        """
+        
+        if query is None:
+            query = {"match_all": {}}
+        
+        with metrics.timer('plan'):
+            response = self.es.search(index=index, body={
+                "query": query,
+                "size": 0,
+                "track_total_hits": False,
+                "aggs": {"first": {"min": {"field": field}}, "last": {"max": {"field": field}}},
+            })
+        first = response['aggregations']['first']['value']
+        last = response['aggregations']['last']['value']
+        if first is None or last is None:
+            return [], 0
+        
+        interval = max(1000, math.ceil((last - first + 1) / max(buckets, 1)))
+        with metrics.timer('plan'):
+            response = self.es.search(index=index, body={
+                "query": query,
+                "size": 0,
+                "track_total_hits": False,
+                "aggs": {"histogram": {"date_histogram": {
+                    "field": field,
+                    "fixed_interval": f"{interval}ms",
+                    "min_doc_count": 1,
+                }}},
+            })
+        
+        histogram = [(bucket['key'], bucket['doc_count'])
+                     for bucket in response['aggregations']['histogram']['buckets']]
+        return histogram, interval
+    
+    def fetch_planned(self, index: str, query: Optional[Dict], plan,
+                      page_size: int = 1000) -> List[Dict]:
+        """
+        Fetch logs the way a FetchPlan (see src/planner.py) says, newest first
+        
+        Args:
+            index: Index name or pattern
+            query: Elasticsearch query DSL
+            plan: FetchPlan of this index and query (an uncounted plan gets
+                  its total from the fetch)
+            page_size: Documents per page of point in time strategies
+                       (without a controller)
+        
+        Returns:
+            List of log documents
+        """
+        
+        if plan.size == 0:
+            return []
+        
+        # An uncounted search learns the number of matches as it goes
+        on_total = None
+        if plan.total is None:
+            def on_total(total):
+                plan.total = total
+        
+        # With a controller, a search bigger than its page size is paged too
+        if plan.strategy == 'search' and (self.controller is None
+                                          or plan.size <= self.controller.page_size):
+            return self.fetch_logs(index, query=query, size=plan.size, on_total=on_total)
+        
+        if plan.strategy == 'parallel':
+            logs = []
+            for _, hits in self.iter_time_shards(index, query, plan.partitions,
+                                                 timestamp_field=plan.timestamp_field,
+                                                 readers=plan.readers, page_size=page_size):
+                logs.extend(hits)
+            return logs
+        
+        return self._fetch_pit(index, query, plan.size, page_size, on_total=on_total)
+    
+    def iter_time_shards(self, index: str, query: Optional[Dict], shards: List[Tuple],
+                         timestamp_field: str = '@timestamp', readers: int = 4,
+                         ordered: bool = True, descending: bool = True, page_size: int = 1000,
+                         retries: int = SHARD_RETRIES) -> Iterator[Tuple[int, List[Dict]]]:
+        """
+        Fetch time ranges concurrently, each with its own point in time cursor
+        
+        A range that fails with a transient error (connection problem, 429,
+        5xx, expired point in time) is fetched again from its start, up to
+        retries times; small ranges keep such retries cheap. Ranges are only
+        fetched a few ahead of the one being yielded, so memory stays bounded.
+        
+        Args:
+            index: Index name or pattern
+            query: Elasticsearch query DSL
+            shards: Time ranges as (lower, upper, ...) epoch millis, None
+                    for open ends, in time order and not overlapping (see
+                    src/planner.py)
+            timestamp_field: Date field the ranges are on
+            readers: Ranges fetched at the same time
+            ordered: Yield ranges in time order (newest first when
+                     descending) instead of as soon as each is complete
+            descending: Newest first, within and across ranges
+            page_size: Documents per page
+            retries: Retries of a failed range
+        
+        Yields:
+            (range number, all its hits in sort order) per range
+        """
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+        from .planner import range_query
+        
+        emit_order = list(range(len(shards)))
+        if descending:
+            emit_order.reverse()
+        # Ranges fetched or waiting to be yielded at the same time
+        window = max(readers, 1) * 2
+        
+        executor = ThreadPoolExecutor(max_workers=max(readers, 1))
+        pending = {}
+        ready = {}
+        to_submit = iter(emit_order)
+        next_emit = 0
+        
+        def fill():
+            while len(pending) + len(ready) < window:
+                number = next(to_submit, None)
+                if number is None:
+                    return
+                lower, upper = shards[number][:2]
+                shard_query = range_query(query, lower, upper, timestamp_field)
+                future = executor.submit(self._fetch_shard, index, shard_query,
+                                         page_size, descending, retries)
+                pending[future] = number
+        
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    number = pending.pop(future)
+                    hits = future.result()
+                    if metrics.enabled:
+                        metrics.inc('fetch_shards')
+                    if ordered:
+                        ready[number] = hits
+                    else:
+                        yield number, hits
+                
+                while ordered and next_emit < len(emit_order) and emit_order[next_emit] in ready:
+                    number = emit_order[next_emit]
+                    next_emit += 1
+                    yield number, ready.pop(number)
+                fill()
+        finally:
+            # Stop on errors or when the caller stops early
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+    
+    def _fetch_shard(self, index: str, query: Dict, page_size: int, descending: bool,
+                     retries: int) -> List[Dict]:
+        """All logs of one time range, retrying transient failures from its start"""
+        
+        for attempt in range(retries + 1):
+            try:
+                return self._fetch_pit(index, query, None, page_size, descending=descending)
+            except Exception as e:
+                if attempt == retries or not _is_transient(e):
+                    raise
+                if metrics.enabled:
+                    metrics.inc('fetch_shard_retries')
+                time.sleep(min(0.5 * 2 ** attempt, 5.0))
+    
+    def _fetch_pit(self, index: str, query: Optional[Dict], size: Optional[int],
+                   page_size: int, descending: bool = True,
+                   on_total: Optional[Callable[[int], None]] = None) -> List[Dict]:
+        """The newest (or oldest) size, or all, matching logs, paged with a point in time"""
+        
+        logs = []
+        pit_id = self.es.open_point_in_time(index=index, keep_alive='5m')['id']
+        try:
+            for hits, pit_id in self.iter_pit_pages(index, query=query, pit_id=pit_id,
+                                                    descending=descending,
+                                                    page_size=page_size, limit=size,
+                                                    on_total=on_total):
+                logs.extend(hits)
+        except Exception:
+            # Do not leave the point in time open until it expires
+            try:
+                self.es.close_point_in_time(id=pit_id)
+            except Exception:
+                pass
+            raise
+        return logs
+    
+    def _cached_scroll(self, cache_base: str) -> Optional[List[Dict]]:
+        """All pages of a cached scroll, or None if any page is missing or expired"""
+        
+        manifest = self.hit_cache.get(self.hit_cache.make_key(cache_base, 'manifest'))
+        if manifest is None:
+            return None
+        
+        all_logs = []
+        for page in range(manifest['pages']):
+            cached = self.hit_cache.get(self.hit_cache.make_key(cache_base, page))
+            if cached is None:
+                return None
+            all_logs.extend(cached['hits'])
+        return all_logs
+    
     def close(self):
-        """Close the Elasticsearch connection"""
+        """Close the Elasticsearch connection (or return it to the registry)"""
+        if self.registry is not None:
+            if self._registry_key is not None:
+                self.registry.release(self._registry_key)
+                self._registry_key = None
+            return
         self.es.close()
@@ -0,0 +1,73 @@
+"""
+Helpers for merging several streams of log hits by timestamp
+"""
+
+import heapq
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+def timestamp_key(hit: Dict) -> float:
+    """
+    Sort key for a log hit based on its timestamp
+
+    Prefers the first Elasticsearch sort value (epoch millis for date
+    fields) and falls back to parsing ``@timestamp``/``timestamp`` from
+    ``_source``. Hits without a usable timestamp sort first.
+
+    Args:
+        hit: Log entry in Elasticsearch hit format, or a LogRecord
+
+    Returns:
+        Timestamp as epoch seconds
+    """
+
+    sort_values = hit.get('sort')
+    if sort_values and isinstance(sort_values[0], (int, float)):
+        return sort_values[0] / 1000.0
+
+    source = hit.get('_source', {})
+    timestamp = source.get('@timestamp', source.get('timestamp'))
+
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp) / 1000.0
+
+    if isinstance(timestamp, str):
+        try:
+            return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+
+    return float('-inf')
+
+
+def is_descending(sort: Optional[List]) -> bool:
+    """Whether an Elasticsearch sort spec orders the primary key descending"""
+
+    if not sort:
+        return True
+
+    primary = sort[0]
+    if isinstance(primary, dict):
+        spec = next(iter(primary.values()))
+        if isinstance(spec, dict):
+            return spec.get('order', 'asc') == 'desc'
+        return spec == 'desc'
+
+    return False
+
+
+def merge_by_timestamp(streams: Iterable[Iterable[Dict]],
+                       descending: bool = True) -> Iterator[Dict]:
+    """
+    K-way merge of already-sorted hit streams into one ordered stream
+
+    Args:
+        streams: Iterables of hits, each sorted by timestamp
+        descending: Whether the streams are sorted newest first
+
+    Returns:
+        Iterator over all hits in timestamp order
+    """
+
+    return heapq.merge(*streams, key=timestamp_key, reverse=descending)
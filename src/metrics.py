@@ -0,0 +1,223 @@
+"""
+Lightweight per-stage timers, counters and latency histograms
+
+Instrumentation is off by default and costs a single attribute check per
+call site; enable it with ``metrics.enabled = True`` (the CLI does this for
+--metrics and --metrics-file).
+"""
+
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+from .atomic import atomic_write
+
+# Upper bounds (seconds) of the latency histogram buckets: 1us .. 60s
+BUCKETS: List[float] = [
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile (upper bound of the bucket it falls in)"""
+
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+
+class Metrics:
+    """Registry of stage timings and counters (thread-safe)"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        # Fetch threads (time-range readers, worker jobs) record concurrently
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        """Record one timing for a stage"""
+
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1):
+        """Increment a counter"""
+
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time a block of code as one observation of a stage"""
+
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str):
+        """Decorator timing every call of a function as a stage"""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(stage, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        """Drop all recorded values"""
+
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def summary(self) -> Dict:
+        """Recorded values as a JSON-serialisable dict"""
+
+        with self._lock:
+            return self._summary()
+
+    def _summary(self) -> Dict:
+        return {
+            'stages': {
+                stage: {
+                    'count': h.count,
+                    'total_seconds': round(h.total, 6),
+                    'mean_seconds': h.total / h.count if h.count else 0.0,
+                    'p50_seconds': h.quantile(0.5),
+                    'p95_seconds': h.quantile(0.95),
+                    'p99_seconds': h.quantile(0.99),
+                    'max_seconds': h.max,
+                }
+                for stage, h in sorted(self.stages.items())
+            },
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def format_summary(self) -> str:
+        """Human-readable stage and counter table"""
+
+        with self._lock:
+            stages = list(self.stages.items())
+            counters = sorted(self.counters.items())
+
+        lines = [
+            f"{'Stage':<22}{'Count':>10}{'Total s':>11}{'Mean':>11}{'p95':>11}{'Max':>11}",
+            '-' * 76,
+        ]
+        for stage, h in sorted(stages, key=lambda item: -item[1].total):
+            mean = h.total / h.count if h.count else 0.0
+            lines.append(
+                f"{stage:<22}{h.count:>10}{h.total:>11.4f}{_fmt(mean):>11}"
+                f"{_fmt(h.quantile(0.95)):>11}{_fmt(h.max):>11}"
+            )
+        if counters:
+            lines.append('')
+            for name, value in counters:
+                lines.append(f"{name:<22}{value:>10,.0f}")
+        return '\n'.join(lines)
+
+    def to_prometheus(self, prefix: str = 'loggin_genie') -> str:
+        """Recorded values in the Prometheus text exposition format"""
+
+        with self._lock:
+            stages = sorted(self.stages.items())
+            counters = sorted(self.counters.items())
+
+        lines = [
+            f'# HELP {prefix}_stage_seconds Time spent per pipeline stage',
+            f'# TYPE {prefix}_stage_seconds histogram',
+        ]
+        for stage, h in stages:
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS + [float('inf')], h.counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {h.total}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {h.count}')
+
+        for name, value in counters:
+            metric = f'{prefix}_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: Path):
+        """Write metrics to a Prometheus textfile (.prom) or a JSON file"""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        if path.suffix == '.prom':
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.summary(), indent=2) + '\n'
+
+        # Write atomically so a textfile collector never reads a partial file
+        with atomic_write(path) as f:
+            f.write(content)
+
+
+def _fmt(seconds: float) -> str:
+    """Format a duration with a readable unit"""
+
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:.1f}us'
+    if seconds < 1:
+        return f'{seconds * 1e3:.2f}ms'
+    return f'{seconds:.2f}s'
+
+
+# Process-wide registry used by the instrumented modules
+metrics = Metrics()
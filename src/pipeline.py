@@ -0,0 +1,166 @@
+"""
+Decryption pipeline shared by the CLI and the resident worker
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .decryptor import LogDecryptor
+from .formatter import LogFormatter
+from .metrics import metrics
+from .record import LogRecord, reset_shared_values
+
+
+def decrypt_log(log: Dict, decryptor: LogDecryptor, field: str = 'message',
+                on_warning: Optional[Callable[[str], None]] = None,
+                include_ciphertext: bool = True) -> bool:
+    """
+    Decrypt a field of one log entry in place
+
+    Args:
+        include_ciphertext: Also keep a copy of the ciphertext as encrypted_<field>
+
+    Returns:
+        False if decryption failed (the error is stored in the log), True
+        otherwise (including logs without the field)
+    """
+
+    # Get the source object
+    source = log.get('_source', {})
+
+    try:
+        encrypted_data = source.get(field)
+
+        if encrypted_data:
+            decrypted_data = decryptor.decrypt(encrypted_data)
+            # Preserve original encrypted data and add decrypted version
+            if include_ciphertext:
+                source[f'encrypted_{field}'] = encrypted_data
+            source[f'decrypted_{field}'] = decrypted_data
+            source['_decrypted'] = True
+            log['_source'] = source
+        elif on_warning:
+            on_warning(f"Field '{field}' not found in log")
+    except Exception as e:
+        if on_warning:
+            on_warning(f"Failed to decrypt log: {e}")
+        source['_decryption_error'] = str(e)
+        log['_source'] = source
+        return False
+
+    return True
+
+
+@metrics.timed('decrypt_records')
+def decrypt_records(logs: Iterable[Dict], decryptor: LogDecryptor, field: str = 'message',
+                    on_warning: Optional[Callable[[str], None]] = None,
+                    on_result: Optional[Callable[[LogRecord, bool], None]] = None
+                    ) -> Tuple[List[LogRecord], int]:
+    """
+    Decrypt a field in every log entry into compact LogRecords
+
+    A record holds less memory than the decrypted hit dict (see
+    src/record.py). When logs is a list, its hits are released as they are
+    converted and the list is left empty.
+
+    Args:
+        logs: Log entries in Elasticsearch hit format
+        decryptor: Decryptor to use
+        field: Field name containing encrypted data
+        on_warning: Called with a message for every missing field or failure
+        on_result: Called with each finished record and whether it succeeded
+
+    Returns:
+        Tuple of (records, number of failures)
+    """
+
+    release = isinstance(logs, list)
+    records = []
+    failed_count = 0
+    # Which fields are worth sharing is decided per batch
+    reset_shared_values()
+
+    for i, log in enumerate(logs):
+        if release:
+            logs[i] = None
+        record = LogRecord(log, field)
+
+        try:
+            encrypted_data = record.ciphertext
+            if encrypted_data:
+                record.plaintext = decryptor.decrypt(encrypted_data)
+            elif on_warning:
+                on_warning(f"Field '{field}' not found in log")
+        except Exception as e:
+            if on_warning:
+                on_warning(f"Failed to decrypt log: {e}")
+            record.error = str(e)
+            failed_count += 1
+
+        records.append(record)
+        if on_result:
+            on_result(record, record.ok)
+
+    if release:
+        logs.clear()
+
+    if metrics.enabled:
+        metrics.inc('records_decrypted', len(records) - failed_count)
+        metrics.inc('records_failed', failed_count)
+
+    return records, failed_count
+
+
+def output_format(output: str, format: str = 'json') -> str:
+    """
+    Format save_output() writes for an output path: 'json' when the format
+    is 'json' or the path ends in .json, otherwise 'text'
+    """
+
+    return 'json' if format == 'json' or Path(output).suffix == '.json' else 'text'
+
+
+def save_output(logs: List[Dict], output: str, format: str = 'json', field: str = 'message',
+                formatter: Optional[LogFormatter] = None, include_ciphertext: bool = True) -> Path:
+    """
+    Save decrypted logs (hits or LogRecords) to a file, as JSON or plain
+    text (see output_format()); include_ciphertext keeps encrypted_<field>
+    in JSON output of LogRecords
+
+    Returns:
+        Path the logs were written to
+    """
+
+    formatter = formatter or LogFormatter()
+    output_path = Path(output)
+
+    if output_format(output, format) == 'json':
+        formatter.save_json(logs, output_path, include_ciphertext=include_ciphertext)
+    else:
+        formatter.save_text(logs, output_path, field=field)
+
+    return output_path
+
+
+def append_output(logs: List[Dict], output: str, format: str = 'json', field: str = 'message',
+                  formatter: Optional[LogFormatter] = None, start: int = 1,
+                  include_ciphertext: bool = True) -> int:
+    """
+    Append decrypted logs to a file that keeps growing (e.g. in follow mode):
+    NDJSON where save_output() would write JSON, otherwise text numbered
+    from start
+
+    Returns:
+        Number of bytes appended
+    """
+
+    formatter = formatter or LogFormatter()
+    output_path = Path(output)
+    size_before = output_path.stat().st_size if output_path.exists() else 0
+
+    if output_format(output, format) == 'json':
+        formatter.append_ndjson(logs, output_path, include_ciphertext=include_ciphertext)
+    else:
+        formatter.save_text(logs, output_path, field=field, append=True, start=start)
+
+    return output_path.stat().st_size - size_before
@@ -0,0 +1,182 @@
+"""
+Count-first planning of Elasticsearch fetches
+
+A --size within one search's limit is fetched with a plain search straight
+away (which the hit cache can answer), without a _count request: that
+search tracks total hits instead, and KibanaClient.fetch_planned() fills
+in the plan's total from them. For larger sizes, the number of matching
+logs is looked up with _count first, so the fetch can be sized to what
+actually exists. Either way a --size that cuts the result short is
+reported instead of silently truncating. The count then decides how to
+fetch:
+
+  * search    - one plain search, for up to SEARCH_WINDOW logs
+  * pit       - point in time pages with search_after (newest first), for
+                more than a single search may return
+  * parallel  - time ranges sized by document density (a date_histogram)
+                to hold about SHARD_LOGS logs each, fetched concurrently by
+                several readers with KibanaClient.iter_time_shards(), for
+                large complete fetches
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import metrics
+
+# index.max_result_window default: the most one plain search can return
+SEARCH_WINDOW = 10_000
+
+# Complete fetches at least this big are split between parallel readers
+PARALLEL_MIN_LOGS = 50_000
+
+# Logs per time range of a parallel fetch; smaller ranges balance the
+# readers better and are cheaper to retry, larger ones need fewer requests
+SHARD_LOGS = 20_000
+
+# date_histogram resolution used to size the time ranges (at least this,
+# and several buckets per range)
+HISTOGRAM_BUCKETS = 200
+
+# (lower, upper, expected logs); bounds are epoch millis, None is open
+Partition = Tuple[Optional[int], Optional[int], int]
+
+
+class FetchPlan:
+    """How to fetch the logs of one query"""
+
+    def __init__(self, strategy: str, total: Optional[int], size: int,
+                 partitions: Optional[List[Partition]] = None,
+                 timestamp_field: str = '@timestamp', readers: int = 1):
+        """
+        Initialize plan
+
+        Args:
+            strategy: 'search', 'pit' or 'parallel'
+            total: Logs matching the query (None until known)
+            size: Logs to fetch (the newest ones; at most, if not counted)
+            partitions: Time ranges of a parallel fetch, oldest first
+            timestamp_field: Date field the partitions are on
+            readers: Time ranges fetched at the same time
+        """
+
+        self.strategy = strategy
+        self.total = total
+        self.size = size
+        self.partitions = partitions or []
+        self.timestamp_field = timestamp_field
+        self.readers = readers
+
+    @property
+    def truncated(self) -> bool:
+        """Whether more logs are known to match than are fetched"""
+
+        return self.total is not None and self.total > self.size
+
+    def __repr__(self) -> str:
+        return (f'<FetchPlan {self.strategy} {self.size} of '
+                f'{"?" if self.total is None else self.total}'
+                + (f' in {len(self.partitions)} ranges by {self.readers} readers>'
+                   if self.partitions else '>'))
+
+
+def range_query(query: Optional[Dict], lower: Optional[int], upper: Optional[int],
+                timestamp_field: str = '@timestamp') -> Dict:
+    """query restricted to [lower, upper) epoch millis (None leaves a side open)"""
+
+    bounds = {"format": "epoch_millis"}
+    if lower is not None:
+        bounds["gte"] = lower
+    if upper is not None:
+        bounds["lt"] = upper
+    return {"bool": {"filter": [
+        query or {"match_all": {}},
+        {"range": {timestamp_field: bounds}},
+    ]}}
+
+
+def balance_partitions(histogram: List[Tuple[int, int]], parts: int) -> List[Partition]:
+    """
+    Split a date histogram into time ranges holding about equal numbers of logs
+
+    Ranges are cut at bucket boundaries, so a single very dense bucket stays
+    in one range. The first and last ranges are open ended, so together they
+    cover logs outside the histogram too (e.g. indexed since).
+
+    Args:
+        histogram: Non-empty buckets as (start epoch millis, doc count), in
+                   time order
+        parts: Number of ranges wanted
+
+    Returns:
+        Partitions (lower, upper, expected logs), oldest first; fewer than
+        parts if there are not enough buckets
+    """
+
+    total = sum(count for _, count in histogram)
+    if parts <= 1 or len(histogram) < 2 or total == 0:
+        return [(None, None, total)]
+
+    partitions = []
+    lower = None
+    done = pending = 0
+
+    for start, count in histogram:
+        # Cut before a bucket that would mostly fall beyond this range's share
+        boundary = total * (len(partitions) + 1) / parts
+        if pending and len(partitions) < parts - 1 and done + pending + count / 2 > boundary:
+            partitions.append((lower, start, pending))
+            done += pending
+            lower, pending = start, 0
+        pending += count
+
+    partitions.append((lower, None, pending))
+    return partitions
+
+
+def plan_fetch(client, index: str, query: Optional[Dict], size: int, readers: int = 1,
+               timestamp_field: str = '@timestamp') -> FetchPlan:
+    """
+    Choose how to fetch the newest size logs of a query, counting them
+    first only when size is beyond a single search
+
+    Args:
+        client: KibanaClient
+        index: Index name or pattern
+        query: Elasticsearch query DSL
+        size: Most logs wanted
+        readers: Time ranges fetched at the same time in large complete fetches
+        timestamp_field: Date field logs are ordered by
+
+    Returns:
+        FetchPlan
+    """
+
+    if size <= SEARCH_WINDOW:
+        # One search either way, so counting would only add a request; the
+        # search itself reports the total
+        plan = FetchPlan('search', None, size)
+        if metrics.enabled:
+            metrics.inc('fetch_plan_search')
+        return plan
+
+    total = client.count(index, query=query)
+    fetch = min(size, total)
+
+    if fetch <= SEARCH_WINDOW:
+        plan = FetchPlan('search', total, fetch)
+    elif readers > 1 and fetch == total and total >= PARALLEL_MIN_LOGS:
+        shards = max(readers, -(-total // SHARD_LOGS))
+        histogram, _ = client.date_histogram(index, query=query,
+                                             buckets=max(HISTOGRAM_BUCKETS, 4 * shards),
+                                             field=timestamp_field)
+        partitions = balance_partitions(histogram, shards)
+        if len(partitions) > 1:
+            plan = FetchPlan('parallel', total, fetch, partitions, timestamp_field, readers)
+        else:
+            plan = FetchPlan('pit', total, fetch)
+    else:
+        plan = FetchPlan('pit', total, fetch)
+
+    if metrics.enabled:
+        metrics.inc(f'fetch_plan_{plan.strategy}')
+    return plan
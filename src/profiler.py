@@ -0,0 +1,172 @@
+"""
+Profiling support for the decryption pipeline
+
+Two modes are available:
+
+  * cprofile - deterministic cProfile run, saved as .pstats plus a text report
+  * sample   - low-overhead statistical sampling of the main thread
+
+Both modes also collect sampled stacks in the "folded" format understood by
+flamegraph.pl and speedscope, and the text report starts with the per-stage
+timings from src.metrics.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+from .metrics import metrics
+
+PROFILE_MODES = ['cprofile', 'sample']
+
+
+class StackSampler:
+    """Periodically sample the stack of one thread"""
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        """
+        Initialize sampler
+
+        Args:
+            thread_id: Thread to sample (default: the calling thread)
+            interval: Seconds between samples
+        """
+
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Collapsed stacks, one "frame;frame;frame count" line per stack"""
+
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+    def top_frames(self, limit: int = 30) -> List[tuple]:
+        """Leaf frames with the most samples (self time)"""
+
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+class PipelineProfiler:
+    """Profile a job and write reports next to its output"""
+
+    def __init__(self, mode: str = 'sample', interval: float = 0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unsupported profile mode: {mode}. "
+                             f"Supported: {', '.join(PROFILE_MODES)}")
+
+        self.mode = mode
+        self.sampler = StackSampler(interval=interval)
+        self.profile = cProfile.Profile() if mode == 'cprofile' else None
+        self._started = 0.0
+        self.elapsed = 0.0
+
+    def start(self):
+        # Per-stage timings come from the metrics registry
+        metrics.enabled = True
+        self._started = time.perf_counter()
+        self.sampler.start()
+        if self.profile is not None:
+            self.profile.enable()
+
+    def stop(self):
+        if self.profile is not None:
+            self.profile.disable()
+        self.sampler.stop()
+        self.elapsed = time.perf_counter() - self._started
+
+    def write_reports(self, base_path: Path) -> List[Path]:
+        """
+        Write profile reports
+
+        Args:
+            base_path: Output file the reports are written next to
+
+        Returns:
+            Paths of the written reports
+        """
+
+        base_path = Path(base_path)
+        base_path.parent.mkdir(parents=True, exist_ok=True)
+        written = []
+
+        report = io.StringIO()
+        report.write(f'Profile mode: {self.mode}\n')
+        report.write(f'Wall time: {self.elapsed:.3f}s, '
+                     f'{self.sampler.samples} stack samples\n\n')
+        report.write('Per-stage timings\n')
+        report.write(metrics.format_summary() + '\n\n')
+
+        if self.profile is not None:
+            pstats_path = base_path.with_name(base_path.name + '.pstats')
+            self.profile.dump_stats(str(pstats_path))
+            written.append(pstats_path)
+
+            report.write('Top functions by cumulative time\n')
+            stats = pstats.Stats(self.profile, stream=report)
+            stats.sort_stats('cumulative').print_stats(40)
+        else:
+            report.write('Top frames by self samples\n')
+            total = self.sampler.samples or 1
+            for frame, count in self.sampler.top_frames():
+                report.write(f'{count:>8} {count / total:>7.1%}  {frame}\n')
+
+        text_path = base_path.with_name(base_path.name + '.profile.txt')
+        text_path.write_text(report.getvalue(), encoding='utf-8')
+        written.append(text_path)
+
+        folded_path = base_path.with_name(base_path.name + '.folded')
+        folded_path.write_text(self.sampler.folded(), encoding='utf-8')
+        written.append(folded_path)
+
+        return written
+
+
+def _frame_label(frame) -> str:
+    """Readable, folded-format-safe label for a frame"""
+
+    code = frame.f_code
+    filename = code.co_filename
+    try:
+        filename = os.path.relpath(filename)
+    except ValueError:
+        pass
+    if filename.startswith('..'):
+        filename = os.path.basename(filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ',')
@@ -0,0 +1,148 @@
+"""
+Machine-readable NDJSON progress events
+"""
+
+import json
+import sys
+import time
+from typing import Callable, Dict, List, Optional, TextIO
+
+from .record import json_default
+
+
+class ProgressReporter:
+    """
+    Emit structured progress events, one JSON object per line
+
+    Event types:
+        start    - job started (source, and total when known)
+        progress - periodic counters: fetched, decrypted, failed,
+                   bytes_written, records_per_sec, elapsed
+        records  - a batch of finished records (when enabled)
+        done     - final counters
+        error    - job failed
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, interval: float = 1.0,
+                 emit_records: bool = False, record_batch_size: int = 100,
+                 on_event: Optional[Callable[[Dict], None]] = None):
+        """
+        Initialize reporter
+
+        Args:
+            stream: Where to write events (default: stdout)
+            interval: Minimum seconds between progress events
+            emit_records: Also emit finished records in batches
+            record_batch_size: Records per records event
+            on_event: Called with each event instead of writing it to stream
+                      (e.g. to forward it as a worker notification)
+        """
+
+        self.stream = stream
+        self.interval = interval
+        self.emit_records = emit_records
+        self.record_batch_size = record_batch_size
+        self.on_event = on_event
+
+        self.fetched = 0
+        self.decrypted = 0
+        self.failed = 0
+        self.bytes_written = 0
+
+        self._started = time.monotonic()
+        self._last_emit = 0.0
+        self._batch: List[Dict] = []
+        self._batch_offset = 0
+
+    def emit(self, event: str, **fields):
+        """Write one event line"""
+
+        if self.on_event is not None:
+            self.on_event({'event': event, 'ts': time.time(), **fields})
+            return
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps({'event': event, 'ts': time.time(), **fields}, default=json_default) + '\n')
+        stream.flush()
+
+    def counters(self) -> Dict:
+        """Current counters and throughput"""
+
+        elapsed = time.monotonic() - self._started
+        processed = self.decrypted + self.failed
+
+        return {
+            'fetched': self.fetched,
+            'decrypted': self.decrypted,
+            'failed': self.failed,
+            'bytes_written': self.bytes_written,
+            'records_per_sec': round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+            'elapsed': round(elapsed, 3),
+        }
+
+    def start(self, **fields):
+        """Emit the start event"""
+
+        self._started = time.monotonic()
+        self.emit('start', **fields)
+
+    def progress(self, force: bool = False):
+        """Emit a progress event if the interval has elapsed"""
+
+        now = time.monotonic()
+        if force or now - self._last_emit >= self.interval:
+            self._last_emit = now
+            self.emit('progress', **self.counters())
+
+    def add_fetched(self, count: int):
+        """Record fetched/read log entries"""
+
+        self.fetched += count
+        self.progress(force=True)
+
+    def add_record(self, log: Dict, ok: bool):
+        """Record one finished log entry"""
+
+        if ok:
+            self.decrypted += 1
+        else:
+            self.failed += 1
+
+        if self.emit_records:
+            self._batch.append(log)
+            if len(self._batch) >= self.record_batch_size:
+                self.flush_records()
+
+        self.progress()
+
+    def add_results(self, decrypted: int, failed: int):
+        """Record finished log entries in bulk (e.g. from a cached result)"""
+
+        self.decrypted += decrypted
+        self.failed += failed
+        self.progress()
+
+    def flush_records(self):
+        """Emit buffered records"""
+
+        if self._batch:
+            self.emit('records', offset=self._batch_offset, logs=self._batch)
+            self._batch_offset += len(self._batch)
+            self._batch = []
+
+    def add_bytes_written(self, count: int):
+        """Record bytes written to the output"""
+
+        self.bytes_written += count
+        self.progress()
+
+    def finish(self, **fields):
+        """Flush pending records and emit the done event"""
+
+        self.flush_records()
+        self.emit('done', **self.counters(), **fields)
+
+    def error(self, message: str):
+        """Emit an error event"""
+
+        self.flush_records()
+        self.emit('error', message=message, **self.counters())
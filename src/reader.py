@@ -0,0 +1,329 @@
+"""
+Read logs from local JSON/NDJSON files
+"""
+
+import hashlib
+import itertools
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .atomic import atomic_write
+from .compression import detect_compression, open_log_file
+from .metrics import metrics
+
+# Leading bytes whose digest tells a truncated and rewritten file apart
+HEAD_BYTES = 256
+
+
+def _wrap_line(line: str, i: int) -> dict:
+    """Wrap one NDJSON line (line number i) in Elasticsearch hit format"""
+    
+    try:
+        item = json.loads(line)
+        return {
+            '_id': str(i),
+            '_index': 'file-logs',
+            '_source': item if isinstance(item, dict) else {'message': str(item)}
+        }
+    except json.JSONDecodeError:
+        # Plain text line
+        return {
+            '_id': str(i),
+            '_index': 'file-logs',
+            '_source': {'message': line.strip()}
+        }
+
+
+def _head_lines(f, count: int = 2) -> List[str]:
+    """Read lines up to the count-th non-blank one, leading blank lines dropped"""
+    
+    lines = []
+    found = 0
+    while found < count:
+        line = f.readline()
+        if not line:
+            break
+        if line.strip():
+            found += 1
+        elif not found:
+            continue
+        lines.append(line)
+    return lines
+
+
+def _is_ndjson(head: List[str]) -> bool:
+    """Whether a file starting with these lines holds one JSON document per line"""
+    
+    # A single line is parsed as a (JSON) document
+    if sum(1 for line in head if line.strip()) < 2:
+        return False
+    try:
+        json.loads(head[0])
+    except json.JSONDecodeError:
+        return False
+    return True
+
+
+@metrics.timed('read_file')
+def read_logs_from_file(file_path: str, decompress_thread: bool = False) -> list:
+    """
+    Read logs from a JSON or NDJSON file, optionally gzip, bzip2 or zstd
+    compressed
+    
+    Args:
+        file_path: Path to the log file
+        decompress_thread: Decompress on a separate thread
+    
+    Returns:
+        List of log entries in Elasticsearch hit format
+    """
+    logs = []
+    
+    with open_log_file(file_path, threaded=decompress_thread) as f:
+        # NDJSON is parsed line by line while it is read (and decompressed);
+        # anything else is read whole and parsed as one document
+        with metrics.timer('read'):
+            head = _head_lines(f)
+        
+        if _is_ndjson(head):
+            with metrics.timer('ndjson_parse'):
+                lines = itertools.chain(head, f)
+                for i, line in enumerate(lines):
+                    if line.strip():
+                        logs.append(_wrap_line(line, i))
+            return logs
+        
+        with metrics.timer('read'):
+            content = (''.join(head) + f.read()).strip()
+        
+        if metrics.enabled:
+            metrics.inc('read_chars', len(content))
+        
+        # Try to parse as JSON array first
+        try:
+            with metrics.timer('json_parse'):
+                data = json.loads(content)
+            
+            # If it's already in Elasticsearch format with hits
+            if isinstance(data, dict) and 'hits' in data:
+                if 'hits' in data['hits']:
+                    return data['hits']['hits']
+                else:
+                    logs = data['hits']
+            # If it's a plain array of log objects
+            elif isinstance(data, list):
+                # Check if first item has Elasticsearch structure
+                if data and isinstance(data[0], dict) and '_source' in data[0]:
+                    # Already in Elasticsearch format
+                    return data
+                
+                # Convert plain logs to Elasticsearch format
+                for i, item in enumerate(data):
+                    logs.append({
+                        '_id': str(i),
+                        '_index': 'file-logs',
+                        '_source': item if isinstance(item, dict) else {'message': str(item)}
+                    })
+            # If it's a single object
+            else:
+                logs.append({
+                    '_id': '0',
+                    '_index': 'file-logs',
+                    '_source': data
+                })
+        
+        except json.JSONDecodeError:
+            # Try NDJSON (newline-delimited JSON)
+            with metrics.timer('ndjson_parse'):
+                for i, line in enumerate(content.split('\n')):
+                    if line.strip():
+                        logs.append(_wrap_line(line, i))
+    
+    return logs
+
+
+def iter_ndjson_batches(stream, block_size: int = 1 << 20) -> Iterator[list]:
+    """
+    Parse NDJSON from a binary stream (e.g. stdin) as it arrives
+    
+    Each read returns whatever input is available (up to block_size), so
+    complete lines are parsed without waiting for the rest of the stream.
+    
+    Args:
+        stream: Buffered binary stream
+        block_size: Maximum bytes read at a time
+    
+    Yields:
+        Lists of log entries in Elasticsearch hit format, one per read, with
+        _id the line number
+    """
+    
+    pending = b''
+    line_number = 0
+    
+    for block in iter(lambda: stream.read1(block_size), b''):
+        data = pending + block
+        end = data.rfind(b'\n') + 1
+        pending = data[end:]
+        
+        batch = []
+        for line in data[:end].decode('utf-8').split('\n')[:-1]:
+            if line.strip():
+                batch.append(_wrap_line(line, line_number))
+            line_number += 1
+        if batch:
+            yield batch
+    
+    # Last line without a newline
+    if pending.strip():
+        yield [_wrap_line(pending.decode('utf-8'), line_number)]
+
+
+def _read_lines_from(f, offset: int, line_number: int, block_size: int) -> Tuple[list, int, int]:
+    """Complete lines of an open file from offset, as (logs, offset after them, lines)"""
+    
+    f.seek(offset)
+    logs = []
+    pending = b''
+    
+    with metrics.timer('read'):
+        for block in iter(lambda: f.read(block_size), b''):
+            data = pending + block
+            end = data.rfind(b'\n') + 1
+            pending = data[end:]
+            
+            for line in data[:end].decode('utf-8').split('\n')[:-1]:
+                if line.strip():
+                    logs.append(_wrap_line(line, line_number))
+                line_number += 1
+            offset += end
+    
+    return logs, offset, line_number
+
+
+def _continues(f, stat, watermark: Dict) -> bool:
+    """Whether an open file is the one a watermark was taken of, grown or unchanged"""
+    
+    if (watermark.get('dev') != stat.st_dev or watermark.get('inode') != stat.st_ino
+            or watermark['offset'] > stat.st_size):
+        return False
+    # The bytes already read must be unchanged (not truncated and rewritten)
+    f.seek(0)
+    return hashlib.sha256(f.read(min(watermark['offset'], HEAD_BYTES))).hexdigest() == watermark.get('head')
+
+
+def _rotated_file(file_path: str, watermark: Dict) -> Optional[str]:
+    """The file a watermark was taken of, after rotation renamed it (e.g. app.log.1)"""
+    
+    path = Path(file_path)
+    try:
+        entries = list(os.scandir(path.parent))
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.name == path.name or not entry.name.startswith(path.name):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if stat.st_dev == watermark.get('dev') and stat.st_ino == watermark.get('inode'):
+            return entry.path
+    return None
+
+
+@metrics.timed('read_file')
+def read_new_logs(file_path: str, watermark: Optional[Dict] = None,
+                  block_size: int = 1 << 20,
+                  on_warning: Optional[Callable[[str], None]] = None) -> Tuple[list, Dict]:
+    """
+    Read the complete NDJSON lines appended to a file since a watermark
+    
+    The watermark records the file's device and inode, a digest of its
+    first bytes already read (up to HEAD_BYTES), the byte offset after the
+    last complete line read, and the number of lines read. If the file was
+    rotated (replaced by a new file), the rest of the old file is read
+    first, found next to it by its inode under a name starting with the
+    file's (e.g. app.log.1), and then the new file from the start. A file
+    truncated (shorter than the offset, or its first bytes changed because
+    it was truncated and written again) is read again from the start. A
+    trailing line without a newline is left for the next read.
+    
+    Args:
+        file_path: Path to the NDJSON log file
+        watermark: Watermark returned by the previous read (None reads all)
+        block_size: Bytes read at a time
+        on_warning: Called with a message when lines of a rotated file
+                    could not be read
+    
+    Returns:
+        Tuple of (new log entries in Elasticsearch hit format, with _id the
+        line number in their file; watermark to pass to the next read)
+    """
+    
+    if detect_compression(file_path):
+        raise ValueError(f"{file_path} is compressed; incremental reads need a plain NDJSON file")
+    
+    logs = []
+    read_bytes = 0
+    
+    with open(file_path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        offset, line_number = 0, 0
+        
+        if watermark and _continues(f, stat, watermark):
+            offset, line_number = watermark['offset'], watermark['lines']
+        elif watermark and (watermark.get('dev'), watermark.get('inode')) != (stat.st_dev, stat.st_ino):
+            # Rotated: finish the old file before starting the new one
+            rotated = _rotated_file(file_path, watermark)
+            if rotated is None or detect_compression(rotated):
+                if on_warning:
+                    on_warning(f"{file_path} was rotated and the old file was not found (or "
+                               f"is compressed); lines written to it since the last run "
+                               f"were skipped")
+            else:
+                with open(rotated, 'rb') as old:
+                    if _continues(old, os.fstat(old.fileno()), watermark):
+                        old_logs, old_offset, _ = _read_lines_from(
+                            old, watermark['offset'], watermark['lines'], block_size
+                        )
+                        logs.extend(old_logs)
+                        read_bytes += old_offset - watermark['offset']
+                    elif on_warning:
+                        on_warning(f"{rotated} (rotated from {file_path}) changed since the "
+                                   f"last run; its unread lines were skipped")
+        
+        start = offset
+        new_logs, offset, line_number = _read_lines_from(f, offset, line_number, block_size)
+        logs.extend(new_logs)
+        read_bytes += offset - start
+        
+        f.seek(0)
+        head = hashlib.sha256(f.read(min(offset, HEAD_BYTES))).hexdigest()
+    
+    if metrics.enabled:
+        metrics.inc('read_bytes', read_bytes)
+    
+    return logs, {'dev': stat.st_dev, 'inode': stat.st_ino, 'head': head,
+                  'offset': offset, 'lines': line_number}
+
+
+def load_watermarks(path) -> Dict:
+    """Watermarks by absolute file path from a watermark file (empty if missing)"""
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_watermarks(path, watermarks: Dict):
+    """Write a watermark file atomically"""
+    
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path) as f:
+        json.dump(watermarks, f, indent=2)
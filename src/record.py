@@ -0,0 +1,184 @@
+"""
+Compact representation of decrypted log records
+
+A decrypted Elasticsearch hit kept as a dict costs the hit dict, a
+_source dict grown by the encrypted_/decrypted_/_decrypted keys, and
+private copies of every key and value string (JSON parsing does not share
+them between documents). LogRecord keeps the hit's values in tuples next
+to a key tuple shared by all records with the same fields, plus the
+plaintext or error. String values of low-cardinality fields (level,
+service, host, _index, ...) are shared between records too. The familiar
+hit dict is only built when a record is serialised (to_hit(),
+json_default()) or read through get().
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+# Key tuples shared between records, by value
+_schemas: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+MAX_SCHEMAS = 10_000
+
+# Shared string values by field; a field with more than MAX_SHARED_VALUES
+# distinct values (ids, timestamps, messages) stops being shared (None)
+# until reset_shared_values()
+_values: Dict[str, Optional[Dict[str, str]]] = {}
+MAX_SHARED_VALUES = 256
+_UNSEEN = object()
+
+
+def _schema(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """The shared instance of a key tuple"""
+
+    shared = _schemas.get(keys)
+    if shared is None:
+        if len(_schemas) >= MAX_SCHEMAS:
+            return keys
+        shared = _schemas[keys] = keys
+    return shared
+
+
+def reset_shared_values():
+    """
+    Forget the shared values and the fields that stopped being shared
+
+    Called per batch of records, so one high-cardinality job does not turn
+    sharing off for every later job of a long-running process (--serve).
+    Records already built keep the values they share.
+    """
+
+    _values.clear()
+
+
+def _shared(key: str, value: Any) -> Any:
+    """The shared instance of a field's string value"""
+
+    if type(value) is not str:
+        return value
+    values = _values.get(key, _UNSEEN)
+    if values is None:
+        return value
+    if values is _UNSEEN:
+        if len(_values) >= MAX_SCHEMAS:
+            return value
+        values = _values[key] = {}
+    shared = values.get(value)
+    if shared is None:
+        if len(values) >= MAX_SHARED_VALUES:
+            _values[key] = None
+            return value
+        shared = values[value] = value
+    return shared
+
+
+class LogRecord:
+    """A log hit with the decryption result of one field"""
+
+    __slots__ = ('hit_keys', 'hit_values', 'keys', 'values', 'field', 'plaintext', 'error')
+
+    def __init__(self, hit: Dict, field: str = 'message'):
+        """
+        Initialize record
+
+        Args:
+            hit: Log entry in Elasticsearch hit format
+            field: Field name containing encrypted data
+        """
+
+        source = hit.get('_source')
+        if not isinstance(source, dict):
+            source = {}
+
+        # '_source' stays in hit_keys to keep the hit's key order
+        self.hit_keys = _schema(tuple(hit))
+        self.hit_values = tuple(_shared(key, value) for key, value in hit.items()
+                                if key != '_source')
+        self.keys = _schema(tuple(source))
+        self.values = tuple(_shared(key, value) for key, value in source.items())
+        self.field = field
+        self.plaintext: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ciphertext(self) -> Any:
+        """Value of the encrypted field (None if missing)"""
+
+        try:
+            return self.values[self.keys.index(self.field)]
+        except ValueError:
+            return None
+
+    @property
+    def ok(self) -> bool:
+        """Whether decryption did not fail"""
+
+        return self.error is None
+
+    def source(self, include_ciphertext: bool = True) -> Dict:
+        """
+        The _source dict with the decryption result: decrypted_<field>,
+        _decrypted and (optionally) encrypted_<field>, or _decryption_error
+        """
+
+        source = dict(zip(self.keys, self.values))
+        if self.plaintext is not None:
+            if include_ciphertext:
+                source[f'encrypted_{self.field}'] = source.get(self.field)
+            source[f'decrypted_{self.field}'] = self.plaintext
+            source['_decrypted'] = True
+        elif self.error is not None:
+            source['_decryption_error'] = self.error
+        return source
+
+    def to_hit(self, include_ciphertext: bool = True) -> Dict:
+        """The record as an Elasticsearch hit dict"""
+
+        values = iter(self.hit_values)
+        source = self.source(include_ciphertext)
+        hit = {key: source if key == '_source' else next(values) for key in self.hit_keys}
+        if '_source' not in hit and (self.plaintext is not None or self.error is not None):
+            hit['_source'] = source
+        return hit
+
+    def value(self, key: str, default: Any = None) -> Any:
+        """Read a _source field without building the _source dict"""
+
+        try:
+            return self.values[self.keys.index(key)]
+        except ValueError:
+            return default
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Read a hit field, so code written for hit dicts accepts records"""
+
+        if key == '_source':
+            return self.source()
+        try:
+            position = self.hit_keys.index(key)
+        except ValueError:
+            return default
+        # Values skip the '_source' slot
+        if '_source' in self.hit_keys[:position]:
+            position -= 1
+        return self.hit_values[position]
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+        # Share the key tuples and values again after unpickling
+        self.hit_keys = _schema(self.hit_keys)
+        self.keys = _schema(self.keys)
+        self.hit_values = tuple(_shared(key, value) for key, value in
+                                zip((key for key in self.hit_keys if key != '_source'),
+                                    self.hit_values))
+        self.values = tuple(_shared(key, value) for key, value in zip(self.keys, self.values))
+
+
+def json_default(obj, include_ciphertext: bool = True):
+    """json.dump(s) default hook: records as hit dicts, anything else as str"""
+
+    if isinstance(obj, LogRecord):
+        return obj.to_hit(include_ciphertext)
+    return str(obj)
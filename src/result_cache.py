@@ -0,0 +1,277 @@
+"""
+Content-addressed on-disk cache of decryption job outputs
+
+A job's output is fully determined by its input (file contents, or the
+Elasticsearch targets and query), the key, algorithm, field and output
+format. The cache stores the output file under a digest of those, so an
+identical job copies the stored output instead of fetching and decrypting
+again.
+
+Elasticsearch jobs are only cached when the query pins an absolute
+@timestamp range; without one (or with "now" date math) the result changes
+as new documents arrive.
+
+Cached outputs contain decrypted data: the cache directory is created
+owner-only and entries are written with mode 0600. The key itself is
+never stored, only a fingerprint of it.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from .atomic import atomic_write
+
+# Bump when the output of a job with the same inputs changes
+CACHE_VERSION = 1
+
+DEFAULT_MAX_SIZE = 1024 ** 3
+
+TIMESTAMP_FIELDS = ('@timestamp', 'timestamp')
+RELATIVE_TIME = re.compile(r'\bnow\b')
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2,
+              'G': 1024 ** 3, 'GB': 1024 ** 3}
+
+
+def parse_size(value) -> int:
+    """Parse a byte size such as 500MB, 2G or 1048576"""
+
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def key_fingerprint(key: str) -> str:
+    """Stable fingerprint of an encryption key"""
+
+    return hashlib.sha256(b'loggin_genie:key\0' + key.encode('utf-8')).hexdigest()
+
+
+def file_digest(path, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents"""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def time_bounds(query: Optional[Dict]) -> Optional[Tuple]:
+    """
+    Absolute @timestamp range a query is limited to
+
+    Returns:
+        (lower, upper) bounds, or None when the query is not limited on both
+        sides or uses relative ("now") date math
+    """
+
+    if not query or RELATIVE_TIME.search(json.dumps(query)):
+        return None
+
+    lower = upper = None
+    for bounds in _timestamp_ranges(query):
+        lower = lower or bounds.get('gte') or bounds.get('gt')
+        upper = upper or bounds.get('lte') or bounds.get('lt')
+
+    if lower is None or upper is None:
+        return None
+    return lower, upper
+
+
+def _timestamp_ranges(query: Dict) -> Iterable[Dict]:
+    """@timestamp range clauses that restrict every hit (top level or bool must/filter)"""
+
+    for field, bounds in query.get('range', {}).items():
+        if field in TIMESTAMP_FIELDS and isinstance(bounds, dict):
+            yield bounds
+
+    for clause in ('must', 'filter'):
+        nested = query.get('bool', {}).get(clause) or []
+        for sub in nested if isinstance(nested, list) else [nested]:
+            yield from _timestamp_ranges(sub)
+
+
+def job_cache_key(key: str, algorithm: str, field: str, output_format: str,
+                  file: Optional[str] = None, urls: Iterable[str] = (),
+                  indices: Iterable[str] = (), query: Optional[Dict] = None,
+                  size: Optional[int] = None,
+                  include_ciphertext: bool = True, username: Optional[str] = None,
+                  password: Optional[str] = None, api_key: Optional[str] = None,
+                  verify_certs: bool = False) -> Optional[str]:
+    """
+    Cache key of a job
+
+    Args:
+        key: Encryption key
+        algorithm: Encryption algorithm
+        field: Encrypted field
+        output_format: Format of the written output ('json' or 'text')
+        file: Input file (file jobs)
+        urls: Elasticsearch URLs (Elasticsearch jobs)
+        indices: Index names or patterns (Elasticsearch jobs)
+        query: Elasticsearch query DSL (Elasticsearch jobs)
+        size: Number of logs fetched (Elasticsearch jobs)
+        include_ciphertext: Whether JSON output keeps encrypted_<field>
+        username: Basic auth username (Elasticsearch jobs)
+        password: Basic auth password (Elasticsearch jobs)
+        api_key: API key (Elasticsearch jobs)
+        verify_certs: Whether SSL certificates are verified (Elasticsearch
+                      jobs)
+
+    Returns:
+        Hex digest, or None when the job's result is not cacheable
+    """
+
+    parts = {
+        'version': CACHE_VERSION,
+        'key': key_fingerprint(key),
+        'algorithm': algorithm,
+        'field': field,
+        'format': output_format,
+    }
+    if not include_ciphertext:
+        # Only added when off, so existing cache entries stay valid
+        parts['ciphertext'] = False
+
+    if file:
+        parts['file'] = file_digest(file)
+    else:
+        if time_bounds(query) is None:
+            return None
+        from .connection_pool import ClientRegistry
+
+        parts.update(
+            # Scoped by credentials like the hit cache: users with narrower
+            # document permissions must not get each other's output
+            urls=sorted(ClientRegistry.make_key(url, username, password, api_key, verify_certs)
+                        for url in urls),
+            indices=sorted(indices),
+            query=query,
+            size=size,
+        )
+
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU cache of job output files"""
+
+    def __init__(self, directory, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Initialize cache
+
+        Args:
+            directory: Cache directory (created owner-only if missing)
+            max_size: Total bytes of cached outputs to keep
+        """
+
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _paths(self, cache_key: str) -> Tuple[Path, Path]:
+        base = self.directory / cache_key[:2] / cache_key
+        return base.with_suffix('.out'), base.with_suffix('.json')
+
+    def restore(self, cache_key: str, destination) -> Optional[Dict]:
+        """
+        Copy a cached output to destination
+
+        Returns:
+            Metadata stored with the output, or None on a miss
+        """
+
+        data_path, meta_path = self._paths(cache_key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+
+            destination = Path(destination)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(data_path, destination)
+
+            # Mark as recently used
+            os.utime(data_path)
+        except (OSError, ValueError):
+            return None
+
+        return meta
+
+    def put(self, cache_key: str, source, meta: Dict) -> bool:
+        """
+        Store a job output
+
+        Args:
+            cache_key: Key from job_cache_key()
+            source: Output file to store
+            meta: JSON-serialisable job summary stored alongside
+
+        Returns:
+            True if stored (outputs larger than the cache are not)
+        """
+
+        source = Path(source)
+        if source.stat().st_size > self.max_size:
+            return False
+
+        data_path, meta_path = self._paths(cache_key)
+        data_path.parent.mkdir(mode=0o700, exist_ok=True)
+
+        # Concurrent jobs never read a partial entry; the data is in place
+        # before the meta file that makes the entry visible
+        with atomic_write(meta_path, permissions=0o600) as meta_file:
+            with atomic_write(data_path, 'wb', permissions=0o600) as data_file, \
+                    open(source, 'rb') as f:
+                shutil.copyfileobj(f, data_file)
+            json.dump(meta, meta_file)
+
+        self.evict()
+        return True
+
+    def _entries(self):
+        """(last used, size, data path, meta path) of every entry"""
+
+        entries = []
+        for data_path in self.directory.glob('*/*.out'):
+            try:
+                stat = data_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, data_path, data_path.with_suffix('.json')))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_size"""
+
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _, _ in entries)
+
+            for _, size, data_path, meta_path in entries:
+                if total <= self.max_size:
+                    break
+                for path in (meta_path, data_path):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+    def stats(self) -> Dict:
+        """Number of entries and bytes used"""
+
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _, _ in entries),
+            'max_size': self.max_size,
+        }
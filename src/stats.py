@@ -0,0 +1,335 @@
+"""
+Single-pass summary statistics of decrypted logs
+
+LogSummary sees every decrypted log once, as it is produced, and keeps
+only bounded state:
+
+  * exact counts by level, service and host, and by time bucket, service
+    and level (each capped at MAX_GROUPS distinct keys; the rest are
+    counted under OTHER)
+  * approximate top-K decrypted messages (SpaceSaving heavy hitters)
+  * approximate distinct counts of messages, services and hosts
+    (HyperLogLog)
+
+Summaries are mergeable, so parallel workers can each summarise their part.
+The result is written as a small JSON document next to the output
+(<output>.summary.json).
+"""
+
+import hashlib
+import heapq
+import json
+import math
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .atomic import atomic_write
+from .record import LogRecord
+from .table import parse_interval
+
+# Distinct keys kept per counter
+MAX_GROUPS = 10_000
+OTHER = '(other)'
+
+# Messages are tracked by their first characters only
+MAX_MESSAGE_LENGTH = 500
+
+UNIT_SECONDS = {'millisecond': 0.001, 'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def summary_path(output) -> Path:
+    """Summary file written next to output"""
+
+    return Path(f'{output}.summary.json')
+
+
+def _hash64(value: str) -> int:
+    """Stable 64-bit hash (the built-in hash() is salted per process)"""
+
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8', 'replace'),
+                                          digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Approximate distinct count in 2**precision bytes (~1.04/sqrt(2**precision) error)"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str):
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class SpaceSaving:
+    """
+    Approximate most frequent items, tracking at most capacity of them
+
+    Every reported count overestimates the true count by at most its error.
+    """
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        # item -> [count, error]
+        self.counters: Dict[str, List[int]] = {}
+        # One (count, item) entry per tracked item; counts only grow, so a
+        # stale entry is re-pushed with its current count when it surfaces
+        self._heap: List[Tuple[int, str]] = []
+
+    def add(self, item: str, count: int = 1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+            return
+
+        if len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+            heapq.heappush(self._heap, (count, item))
+            return
+
+        # Replace the least frequent item, inheriting its count as error
+        while True:
+            stored, victim = heapq.heappop(self._heap)
+            current = self.counters[victim][0]
+            if stored == current:
+                break
+            heapq.heappush(self._heap, (current, victim))
+        del self.counters[victim]
+        self.counters[item] = [current + count, current]
+        heapq.heappush(self._heap, (current + count, item))
+
+    def merge(self, other: 'SpaceSaving'):
+        for item, (count, error) in other.counters.items():
+            counter = self.counters.setdefault(item, [0, 0])
+            counter[0] += count
+            counter[1] += error
+        if len(self.counters) > self.capacity:
+            ranked = sorted(self.counters.items(), key=lambda entry: -entry[1][0])
+            self.counters = dict(ranked[:self.capacity])
+        self._heap = [(count, item) for item, (count, _) in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        """The k most frequent items as (item, count, error), most frequent first"""
+
+        ranked = sorted(self.counters.items(), key=lambda entry: (-entry[1][0], entry[0]))
+        return [(item, count, error) for item, (count, error) in ranked[:k]]
+
+
+def _count(counter: Dict, key, count: int = 1):
+    if key in counter or len(counter) < MAX_GROUPS:
+        counter[key] = counter.get(key, 0) + count
+    else:
+        overflow = OTHER if not isinstance(key, tuple) else key[:-1] + (OTHER,)
+        counter[overflow] = counter.get(overflow, 0) + count
+
+
+def _timestamp(value) -> Optional[float]:
+    """Timestamp value (ISO 8601 string or epoch millis) as epoch seconds"""
+
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000.0
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+def _isoformat(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+class LogSummary:
+    """Streaming summary of decrypted logs"""
+
+    def __init__(self, field: str = 'message', interval: str = '1h', top_k: int = 10,
+                 precision: int = 12):
+        """
+        Initialize summary
+
+        Args:
+            field: Field name containing encrypted data
+            interval: Width of the time buckets, e.g. '15m', '1h', '1d'
+            top_k: Number of most frequent decrypted messages reported
+            precision: HyperLogLog precision (2**precision bytes per
+                       distinct count)
+        """
+
+        multiple, unit = parse_interval(interval)
+        self.field = field
+        self.interval = interval
+        self.top_k = top_k
+        self.precision = precision
+        self._width = multiple * UNIT_SECONDS[unit]
+
+        self.total = 0
+        self.decrypted = 0
+        self.failed = 0
+        self.first_timestamp: Optional[float] = None
+        self.last_timestamp: Optional[float] = None
+        self.levels: Dict = {}
+        self.services: Dict = {}
+        self.hosts: Dict = {}
+        # (bucket start, service, level) -> count
+        self.timeline: Dict = {}
+        # Tracking many more items than top_k keeps the top_k accurate
+        # (at most MAX_MESSAGE_LENGTH characters each)
+        self.messages = SpaceSaving(capacity=max(100 * top_k, 1000))
+        self.distinct = {name: HyperLogLog(precision)
+                         for name in ('messages', 'services', 'hosts')}
+
+    @property
+    def options(self) -> Dict:
+        """Arguments creating an empty summary with the same settings"""
+
+        return {'field': self.field, 'interval': self.interval, 'top_k': self.top_k,
+                'precision': self.precision}
+
+    def add(self, log, ok: bool = True):
+        """
+        Count one decrypted log (usable as an on_result callback)
+
+        Args:
+            log: Decrypted log, as a hit or LogRecord
+            ok: Whether decryption did not fail
+        """
+
+        if isinstance(log, LogRecord):
+            get = log.value
+            message = log.plaintext
+        else:
+            source = log.get('_source') or {}
+            get = source.get
+            message = source.get(f'decrypted_{self.field}')
+
+        self.total += 1
+        if ok:
+            self.decrypted += 1
+        else:
+            self.failed += 1
+
+        level = get('level')
+        service = get('service')
+        host = get('host')
+        level = None if level is None else str(level)
+        service = None if service is None else str(service)
+        host = None if host is None else str(host)
+
+        _count(self.levels, level)
+        _count(self.services, service)
+        _count(self.hosts, host)
+        if service is not None:
+            self.distinct['services'].add(service)
+        if host is not None:
+            self.distinct['hosts'].add(host)
+
+        timestamp = get('@timestamp')
+        seconds = _timestamp(timestamp if timestamp is not None else get('timestamp'))
+        if seconds is not None:
+            if self.first_timestamp is None or seconds < self.first_timestamp:
+                self.first_timestamp = seconds
+            if self.last_timestamp is None or seconds > self.last_timestamp:
+                self.last_timestamp = seconds
+            bucket = seconds - seconds % self._width
+            _count(self.timeline, (bucket, service, level))
+
+        if message is not None:
+            if not isinstance(message, str):
+                message = json.dumps(message, sort_keys=True, default=str)
+            message = message[:MAX_MESSAGE_LENGTH]
+            self.messages.add(message)
+            self.distinct['messages'].add(message)
+
+    def merge(self, other: 'LogSummary'):
+        """Add another summary (with the same settings) to this one"""
+
+        if other.options != self.options:
+            raise ValueError("Cannot merge summaries with different settings")
+
+        self.total += other.total
+        self.decrypted += other.decrypted
+        self.failed += other.failed
+        for bound, pick in (('first_timestamp', min), ('last_timestamp', max)):
+            values = [v for v in (getattr(self, bound), getattr(other, bound)) if v is not None]
+            setattr(self, bound, pick(values) if values else None)
+        for name in ('levels', 'services', 'hosts', 'timeline'):
+            counter = getattr(self, name)
+            for key, count in getattr(other, name).items():
+                _count(counter, key, count)
+        self.messages.merge(other.messages)
+        for name, sketch in other.distinct.items():
+            self.distinct[name].merge(sketch)
+
+    def to_dict(self) -> Dict:
+        """Summary as a JSON-serialisable dict"""
+
+        def ranked(counter):
+            return {('(none)' if key is None else key): count
+                    for key, count in sorted(counter.items(),
+                                             key=lambda entry: (-entry[1], str(entry[0])))}
+
+        timeline = [
+            {'bucket': _isoformat(bucket), 'service': service, 'level': level, 'count': count}
+            for (bucket, service, level), count in sorted(
+                self.timeline.items(),
+                key=lambda entry: (entry[0][0], str(entry[0][1]), str(entry[0][2])))
+        ]
+
+        return {
+            'generated_at': _isoformat(datetime.now(timezone.utc).timestamp()),
+            'field': self.field,
+            'total': self.total,
+            'decrypted': self.decrypted,
+            'failed': self.failed,
+            'first_timestamp': (None if self.first_timestamp is None
+                                else _isoformat(self.first_timestamp)),
+            'last_timestamp': (None if self.last_timestamp is None
+                               else _isoformat(self.last_timestamp)),
+            'levels': ranked(self.levels),
+            'services': ranked(self.services),
+            'hosts': ranked(self.hosts),
+            'interval': self.interval,
+            'timeline': timeline,
+            # count is an upper bound, at most error above the true count
+            'top_messages': [{'message': message, 'count': count, 'error': error}
+                             for message, count, error in self.messages.top(self.top_k)],
+            # HyperLogLog estimates
+            'distinct': {name: sketch.count() for name, sketch in self.distinct.items()},
+        }
+
+    def save(self, path) -> Path:
+        """Write the summary JSON atomically"""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(path) as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
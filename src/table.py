@@ -0,0 +1,386 @@
+"""
+Columnar in-memory table of decrypted logs for analysis
+
+ResultTable holds decrypted logs as an Apache Arrow table with one column
+per field of interest instead of a list of hit dicts, so filters (level,
+service, host, time range, substring in the decrypted text) and group-by
+counts run as vectorised Arrow compute kernels. Needs the optional pyarrow
+package.
+
+    from src.table import ResultTable
+
+    table = ResultTable.from_file('decrypted.json')
+    errors = table.filter(level='ERROR', start='2026-02-01T00:00:00Z', contains='timeout')
+    print(errors.count_by('service', interval='1h'))
+"""
+
+import importlib.util
+import json
+import re
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from .metrics import metrics
+from .record import LogRecord
+
+# Rows converted from Python objects at a time
+BATCH_SIZE = 65_536
+
+# Low-cardinality columns, dictionary encoded
+CATEGORY_COLUMNS = ('level', 'service', 'host')
+
+INTERVAL_UNITS = {
+    'ms': 'millisecond',
+    's': 'second',
+    'm': 'minute',
+    'h': 'hour',
+    'd': 'day',
+}
+
+_INTERVAL_RE = re.compile(r'^\s*(\d+)\s*(ms|s|m|h|d)\s*$')
+
+Timestamp = Union[datetime, str, int, float]
+
+
+def pyarrow_available() -> bool:
+    """Whether pyarrow can be imported"""
+
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _require_pyarrow():
+    if not pyarrow_available():
+        raise RuntimeError("ResultTable needs the pyarrow package "
+                           "(pip install 'loggin-genie[arrow]')")
+
+
+def parse_interval(interval: str):
+    """
+    Parse a bucket width such as '30s', '15m', '1h' or '1d'
+
+    Returns:
+        Tuple of (multiple, Arrow temporal unit)
+    """
+
+    match = _INTERVAL_RE.match(interval)
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Invalid interval '{interval}', expected e.g. 30s, 15m, 1h or 1d")
+    return int(match.group(1)), INTERVAL_UNITS[match.group(2)]
+
+
+def _epoch_millis(value) -> Optional[int]:
+    """Timestamp value (ISO 8601 string or epoch millis) as epoch millis"""
+
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        return _epoch_millis(parsed)
+    return None
+
+
+def _text(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+class _Columns:
+    """Python lists for one batch of rows"""
+
+    def __init__(self, extra_fields: Sequence[str]):
+        self.timestamp: List = []
+        self.level: List = []
+        self.service: List = []
+        self.host: List = []
+        self.index: List = []
+        self.id: List = []
+        self.message: List = []
+        self.error: List = []
+        self.extra = {name: [] for name in extra_fields}
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+
+class ResultTable:
+    """Decrypted logs as an Arrow table"""
+
+    def __init__(self, table):
+        """
+        Initialize from an Arrow table with ResultTable's columns (see
+        from_logs())
+
+        Args:
+            table: pyarrow.Table
+        """
+
+        self.table = table
+
+    @classmethod
+    def from_logs(cls, logs: Iterable, field: str = 'message',
+                  extra_fields: Sequence[str] = (), batch_size: int = BATCH_SIZE) -> 'ResultTable':
+        """
+        Build a table from decrypted logs
+
+        Columns: timestamp (UTC, millisecond precision), level, service,
+        host, index, id, message (the decrypted text, null if it could not
+        be decrypted), error (the decryption error) and one string column
+        per extra field.
+
+        Args:
+            logs: Decrypted logs, as hits or LogRecords (consumed in batches,
+                  so a generator is never held in memory as Python objects)
+            field: Field name containing encrypted data
+            extra_fields: Further _source fields to keep as string columns
+            batch_size: Rows converted from Python objects at a time
+
+        Returns:
+            ResultTable
+        """
+
+        _require_pyarrow()
+        import pyarrow as pa
+
+        batches = []
+        columns = _Columns(extra_fields)
+        decrypted_key = f'decrypted_{field}'
+        wanted = ('@timestamp', 'timestamp', 'level', 'service', 'host') + tuple(extra_fields)
+        # Positions of the wanted keys per LogRecord key tuple
+        positions: Dict[tuple, tuple] = {}
+
+        for log in logs:
+            if isinstance(log, LogRecord):
+                index = positions.get(log.keys)
+                if index is None:
+                    index = positions[log.keys] = tuple(
+                        log.keys.index(key) if key in log.keys else -1 for key in wanted
+                    )
+                values = [log.values[i] if i >= 0 else None for i in index]
+                message, error = log.plaintext, log.error
+            else:
+                source = log.get('_source') or {}
+                values = [source.get(key) for key in wanted]
+                message = source.get(decrypted_key)
+                error = source.get('_decryption_error')
+
+            timestamp = values[0] if values[0] is not None else values[1]
+            columns.timestamp.append(timestamp)
+            columns.level.append(_text(values[2]))
+            columns.service.append(_text(values[3]))
+            columns.host.append(_text(values[4]))
+            columns.index.append(log.get('_index'))
+            columns.id.append(log.get('_id'))
+            columns.message.append(_text(message))
+            columns.error.append(error)
+            for name, value in zip(extra_fields, values[5:]):
+                columns.extra[name].append(_text(value))
+
+            if len(columns) >= batch_size:
+                batches.append(cls._batch(columns))
+                columns = _Columns(extra_fields)
+
+        if len(columns) or not batches:
+            batches.append(cls._batch(columns))
+
+        table = pa.Table.from_batches(batches)
+        # Group-by needs one dictionary per column across all batches
+        table = table.unify_dictionaries()
+
+        if metrics.enabled:
+            metrics.inc('table_rows', table.num_rows)
+        return cls(table)
+
+    @classmethod
+    def from_file(cls, file_path: str, field: str = 'message',
+                  extra_fields: Sequence[str] = ()) -> 'ResultTable':
+        """
+        Build a table from a decrypted JSON or NDJSON output file
+
+        Args:
+            file_path: Output written by --output (plain or compressed)
+            field: Field name containing encrypted data
+            extra_fields: Further _source fields to keep as string columns
+        """
+
+        _require_pyarrow()
+        from .reader import read_logs_from_file
+
+        return cls.from_logs(read_logs_from_file(file_path), field=field, extra_fields=extra_fields)
+
+    @staticmethod
+    def _batch(columns: _Columns):
+        """Convert one batch of Python lists to an Arrow record batch"""
+
+        import pyarrow as pa
+
+        arrays = {
+            'timestamp': ResultTable._timestamps(columns.timestamp),
+            'level': pa.array(columns.level, pa.string()).dictionary_encode(),
+            'service': pa.array(columns.service, pa.string()).dictionary_encode(),
+            'host': pa.array(columns.host, pa.string()).dictionary_encode(),
+            'index': pa.array(columns.index, pa.string()),
+            'id': pa.array(columns.id, pa.string()),
+            'message': pa.array(columns.message, pa.string()),
+            'error': pa.array(columns.error, pa.string()),
+        }
+        for name, values in columns.extra.items():
+            arrays[name] = pa.array(values, pa.string())
+        return pa.record_batch(arrays)
+
+    @staticmethod
+    def _timestamps(values: List):
+        """Timestamp values as a UTC millisecond timestamp array"""
+
+        import pyarrow as pa
+
+        utc_millis = pa.timestamp('ms', tz='UTC')
+        if all(value is None or isinstance(value, str) for value in values):
+            # Arrow parses ISO 8601 with a zone offset natively
+            try:
+                parsed = pa.array(values, pa.string()).cast(pa.timestamp('us', tz='UTC'))
+                return parsed.cast(utc_millis, safe=False)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                pass
+        return pa.array([_epoch_millis(value) for value in values], utc_millis)
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def __repr__(self) -> str:
+        return f'<ResultTable {self.table.num_rows} rows>'
+
+    @property
+    def columns(self) -> List[str]:
+        """Column names"""
+
+        return self.table.column_names
+
+    def _timestamp_scalar(self, value: Timestamp):
+        import pyarrow as pa
+
+        millis = _epoch_millis(value)
+        if millis is None:
+            raise ValueError(f"Invalid timestamp {value!r}")
+        return pa.scalar(millis, pa.timestamp('ms', tz='UTC'))
+
+    @metrics.timed('table_filter')
+    def filter(self, level: Union[str, Sequence[str], None] = None,
+               service: Union[str, Sequence[str], None] = None,
+               host: Union[str, Sequence[str], None] = None,
+               start: Optional[Timestamp] = None, end: Optional[Timestamp] = None,
+               contains: Optional[str] = None, ignore_case: bool = False,
+               failed: Optional[bool] = None) -> 'ResultTable':
+        """
+        Rows matching every given condition
+
+        Args:
+            level: Level, or any of several levels
+            service: Service, or any of several services
+            host: Host, or any of several hosts
+            start: Earliest timestamp (inclusive): datetime (naive means
+                   UTC), ISO 8601 string or epoch millis
+            end: Latest timestamp (exclusive)
+            contains: Substring of the decrypted text
+            ignore_case: Match contains case-insensitively
+            failed: Only rows that failed (True) or did not fail (False) to
+                    decrypt
+
+        Returns:
+            New ResultTable
+        """
+
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        table = self.table
+        conditions = []
+
+        for name, wanted in (('level', level), ('service', service), ('host', host)):
+            if wanted is None:
+                continue
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            conditions.append(pc.is_in(table[name], value_set=pa.array(list(wanted), pa.string())))
+
+        if start is not None:
+            conditions.append(pc.greater_equal(table['timestamp'], self._timestamp_scalar(start)))
+        if end is not None:
+            conditions.append(pc.less(table['timestamp'], self._timestamp_scalar(end)))
+
+        if contains is not None:
+            conditions.append(pc.match_substring(table['message'], contains,
+                                                 ignore_case=ignore_case))
+
+        if failed is not None:
+            has_error = pc.is_valid(table['error'])
+            conditions.append(has_error if failed else pc.invert(has_error))
+
+        if not conditions:
+            return ResultTable(table)
+
+        mask = conditions[0]
+        for condition in conditions[1:]:
+            mask = pc.and_kleene(mask, condition)
+        # Rows where a condition is null (e.g. no timestamp) are dropped
+        return ResultTable(table.filter(mask))
+
+    @metrics.timed('table_count_by')
+    def count_by(self, *columns: str, interval: Optional[str] = None):
+        """
+        Number of rows per group, largest first
+
+        Args:
+            columns: Columns to group by, e.g. 'service', 'level'
+            interval: Also group by time bucket of this width ('30s', '15m',
+                      '1h', '1d'); the bucket start is the first column,
+                      'bucket'
+
+        Returns:
+            pyarrow.Table with the group columns and 'count'
+        """
+
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        table = self.table
+        keys = list(columns)
+        for name in keys:
+            if name not in table.column_names:
+                raise ValueError(f"Unknown column '{name}'")
+
+        if interval:
+            multiple, unit = parse_interval(interval)
+            table = table.append_column(
+                'bucket', pc.floor_temporal(table['timestamp'], multiple=multiple, unit=unit)
+            )
+            keys.insert(0, 'bucket')
+
+        if not keys:
+            raise ValueError("count_by() needs at least one column or an interval")
+
+        grouped = table.select(keys).group_by(keys).aggregate([([], 'count_all')])
+        # Plain strings in the (small) result: dictionary columns cannot be sorted
+        counts = pa.table({
+            key: (grouped[key].cast(pa.string())
+                  if pa.types.is_dictionary(grouped[key].type) else grouped[key])
+            for key in keys
+        })
+        counts = counts.append_column('count', grouped['count_all'])
+        return counts.sort_by([('count', 'descending')] + [(key, 'ascending') for key in keys])
+
+    def to_pylist(self) -> List[Dict]:
+        """Rows as dicts"""
+
+        return self.table.to_pylist()
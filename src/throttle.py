@@ -0,0 +1,220 @@
+"""
+Adaptive page size and concurrency of Elasticsearch fetches
+
+A fixed page size is too small for good throughput on a quiet cluster and
+too big (timeouts, heap pressure) on a busy one. FetchController tunes the
+page size and the number of requests in flight from every response, AIMD
+style (additive increase, multiplicative decrease):
+
+  * a fast response (within target_latency and max_page_bytes) grows the
+    page by page_step, and every GROW_AFTER fast responses in a row allow
+    one more request in flight
+  * a slow or too large response shrinks the page, in proportion to how
+    far over the target it was (at most halving it)
+  * a 429, 503 or timeout halves both, pauses every request (Retry-After,
+    or exponential backoff) and sends the request again
+
+The page size never exceeds max_page_size and the requests in flight never
+exceed max_concurrency, however fast the cluster answers: hard ceilings
+that keep an export from overloading a production cluster.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from elasticsearch import ApiError, ConnectionTimeout
+
+from .metrics import metrics
+
+# Slowest response that still lets the page grow, in seconds
+TARGET_LATENCY = 1.0
+
+# Largest response body that still lets the page grow
+MAX_PAGE_BYTES = 32 * 1024 * 1024
+
+# Responses meaning the cluster is overloaded
+OVERLOAD_STATUSES = (429, 503)
+
+# Fast responses in a row before one more request may be in flight
+GROW_AFTER = 5
+
+# Longest pause after an overload response, in seconds
+MAX_BACKOFF = 30.0
+
+
+def _payload_bytes(response) -> Optional[int]:
+    """Response body size from its Content-Length (None if unknown)"""
+
+    meta = getattr(response, 'meta', None)
+    headers = getattr(meta, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return int(headers.get('content-length'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds a response's Retry-After header asks to wait (None if absent)"""
+
+    headers = getattr(getattr(error, 'meta', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        return max(float(headers.get('retry-after')), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_overload(error: Exception) -> bool:
+    """Whether a failed request means the cluster is overloaded"""
+
+    if isinstance(error, ConnectionTimeout):
+        return True
+    return isinstance(error, ApiError) and error.meta.status in OVERLOAD_STATUSES
+
+
+class FetchController:
+    """Page size and requests in flight of the fetches sharing it (thread-safe)"""
+
+    def __init__(self, page_size: int = 1000, min_page_size: int = 100,
+                 max_page_size: int = 5000, concurrency: int = 1, max_concurrency: int = 4,
+                 target_latency: float = TARGET_LATENCY, max_page_bytes: int = MAX_PAGE_BYTES,
+                 page_step: Optional[int] = None, max_retries: int = 5):
+        """
+        Initialize controller
+
+        Args:
+            page_size: Documents per request to start with
+            min_page_size: Smallest page size it shrinks to
+            max_page_size: Hard ceiling of the page size
+            concurrency: Requests in flight to start with
+            max_concurrency: Hard ceiling of the requests in flight
+            target_latency: Slowest response in seconds that still lets the
+                            page grow
+            max_page_bytes: Largest response body that still lets the page
+                            grow
+            page_step: Documents added to the page per fast response
+                       (default: max_page_size / 20)
+            max_retries: Retries of a request answered with an overload
+                         response before its error is raised
+        """
+
+        if not 1 <= min_page_size <= max_page_size:
+            raise ValueError("Page sizes must satisfy 1 <= min_page_size <= max_page_size")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.max_page_bytes = max_page_bytes
+        self.page_step = page_step or max(max_page_size // 20, 1)
+        self.max_retries = max_retries
+
+        self._page_size = min(max(page_size, min_page_size), max_page_size)
+        self._concurrency = min(max(concurrency, 1), max_concurrency)
+        self._in_flight = 0
+        self._fast = 0
+        # No request is sent before this time.monotonic() (after an overload)
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def page_size(self) -> int:
+        """Documents per request"""
+
+        return self._page_size
+
+    @property
+    def concurrency(self) -> int:
+        """Requests allowed in flight"""
+
+        return self._concurrency
+
+    def __repr__(self) -> str:
+        return f'<FetchController page {self._page_size}, {self._concurrency} in flight>'
+
+    def call(self, request: Callable[[int], Any]) -> Any:
+        """
+        Send a request once a slot is free, with the current page size
+
+        Args:
+            request: Sends the request for a page size and returns the
+                     response (may be called again after an overload)
+
+        Returns:
+            The response
+
+        Raises:
+            The request's error, if it is not an overload or max_retries
+            retries were overloaded too
+        """
+
+        for attempt in range(self.max_retries + 1):
+            page_size = self._acquire()
+            start = time.monotonic()
+            try:
+                response = request(page_size)
+            except Exception as e:
+                self._release()
+                if attempt == self.max_retries or not is_overload(e):
+                    raise
+                delay = _retry_after(e)
+                self._overloaded(min(MAX_BACKOFF, delay if delay is not None
+                                     else 0.5 * 2 ** attempt))
+                continue
+            self._release()
+            self._observe(page_size, time.monotonic() - start, _payload_bytes(response))
+            return response
+
+    def _acquire(self) -> int:
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self._in_flight < self._concurrency:
+                    break
+                self._cond.wait(wait if wait > 0 else None)
+            self._in_flight += 1
+            return self._page_size
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _overloaded(self, delay: float):
+        with self._cond:
+            self._page_size = max(self.min_page_size, self._page_size // 2)
+            self._concurrency = max(1, self._concurrency // 2)
+            self._fast = 0
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        if metrics.enabled:
+            metrics.inc('fetch_overloaded')
+
+    def _observe(self, page_size: int, latency: float, payload: Optional[int]):
+        """Adjust to one response to a request for page_size documents"""
+
+        ratio = latency / self.target_latency if self.target_latency > 0 else 0.0
+        if payload is not None and self.max_page_bytes > 0:
+            ratio = max(ratio, payload / self.max_page_bytes)
+
+        with self._cond:
+            if ratio > 1:
+                # Shrink from the size that was too slow, not a later one
+                shrunk = max(self.min_page_size, int(page_size / min(ratio, 2.0)))
+                self._page_size = min(self._page_size, shrunk)
+                self._fast = 0
+            else:
+                self._page_size = min(self.max_page_size, self._page_size + self.page_step)
+                self._fast += 1
+                if self._fast >= GROW_AFTER:
+                    self._concurrency = min(self.max_concurrency, self._concurrency + 1)
+                    self._fast = 0
+                    self._cond.notify_all()
+        if metrics.enabled and ratio > 1:
+            metrics.inc('fetch_page_shrinks')
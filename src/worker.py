@@ -0,0 +1,353 @@
+"""
+Resident decryption worker speaking newline-delimited JSON-RPC 2.0
+
+Requests are read one per line from stdin (or a Unix socket connection)
+and answered one per line, so a long-lived process keeps interpreter
+start-up, imports, decryptors and Elasticsearch connections warm between
+jobs. Jobs run concurrently on an internal thread pool and responses are
+written as soon as each job finishes, matched to requests by ``id``.
+
+Example request:
+
+    {"jsonrpc": "2.0", "id": 1, "method": "decrypt",
+     "params": {"file": "logs.ndjson", "key": "...", "output": "out.json"}}
+"""
+
+import hashlib
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, IO, Optional
+
+from .connection_pool import ClientRegistry, get_default_registry
+from .hit_cache import HitCache, get_default_hit_cache
+from .decryptor import LogDecryptor
+from .formatter import LogFormatter
+from .kibana_client import KibanaClient
+from .pipeline import decrypt_records, output_format, save_output
+from .planner import plan_fetch
+from .progress import ProgressReporter
+from .reader import read_logs_from_file
+from .record import json_default
+from .result_cache import ResultCache, job_cache_key
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+JOB_FAILED = -32000
+
+
+class JobError(Exception):
+    """Error raised for a job that cannot be run"""
+
+    def __init__(self, message: str, code: int = JOB_FAILED):
+        super().__init__(message)
+        self.code = code
+
+
+class DecryptionWorker:
+    """Run decryption jobs with warm decryptors and pooled Elasticsearch clients"""
+
+    def __init__(self, max_workers: int = 4, max_decryptors: int = 32,
+                 registry: Optional[ClientRegistry] = None, stream_batch_size: int = 500,
+                 result_cache: Optional[ResultCache] = None,
+                 hit_cache: Optional[HitCache] = None):
+        """
+        Initialize worker
+
+        Args:
+            max_workers: Number of jobs run concurrently
+            max_decryptors: Number of (key, algorithm) decryptors kept warm
+            registry: Elasticsearch client registry (default: process-wide registry)
+            stream_batch_size: Records per notification when a job streams results
+            result_cache: Cache of job outputs reused by identical jobs (default: None)
+            hit_cache: Cache of raw fetched pages (default: configured from HIT_CACHE_*)
+        """
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_decryptors = max_decryptors
+        self.registry = registry or get_default_registry()
+        self.stream_batch_size = stream_batch_size
+        self.result_cache = result_cache
+        self.hit_cache = hit_cache or get_default_hit_cache()
+        self.formatter = LogFormatter()
+
+        self._decryptors: 'OrderedDict[str, LogDecryptor]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._jobs_completed = 0
+        self._jobs_failed = 0
+
+    def get_decryptor(self, key: str, algorithm: str) -> LogDecryptor:
+        """Return a cached decryptor for the key/algorithm pair"""
+
+        cache_key = hashlib.sha256(f'{algorithm}\0{key}'.encode('utf-8')).hexdigest()
+
+        with self._lock:
+            decryptor = self._decryptors.get(cache_key)
+            if decryptor is not None:
+                self._decryptors.move_to_end(cache_key)
+                return decryptor
+
+        decryptor = LogDecryptor(key=key, algorithm=algorithm)
+
+        with self._lock:
+            self._decryptors[cache_key] = decryptor
+            while len(self._decryptors) > self.max_decryptors:
+                self._decryptors.popitem(last=False)
+
+        return decryptor
+
+    def run_job(self, params: Dict, notify=None) -> Dict:
+        """
+        Run one decryption job
+
+        Params mirror the CLI options (underscored): file or
+        elasticsearch_url/kibana_url + index, key, algorithm, field, query,
+        size, username, password, api_key, output, format and
+        ciphertext_copy (default: true). With
+        ``stream`` set, decrypted records are sent through ``notify`` as
+        ``job.records`` batches while the job runs, instead of being
+        returned in the response. With ``progress`` set, progress events
+        (see ProgressReporter) are sent as ``job.progress``.
+
+        Returns:
+            Job summary
+        """
+
+        key = params.get('key') or os.getenv('ENCRYPTION_KEY')
+        if not key:
+            raise JobError("'key' is required", INVALID_PARAMS)
+
+        algorithm = params.get('algorithm') or os.getenv('ENCRYPTION_ALGORITHM', 'AES-256-CBC')
+        field = params.get('field', 'message')
+        fmt = params.get('format', 'json')
+        include_ciphertext = params.get('ciphertext_copy', True) is not False
+
+        try:
+            decryptor = self.get_decryptor(key, algorithm)
+        except ValueError as e:
+            raise JobError(str(e), INVALID_PARAMS)
+
+        url = params.get('elasticsearch_url') or params.get('kibana_url')
+        if not params.get('file') and (not url or not params.get('index')):
+            raise JobError("Either 'file' or 'elasticsearch_url' and 'index' are required",
+                           INVALID_PARAMS)
+
+        query = params.get('query')
+        if isinstance(query, str):
+            query = json.loads(query)
+
+        cache_key = None
+        if self.result_cache and params.get('output'):
+            cache_key = job_cache_key(
+                key, algorithm, field, output_format(params['output'], fmt),
+                file=params.get('file'), urls=[url] if url else [],
+                indices=[params['index']] if params.get('index') else [],
+                query=query, size=int(params.get('size', 100)),
+                include_ciphertext=include_ciphertext, username=params.get('username'),
+                password=params.get('password'), api_key=params.get('api_key')
+            )
+            cached = self.result_cache.restore(cache_key, params['output']) if cache_key else None
+            if cached:
+                return dict(cached, output=params['output'], cached=True)
+
+        stream = bool(params.get('stream') and notify and not params.get('output'))
+        reporter = None
+        if notify and (stream or params.get('progress')):
+            def on_event(event: Dict):
+                if event['event'] == 'records':
+                    notify('job.records', {'offset': event['offset'], 'logs': event['logs']})
+                elif params.get('progress'):
+                    notify('job.progress', event)
+
+            reporter = ProgressReporter(on_event=on_event, emit_records=stream,
+                                        record_batch_size=self.stream_batch_size)
+            reporter.start(source=params.get('file') or params['index'])
+
+        if params.get('file'):
+            logs = read_logs_from_file(params['file'])
+        else:
+            client = KibanaClient(
+                elasticsearch_url=url,
+                username=params.get('username'),
+                password=params.get('password'),
+                api_key=params.get('api_key'),
+                registry=self.registry,
+                hit_cache=self.hit_cache
+            )
+            try:
+                # Jobs already run concurrently, so one reader per job
+                plan = plan_fetch(client, params['index'], query, int(params.get('size', 100)))
+                logs = client.fetch_planned(params['index'], query, plan)
+            finally:
+                client.close()
+
+        if reporter:
+            reporter.add_fetched(len(logs))
+        # Batches of records are streamed as soon as they are decrypted
+        decrypted_logs, failed_count = decrypt_records(
+            logs, decryptor, field=field, on_result=reporter.add_record if reporter else None
+        )
+
+        result = {
+            'total': len(decrypted_logs),
+            'decrypted': len(decrypted_logs) - failed_count,
+            'failed': failed_count,
+        }
+
+        if params.get('output'):
+            output_path = save_output(decrypted_logs, params['output'], format=fmt,
+                                      field=field, formatter=self.formatter,
+                                      include_ciphertext=include_ciphertext)
+            if reporter:
+                reporter.add_bytes_written(output_path.stat().st_size)
+            if cache_key:
+                self.result_cache.put(cache_key, output_path, dict(result))
+            result['output'] = params['output']
+        elif not stream:
+            result['logs'] = decrypted_logs
+
+        if reporter:
+            # Sends the last partial batch of records before the response
+            reporter.finish(total=result['total'])
+        return result
+
+    def stats(self) -> Dict:
+        """Return worker statistics"""
+
+        with self._lock:
+            return {
+                'jobs_completed': self._jobs_completed,
+                'jobs_failed': self._jobs_failed,
+                'decryptors': len(self._decryptors),
+                'pool': self.registry.stats(),
+            }
+
+    def serve(self, rfile: IO[str], wfile: IO[str]) -> bool:
+        """
+        Serve JSON-RPC requests until EOF or a shutdown request
+
+        Args:
+            rfile: Text stream requests are read from
+            wfile: Text stream responses are written to
+
+        Returns:
+            Whether a shutdown request ended it
+        """
+
+        write_lock = threading.Lock()
+        pending = []
+        shutdown = False
+
+        def send(message: Dict):
+            line = json.dumps(message, default=json_default)
+            with write_lock:
+                wfile.write(line + '\n')
+                wfile.flush()
+
+        def reply(request_id, result=None, error: Optional[Exception] = None):
+            if request_id is None:
+                return
+            if error is None:
+                send({'jsonrpc': '2.0', 'id': request_id, 'result': result})
+            else:
+                send({'jsonrpc': '2.0', 'id': request_id, 'error': {
+                    'code': getattr(error, 'code', JOB_FAILED),
+                    'message': str(error),
+                }})
+
+        def run(request_id, params: Dict):
+            def notify(method: str, payload: Dict):
+                send({'jsonrpc': '2.0', 'method': method, 'params': {'id': request_id, **payload}})
+
+            try:
+                result = self.run_job(params, notify=notify)
+            except Exception as e:
+                with self._lock:
+                    self._jobs_failed += 1
+                reply(request_id, error=e)
+            else:
+                with self._lock:
+                    self._jobs_completed += 1
+                reply(request_id, result)
+
+        for line in rfile:
+            if not line.strip():
+                continue
+
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                send({'jsonrpc': '2.0', 'id': None,
+                      'error': {'code': PARSE_ERROR, 'message': f'Parse error: {e}'}})
+                continue
+
+            if not isinstance(request, dict) or 'method' not in request:
+                send({'jsonrpc': '2.0', 'id': None,
+                      'error': {'code': INVALID_REQUEST, 'message': 'Invalid request'}})
+                continue
+
+            request_id = request.get('id')
+            method = request['method']
+            params = request.get('params') or {}
+
+            if method == 'decrypt':
+                pending = [future for future in pending if not future.done()]
+                pending.append(self.executor.submit(run, request_id, params))
+            elif method == 'ping':
+                reply(request_id, {'pong': True, 'pid': os.getpid()})
+            elif method == 'stats':
+                reply(request_id, self.stats())
+            elif method == 'shutdown':
+                reply(request_id, {'shutdown': True})
+                shutdown = True
+                break
+            else:
+                reply(request_id, error=JobError(f'Method not found: {method}', METHOD_NOT_FOUND))
+
+        # Let in-flight jobs answer before the stream is closed
+        for future in pending:
+            future.result()
+        return shutdown
+
+    def close(self):
+        """Stop the job pool and close pooled connections"""
+
+        self.executor.shutdown(wait=True)
+        self.registry.close_all()
+
+
+def serve_stdio(worker: DecryptionWorker):
+    """Serve requests on stdin/stdout"""
+
+    worker.serve(sys.stdin, sys.stdout)
+
+
+def serve_unix_socket(worker: DecryptionWorker, socket_path: str):
+    """Serve requests on a Unix domain socket, one JSON-RPC stream per connection"""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            rfile = io.TextIOWrapper(self.rfile, encoding='utf-8')
+            wfile = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+            if worker.serve(rfile, wfile):
+                # Stop accepting connections, not just this one (handlers
+                # run in their own threads, so this does not deadlock)
+                self.server.shutdown()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+